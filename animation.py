@@ -0,0 +1,225 @@
+"""
+Frame pipeline for the calorimeter unrolling animation of Draw.make_unrolling_plot.
+The rotated cylinder geometry of all frames is computed up front as arrays,
+frames are rendered to PNG buffers in worker processes (each worker builds its
+figure once and only redraws what changes), and the buffers are appended in
+order to a GIF or MP4 writer as they arrive.
+"""
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+import matplotlib
+import numpy as np
+import numpy.typing as npt
+from matplotlib import gridspec
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+
+import profiling
+
+# frames of the 3D view per shift of the unrolled image by one iphi
+RATE_3D = 4
+
+
+def draw_angle_arcs(ax, theta_=65, phi_=45):
+    # Draw beam  axis
+    ax.plot((-0.2, 1.2), (0, 0), (0, 0), color='black')
+
+    # Define a point on the surface of the cylinder
+    my_phi = np.deg2rad(phi_)
+    my_theta = np.deg2rad(theta_)
+
+    # Coordinates of the point on the surface
+    r = 1 / np.sin(my_theta)
+    x_surface = r * np.sin(my_theta) * np.cos(my_phi)
+    y_surface = r * np.sin(my_theta) * np.sin(my_phi)
+    z_surface = r * np.cos(my_theta)
+
+    # Draw red arrows
+    ax.quiver(0.5, 0, 0, z_surface, x_surface, y_surface, color='r', arrow_length_ratio=0.1)
+    ax.quiver(0.5+z_surface, 0, 0, 0, x_surface, y_surface, color='r', arrow_length_ratio=0.1, linestyle=':')
+
+    # Draw labeled archs for the angles
+    angle_radius = 0.3
+    phis = np.linspace(my_phi, np.pi, 100)
+    if abs(my_phi) > np.pi:
+        phis = np.linspace(np.pi, my_phi+2*np.pi, 100)
+    phi_arc_x = angle_radius * np.cos(phis)
+    phi_arc_y = angle_radius * np.sin(phis)
+    phi_arc_z = np.ones_like(phi_arc_x) * r * np.cos(my_theta) + 0.5
+    ax.plot(phi_arc_z, phi_arc_x, phi_arc_y, color='blue', linewidth=2, label='Polar Angle')
+    ax.text(phi_arc_z[0], phi_arc_x[0], phi_arc_y[0], r"$\phi$", color='blue', fontsize=18)
+
+    theta_arc_grid = np.linspace(0, my_theta, 100)
+    theta_arc_x = angle_radius * np.sin(theta_arc_grid) * np.cos(my_phi)
+    theta_arc_y = angle_radius * np.sin(theta_arc_grid) * np.sin(my_phi)
+    theta_arc_z = angle_radius * np.cos(theta_arc_grid) + 0.5
+    ax.plot(theta_arc_z, theta_arc_x, theta_arc_y, color='blue', linewidth=2, label='Polar Angle')
+    ax.text(theta_arc_z[50], theta_arc_x[50], theta_arc_y[50], r"$\theta$", color='blue', fontsize=18)
+
+
+def draw_red_square(ax, i_eta, i_phi):
+    for r in ax.patches:
+        r.remove()
+    rect = Rectangle((i_eta-0.5, i_phi-0.5), 1, 1, linewidth=2, edgecolor='r', facecolor='none')
+    ax.add_patch(rect)
+
+
+def unrolling_geometry(deposits: npt.NDArray, n_frames: int = None) -> Dict[str, npt.NDArray]:
+    """
+    Cylinder surface coordinates of every frame. The cylinder makes one full turn
+    over n_frames (default: RATE_3D frames per iphi).
+    """
+    n_phi, n_eta = deposits.shape
+    n_frames = n_frames or n_phi * RATE_3D
+
+    theta = np.linspace(0, 2 * np.pi, n_phi)  # Circumference angles
+    z_cyl = np.linspace(0, 1, n_eta)  # Height values
+    Z_cyl, _ = np.meshgrid(z_cyl, theta)
+
+    angles = -np.arange(n_frames) * (2 * np.pi / n_frames)
+    new_theta = theta[None, :, None] + angles[:, None, None]  # (n_frames, n_phi, 1)
+    return {
+        "Z": Z_cyl,
+        "X": np.broadcast_to(np.cos(new_theta), (n_frames, n_phi, n_eta)),
+        "Y": np.broadcast_to(np.sin(new_theta), (n_frames, n_phi, n_eta)),
+        "angles": angles,
+        # shift of the unrolled image by one iphi per full turn / n_phi
+        "shifts": (np.arange(n_frames) * n_phi // n_frames) % n_phi,
+        "facecolors": matplotlib.cm.Purples(deposits),
+    }
+
+
+def setup_unrolling_figure(deposits: npt.NDArray, figure=None, dpi: float = None):
+    """
+    Draw the first frame; returns (fig, ax1, ax2, im) for the updates of the later frames.
+    """
+    n_phi, n_eta = deposits.shape
+    geometry = unrolling_geometry(deposits, n_frames=1)
+
+    spec = gridspec.GridSpec(
+        ncols=2, nrows=1,
+        width_ratios=[2, 1.8], wspace=0.1,
+    )
+
+    fig = figure if figure is not None else Figure(figsize=(12, 6), dpi=dpi)
+    fig.subplots_adjust(left=0, bottom=0.05, right=1, top=0.95, wspace=None, hspace=0.1)
+
+    ax1 = fig.add_subplot(spec[0], projection='3d')
+    ax2 = fig.add_subplot(spec[1])
+
+    # Initial plot for the cylinder
+    ax1.plot_surface(geometry["Z"], geometry["X"][0], geometry["Y"][0], facecolors=geometry["facecolors"],
+                     rstride=1, cstride=1, alpha=0.6, linewidth=0)
+    ax1.set_title('CMS Calorimeter (Schematic)', fontsize=18)
+    ax1.set_axis_off()
+    ax1.view_init(elev=30, azim=-60)
+    ax1.dist = 8
+
+    draw_angle_arcs(ax1, phi_=45)
+
+    # Initial plot for the unrolled grid
+    im = ax2.imshow(deposits, cmap='Purples', aspect='auto')
+    ax2.set_title('Unrolled Input', fontsize=18)
+    ax2.set_xlabel(r"i$\eta$", fontsize=18)
+    ax2.set_ylabel(r"i$\phi$", fontsize=18)
+
+    # Draw red square in unrolled image
+    draw_red_square(ax2, 12, 6)
+
+    cbar = fig.colorbar(im, ax=ax2)
+    cbar.set_ticks([])
+    cbar.ax.set_ylabel(r"Energy deposit", fontsize=18)
+    ax2.set_xticks([])
+    ax2.set_yticks([])
+    return fig, ax1, ax2, im
+
+
+def draw_unrolling_frame(ax1, ax2, im, deposits: npt.NDArray, geometry: Dict[str, npt.NDArray], frame: int):
+    n_phi = deposits.shape[0]
+    angle = geometry["angles"][frame]
+
+    ax1.cla()  # Clear the previous plot
+    ax1.plot_surface(geometry["Z"], geometry["X"][frame], geometry["Y"][frame], facecolors=geometry["facecolors"],
+                     rstride=1, cstride=1, alpha=0.6, linewidth=0)
+    ax1.set_axis_off()
+    ax1.set_title('CMS Calorimeter (Schematic)', fontsize=18)
+    draw_angle_arcs(ax1, phi_=np.rad2deg(angle)+45)
+
+    # Update the unrolled image based on the rolling motion
+    shift = geometry["shifts"][frame]
+    im.set_array(np.roll(deposits, shift, axis=0))  # Apply circular permutation along y-axis
+    draw_red_square(ax2, 12, (6+shift) % n_phi)
+
+
+# state of a worker process: the deposits, their geometry and the figure that is redrawn
+_worker = {}
+
+
+def _init_worker(deposits, n_frames, dpi, rc_params):
+    matplotlib.rcParams.update(rc_params)
+    fig, ax1, ax2, im = setup_unrolling_figure(deposits, dpi=dpi)
+    FigureCanvasAgg(fig)
+    _worker.update(
+        deposits=deposits, geometry=unrolling_geometry(deposits, n_frames), fig=fig, ax1=ax1, ax2=ax2, im=im, dpi=dpi
+    )
+
+
+def _render_frames(frames: List[int]) -> List[bytes]:
+    w = _worker
+    buffers = []
+    for frame in frames:
+        draw_unrolling_frame(w["ax1"], w["ax2"], w["im"], w["deposits"], w["geometry"], frame)
+        buffer = io.BytesIO()
+        w["fig"].savefig(buffer, format="png", dpi=w["dpi"])
+        buffers.append(buffer.getvalue())
+    return buffers
+
+
+def render_frames(
+        deposits: npt.NDArray, n_frames: int = None, dpi: float = 100, workers: int = None, frames_per_task: int = 8
+) -> Iterator[bytes]:
+    """
+    Yield the PNG buffers of all frames in order, rendered by `workers` processes.
+    """
+    n_frames = n_frames or deposits.shape[0] * RATE_3D
+    tasks = [list(range(i, min(i + frames_per_task, n_frames))) for i in range(0, n_frames, frames_per_task)]
+    with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(deposits, n_frames, dpi, dict(matplotlib.rcParams)),
+    ) as pool:
+        for buffers in pool.map(_render_frames, tasks):
+            yield from buffers
+
+
+@profiling.profiled()
+def save_unrolling_animation(
+        deposits: npt.NDArray,
+        path: str,
+        n_frames: int = None,
+        dpi: float = 100,
+        workers: int = None,
+        interval: int = 100,
+) -> Tuple[str, int]:
+    """
+    Render the animation in parallel and write it to `path`; .gif or .mp4 (requires imageio-ffmpeg).
+    @param interval: time between frames in milliseconds.
+    Returns (path, number of frames).
+    """
+    import imageio.v2 as imageio
+
+    if path.endswith(".mp4"):
+        writer = imageio.get_writer(path, fps=1000 / interval, macro_block_size=1)
+    else:
+        writer = imageio.get_writer(path, mode="I", duration=interval, loop=0)
+
+    n = 0
+    with writer:
+        for buffer in render_frames(deposits, n_frames, dpi, workers):
+            writer.append_data(imageio.imread(buffer, format="png"))
+            n += 1
+    return path, n
@@ -0,0 +1,180 @@
+import argparse
+import csv
+import glob
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_FILES = ["Snakefile", "config"] + sorted(
+    os.path.basename(p) for p in glob.glob(os.path.join(HERE, "*.py"))
+    if os.path.basename(p) not in ("benchmark_pipeline.py", "run_benchmarks.py")
+)
+
+
+def prepare_workdir(workdir, scale, args):
+    """
+    Symlink the pipeline into workdir and fill workdir/inputs with synthetic data
+    scaled by `scale` (more bins and proportionally more entries).
+    """
+    os.makedirs(workdir, exist_ok=True)
+    for name in PIPELINE_FILES:
+        link = os.path.join(workdir, name)
+        if not os.path.lexists(link):
+            os.symlink(os.path.join(HERE, name), link)
+
+    inputs = os.path.join(workdir, "inputs")
+    if os.path.isdir(inputs):
+        return
+    subprocess.run(
+        [
+            sys.executable, os.path.join(HERE, "make_synthetic_inputs.py"),
+            "--output", inputs,
+            "--hist-events", str(args.hist_events * scale),
+            "--bin-scale", str(scale),
+            "--extra-triggers", str(args.extra_triggers),
+            "--tree-events", "0",
+            "--seed", str(args.seed),
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def read_rule_benchmarks(workdir):
+    """
+    Per-rule wall time and peak RSS from the Snakemake benchmark tables.
+    """
+    rules = {}
+    for path in glob.glob(os.path.join(workdir, "profiles", "*.benchmark.tsv")):
+        rule = os.path.basename(path)[:-len(".benchmark.tsv")]
+        with open(path) as f:
+            row = next(csv.DictReader(f, delimiter="\t"))
+        max_rss = row.get("max_rss", "NA")
+        rules[rule] = {
+            "seconds": float(row["s"]),
+            "max_rss_mb": float(max_rss) if max_rss not in ("NA", "-") else None,
+        }
+    return rules
+
+
+def output_sizes(workdir):
+    sizes = {}
+    for path in glob.glob(os.path.join(workdir, "outputs", "*.*")):
+        sizes[os.path.basename(path)] = os.path.getsize(path)
+    return sizes
+
+
+def run_pipeline(workdir, cores, targets):
+    shutil.rmtree(os.path.join(workdir, "profiles"), ignore_errors=True)
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "snakemake", *targets, f"-c{cores}", "--forceall", "--keep-going", "--quiet"],
+        cwd=workdir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    rules = read_rule_benchmarks(workdir)
+    sizes = output_sizes(workdir)
+    rss = [r["max_rss_mb"] for r in rules.values() if r["max_rss_mb"] is not None]
+    return {
+        "returncode": proc.returncode,
+        "wall_seconds": wall,
+        "peak_rss_mb": max(rss) if rss else None,
+        "output_bytes": sum(sizes.values()),
+        "rules": rules,
+        "outputs": sizes,
+        "log": proc.stdout[-2000:] if proc.returncode else "",
+    }
+
+
+def scaling_exponents(runs, scales, cores):
+    """
+    Empirical exponent k of t ~ scale^k between successive scales at fixed cores.
+    k noticeably above 1 means the pipeline scales superlinearly with input size.
+    """
+    exponents = {}
+    for c in cores:
+        for s1, s2 in zip(scales, scales[1:]):
+            t1 = runs[f"{s1}x-c{c}"]["wall_seconds"]
+            t2 = runs[f"{s2}x-c{c}"]["wall_seconds"]
+            exponents[f"{s1}x->{s2}x-c{c}"] = math.log(t2 / t1) / math.log(s2 / s1)
+    return exponents
+
+
+def main(args):
+
+    runs = {}
+    for scale in args.scales:
+        workdir = os.path.abspath(os.path.join(args.workdir, f"scale_{scale}"))
+        prepare_workdir(workdir, scale, args)
+        for cores in args.cores:
+            key = f"{scale}x-c{cores}"
+            runs[key] = run_pipeline(workdir, cores, args.targets)
+            r = runs[key]
+            status = "ok" if r["returncode"] == 0 else f"FAILED ({r['returncode']})"
+            peak = f"{r['peak_rss_mb']:.0f} MB" if r["peak_rss_mb"] is not None else "n/a"
+            print(f"{key:<12} {r['wall_seconds']:8.1f} s  peak RSS {peak:>8}  outputs {r['output_bytes'] / 2**20:8.1f} MiB  {status}")
+            for rule, b in sorted(r["rules"].items(), key=lambda x: -x[1]["seconds"]):
+                print(f"    {rule:<28} {b['seconds']:8.1f} s")
+
+    exponents = scaling_exponents(runs, args.scales, args.cores) if len(args.scales) > 1 else {}
+    for key, k in exponents.items():
+        flag = "  <-- superlinear" if k > 1 + args.tolerance else ""
+        print(f"scaling exponent {key:<20} {k:5.2f}{flag}")
+
+    report = {
+        "scales": args.scales,
+        "cores": args.cores,
+        "targets": args.targets,
+        "runs": runs,
+        "scaling_exponents": exponents,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved pipeline benchmark to {args.output}")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Run the Snakemake pipeline on synthetic inputs at several sizes and core counts and record timings"
+    )
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 100], help="Input size multipliers")
+    parser.add_argument(
+        "--cores",
+        nargs="+",
+        type=int,
+        default=list(range(1, (os.cpu_count() or 1) + 1)),
+        help="Snakemake core counts to run with (default: every count from 1 to the number of CPUs)"
+    )
+    parser.add_argument("--targets", nargs="+", default=["all"], help="Snakemake targets")
+    parser.add_argument(
+        "--workdir",
+        default="pipeline_benchmark",
+        help="Directory holding one working copy of the pipeline per scale"
+    )
+    parser.add_argument(
+        "--hist-events",
+        type=lambda s: int(float(s)),
+        default=10**9,
+        help="Histogram entries at scale 1"
+    )
+    parser.add_argument("--extra-triggers", type=int, default=0)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Flag scaling exponents above 1 + tolerance"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="pipeline_benchmark.json")
+
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,264 @@
+"""
+Opt-in memoisation of the analysis functions in utils.py.
+
+Functions decorated with `memoized` are plain calls until `enable()` is
+called (typically at the top of the notebook). From then on, results are kept
+in a bounded in-memory LRU cache, and optionally in a directory on disk, keyed
+on the function, a digest of its source and a fingerprint of its arguments.
+Arrays are fingerprinted by shape, dtype and an xxhash (or, without xxhash,
+blake2b) digest of their data, which costs a fraction of a second even for 10^8
+scores, so re-running a cell or tweaking a plot skips the ROC curves and rate
+tables it already has. Editing a memoised function invalidates its results on
+disk; changes to the helpers it calls need an explicit memoized(version=...).
+
+    caching.enable(max_bytes=4 * 2**30, disk_dir=".cache")
+    roc_dict = utils.get_roc_dict(score_dict, "ZB", sig_labels)   # computed
+    roc_dict = utils.get_roc_dict(score_dict, "ZB", sig_labels)   # from memory
+    caching.print_stats()
+
+Cached arrays are returned read-only, since they are shared between calls.
+"""
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def array_digest(array: np.ndarray) -> str:
+    """
+    Hex digest of the data of an array (its values, not its memory layout).
+    """
+    if array.dtype.hasobject:
+        data = pickle.dumps(array, protocol=pickle.HIGHEST_PROTOCOL)
+    else:
+        data = np.ascontiguousarray(array).reshape(-1).view(np.uint8)
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def fingerprint(value):
+    """
+    Hashable stand-in for an argument: arrays by shape, dtype and digest, containers recursively.
+    Raises TypeError for values that cannot be fingerprinted.
+    """
+    if isinstance(value, np.ndarray):
+        return ("ndarray", value.shape, value.dtype.str, array_digest(value))
+    if isinstance(value, np.generic):
+        return ("scalar", value.dtype.str, value.item())
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if isinstance(value, Mapping):
+        # dicts and lazy mappings such as selection.ColumnView
+        return ("dict", tuple((k, fingerprint(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(fingerprint(v) for v in value))
+    raise TypeError(f"cannot fingerprint {type(value).__name__}")
+
+
+def source_version(func: Callable) -> str:
+    """
+    Digest of the source of `func` (of the innermost function of a stack of decorators),
+    so that results cached on disk by an older implementation are not reused.
+    Falls back to the bytecode if the source is not available.
+    """
+    func = inspect.unwrap(func)
+    try:
+        data = inspect.getsource(func).encode()
+    except (OSError, TypeError):
+        data = func.__code__.co_code
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def _freeze(value):
+    """
+    Make the arrays of a cached result read-only.
+    """
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _freeze(v)
+    elif isinstance(value, dict):
+        for v in value.values():
+            _freeze(v)
+    return value
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    return 0
+
+
+class Memoizer:
+
+    def __init__(self):
+        self.enabled = False
+        self.maxsize = 128
+        self.max_bytes = 2**30
+        self.disk_dir: Optional[str] = None
+        # {function name: {"hits", "disk_hits", "misses", "uncacheable", "saved_seconds"}}
+        self.stats: Dict[str, dict] = {}
+        # key: (function name, result, seconds it took to compute, array bytes of the result)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def enable(self, maxsize: int = 128, max_bytes: int = 2**30, disk_dir: str = None) -> None:
+        """
+        Start memoising, keeping the most recent results in memory up to `maxsize`
+        results or `max_bytes` of arrays and, with `disk_dir`, every result on disk as well.
+        """
+        self.enabled = True
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+        with self._lock:
+            self._evict()
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def clear(self, disk: bool = False) -> None:
+        """
+        Forget the cached results and statistics, with disk=True also the files in disk_dir.
+        """
+        with self._lock:
+            self._cache.clear()
+            self._bytes = 0
+            self.stats = {}
+        if disk and self.disk_dir is not None:
+            for file_name in os.listdir(self.disk_dir):
+                if file_name.endswith(".pkl"):
+                    os.remove(os.path.join(self.disk_dir, file_name))
+
+    def _evict(self) -> None:
+        # least recently used first; the newest result stays even if it alone exceeds max_bytes
+        while len(self._cache) > self.maxsize or (self._bytes > self.max_bytes and len(self._cache) > 1):
+            _, (_, _, _, nbytes) = self._cache.popitem(last=False)
+            self._bytes -= nbytes
+
+    def _disk_path(self, name: str, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{name}-{key}.pkl")
+
+    def _get(self, name: str, key: str):
+        """
+        (found, result, seconds) from memory, then from disk.
+        """
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                _, result, seconds, _ = self._cache[key]
+                return "hits", result, seconds
+        if self.disk_dir is not None:
+            path = self._disk_path(name, key)
+            try:
+                with open(path, "rb") as f:
+                    result, seconds = pickle.load(f)
+            except FileNotFoundError:
+                return None, None, None
+            except Exception as e:
+                # truncated, corrupt or written by an incompatible version: recompute and overwrite it
+                print(f"  WARNING: ignoring unreadable cache file {path}: {e!r}")
+                return None, None, None
+            self._put(name, key, _freeze(result), seconds, to_disk=False)
+            return "disk_hits", result, seconds
+        return None, None, None
+
+    def _put(self, name: str, key: str, result, seconds: float, to_disk: bool = True) -> None:
+        nbytes = _nbytes(result)
+        with self._lock:
+            if key in self._cache:
+                self._bytes -= self._cache.pop(key)[3]
+            self._cache[key] = (name, result, seconds, nbytes)
+            self._bytes += nbytes
+            self._evict()
+        if to_disk and self.disk_dir is not None:
+            path = self._disk_path(name, key)
+            # write to a temporary file first so that a reader never sees a partial pickle
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump((result, seconds), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+
+    def _count(self, name: str, outcome: str, saved_seconds: float = 0.0) -> None:
+        with self._lock:
+            s = self.stats.setdefault(name, {
+                "hits": 0, "disk_hits": 0, "misses": 0, "uncacheable": 0, "saved_seconds": 0.0,
+            })
+            s[outcome] += 1
+            s["saved_seconds"] += saved_seconds
+
+    def memoized(self, name: Optional[str] = None, version: Optional[str] = None) -> Callable:
+        """
+        Decorator caching the results of the wrapped function while memoisation is enabled.
+        Calls with arguments that cannot be fingerprinted are passed through.
+        Results are keyed on `version` as well, by default a digest of the function's
+        source; pass an explicit version to invalidate them when code the function
+        calls changes.
+        """
+        def decorator(func):
+            stage = name or func.__qualname__
+            signature = inspect.signature(func)
+            func_version = version if version is not None else source_version(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                try:
+                    key_data = repr((stage, func_version, fingerprint(dict(bound.arguments))))
+                except TypeError:
+                    self._count(stage, "uncacheable")
+                    return func(*args, **kwargs)
+                key = hashlib.blake2b(key_data.encode(), digest_size=16).hexdigest()
+
+                outcome, result, seconds = self._get(stage, key)
+                if outcome is not None:
+                    self._count(stage, outcome, seconds)
+                    return result
+
+                start = time.perf_counter()
+                result = _freeze(func(*args, **kwargs))
+                self._put(stage, key, result, time.perf_counter() - start)
+                self._count(stage, "misses")
+                return result
+            return wrapper
+        return decorator
+
+    def print_stats(self) -> None:
+        for stage, s in self.stats.items():
+            print(
+                f"{stage}: {s['hits']} hits, {s['disk_hits']} disk hits, {s['misses']} misses, "
+                f"{s['uncacheable']} uncacheable, {s['saved_seconds']:.1f} s saved"
+            )
+
+
+MEMOIZER = Memoizer()
+enable = MEMOIZER.enable
+disable = MEMOIZER.disable
+clear = MEMOIZER.clear
+memoized = MEMOIZER.memoized
+print_stats = MEMOIZER.print_stats
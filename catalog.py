@@ -0,0 +1,213 @@
+"""
+Persistent catalog of the ntuple files of each process.
+Walking large ntuple trees (e.g. CICADANtuples/*/*/*/*.root on EOS) takes long,
+so the catalog records every file's path, size, mtime, entry count and branch
+list in SQLite once. Refreshing only stats the files and re-opens those that
+are new or changed; lookups of the files and event counts of a process do not
+touch the file system at all.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Tuple
+
+import uproot
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT NOT NULL,
+    process TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    entries INTEGER,
+    branches TEXT,
+    PRIMARY KEY (process, path)
+);
+CREATE INDEX IF NOT EXISTS files_path ON files (path);
+CREATE TABLE IF NOT EXISTS scans (
+    process TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    scanned_at REAL NOT NULL
+);
+"""
+# Catalogs of an older SCHEMA are dropped and rebuilt, they only cache the file system
+SCHEMA_VERSION = 2
+
+
+def walk_root_files(root: str, _visited: set = None) -> Iterator[os.DirEntry]:
+    """
+    All *.root files below root, like glob(f"{root}/**/*.root", recursive=True) but
+    reusing the stat results of the directory listing. As glob does, hidden entries
+    (e.g. version and trash copies on EOS) and unreadable directories are skipped;
+    directories reached again through symbolic links are only walked once.
+    """
+    visited = set() if _visited is None else _visited
+    try:
+        st = os.stat(root)
+        if (st.st_dev, st.st_ino) in visited:
+            return
+        visited.add((st.st_dev, st.st_ino))
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.name.startswith("."):
+            continue
+        try:
+            is_dir = entry.is_dir(follow_symlinks=True)
+        except OSError:
+            continue
+        if is_dir:
+            yield from walk_root_files(entry.path, visited)
+        elif entry.name.endswith(".root"):
+            yield entry
+
+
+def read_metadata(path: str, tree: str) -> Tuple[int, List[str]]:
+    """
+    Entry count and branch names of `tree`; (None, []) if the file has no such tree.
+    """
+    try:
+        with uproot.open(path) as f:
+            if tree not in f:
+                return None, []
+            t = f[tree]
+            return t.num_entries, list(t.keys())
+    except (OSError, ValueError, uproot.deserialization.DeserializationError) as e:
+        print(f"  WARNING: could not read {path}: {e}")
+        return None, []
+
+
+class FileCatalog:
+
+    def __init__(self, db_path: str = "file_catalog.sqlite", tree: str = "Events"):
+        self.db_path = db_path
+        self.tree = tree
+        self.connection = sqlite3.connect(db_path)
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            self.connection.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS scans;")
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def refresh(self, process: str, root: str) -> Dict[str, int]:
+        """
+        Bring the files of `process` below `root` up to date.
+        Returns the number of added, updated, removed and unchanged files.
+        """
+        known = {
+            path: (size, mtime)
+            for path, size, mtime in self.connection.execute(
+                "SELECT path, size, mtime FROM files WHERE process = ?", (process,)
+            )
+        }
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        seen = set()
+        with self.connection:
+            for entry in walk_root_files(root):
+                st = entry.stat()
+                seen.add(entry.path)
+                if known.get(entry.path) == (st.st_size, st.st_mtime):
+                    stats["unchanged"] += 1
+                    continue
+                stats["updated" if entry.path in known else "added"] += 1
+                entries, branches = read_metadata(entry.path, self.tree)
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                    (entry.path, process, st.st_size, st.st_mtime, entries, json.dumps(branches)),
+                )
+            removed = [(process, path) for path in known if path not in seen]
+            self.connection.executemany("DELETE FROM files WHERE process = ? AND path = ?", removed)
+            stats["removed"] = len(removed)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO scans VALUES (?, ?, ?)", (process, root, time.time())
+            )
+        return stats
+
+    def refresh_from_config(self, json_file_path: str) -> Dict[str, Dict[str, int]]:
+        """
+        Refresh all processes of a {"prefix": ..., "paths": {process: path}} file
+        list, as read by utils.get_file_dict_old.
+        """
+        with open(json_file_path) as f:
+            raw_dict = json.load(f)
+        prefix = raw_dict["prefix"]
+        return {
+            process: self.refresh(process, f"{prefix}/{path}") for process, path in raw_dict["paths"].items()
+        }
+
+    def is_scanned(self, process: str, root: str = None) -> bool:
+        """
+        Whether `process` was scanned, below `root` if given: a process whose
+        path changed (e.g. moved to a new production) has to be scanned again.
+        """
+        row = self.connection.execute("SELECT root FROM scans WHERE process = ?", (process,)).fetchone()
+        return row is not None and (root is None or row[0] == root)
+
+    def processes(self) -> List[str]:
+        return [p for p, in self.connection.execute("SELECT process FROM scans ORDER BY process")]
+
+    def files(self, process: str) -> List[str]:
+        return [p for p, in self.connection.execute("SELECT path FROM files WHERE process = ? ORDER BY path", (process,))]
+
+    def entries(self, process: str) -> Dict[str, int]:
+        """
+        {path: number of entries} of the files of a process; None for files without the tree.
+        """
+        return dict(self.connection.execute(
+            "SELECT path, entries FROM files WHERE process = ? ORDER BY path", (process,)
+        ))
+
+    def total_entries(self, process: str) -> int:
+        (total,) = self.connection.execute(
+            "SELECT COALESCE(SUM(entries), 0) FROM files WHERE process = ?", (process,)
+        ).fetchone()
+        return total
+
+    def branches(self, path: str) -> List[str]:
+        row = self.connection.execute("SELECT branches FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            raise KeyError(f"{path} is not in the catalog {self.db_path}")
+        return json.loads(row[0])
+
+    def partition(self, process: str, n_parts: int) -> List[List[str]]:
+        """
+        Split the files of a process into n_parts lists with similar numbers of entries
+        (largest files first, each to the currently smallest part).
+        """
+        parts = [[] for _ in range(n_parts)]
+        sizes = [0] * n_parts
+        for path, entries in sorted(self.entries(process).items(), key=lambda x: -(x[1] or 0)):
+            i = sizes.index(min(sizes))
+            parts[i].append(path)
+            sizes[i] += entries or 0
+        return parts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build or refresh the file catalog of a {prefix, paths} JSON file list and summarise it"
+    )
+    parser.add_argument("config", help="JSON file with a prefix and {process: path} paths")
+    parser.add_argument("--db", default="file_catalog.sqlite", help="SQLite catalog file")
+    parser.add_argument("--tree", default="Events")
+    parser.add_argument("--no-refresh", action="store_true", help="Only print the catalog content")
+    args = parser.parse_args()
+
+    with FileCatalog(args.db, args.tree) as catalog:
+        if not args.no_refresh:
+            for process, stats in catalog.refresh_from_config(args.config).items():
+                print(f"{process}: " + ", ".join(f"{v} {k}" for k, v in stats.items()))
+        for process in catalog.processes():
+            print(f"{process:<40} {len(catalog.files(process)):6d} files {catalog.total_entries(process):12d} entries")
@@ -7,8 +7,10 @@ import numpy as np
 import numpy.typing as npt
 
 from matplotlib.animation import FuncAnimation
-from matplotlib.colors import ListedColormap
-from matplotlib.patches import Patch, Rectangle
+from matplotlib.colors import ListedColormap, LogNorm
+from matplotlib.figure import Figure
+from matplotlib.legend_handler import HandlerPatch
+from matplotlib.patches import Patch, StepPatch
 from matplotlib.ticker import MaxNLocator
 from matplotlib import gridspec
 from matplotlib.lines import Line2D
@@ -16,7 +18,12 @@ from mpl_toolkits.axes_grid1.inset_locator import InsetPosition
 from sklearn.metrics import roc_curve, auc, roc_auc_score
 from sklearn.model_selection import StratifiedKFold
 
-from utils import get_fractions_above_threshold, get_rounded_str
+import animation
+import export
+import profiling
+from sparse import SparseDeposits, as_image
+from streaming import CellStatistics, ErrorSummary, RegionOccupancy
+from utils import SortedBackground, get_fractions_above_threshold, get_histogram, get_rounded_str
 
 # Color scheme from https://github.com/mpetroff/accessible-color-cycles/tree/master (recommended by root team)
 # ["#5790fc", "#f89c20", "#e42536", "#964a8b", "#9c9ca1", "#7a21dd"]  # 6 colors
@@ -25,12 +32,20 @@ from utils import get_fractions_above_threshold, get_rounded_str
 # labels shall be font size 7pt 
 
 
+@profiling.profile_methods
 class Draw:
 
-    def __init__(self, output_dir: Path = Path("outputs"), interactive: bool = False, output_format: str = "png"):
+    def __init__(
+            self,
+            output_dir: Path = Path("outputs"),
+            interactive: bool = False,
+            output_format: str = "png",
+            exporter: export.FigureExporter = None,
+    ):
         self.output_dir = output_dir
         self.interactive = interactive
         self.output_format = output_format
+        self.exporter = exporter or export.EXPORTER
         self.cmap = ["green", "red", "blue", "orange", "purple", "brown"]
         self.model_colors = ["tab:blue", "tab:orange", "tab:green", "tab:red", "tab:purple"]
         self.process_color_dict = {
@@ -89,65 +104,77 @@ class Draw:
     def _parse_name(self, name: str) -> str:
         return name.replace(" ", "-").lower()
     
-    def _get_process_color(self, label: str) -> str:
-        return self.process_color_dict.get(label, next(plt.gca()._get_lines.prop_cycler)['color'])
+    def _get_process_color(self, label: str, ax) -> str:
+        return self.process_color_dict.get(label, next(ax._get_lines.prop_cycler)['color'])
 
-    def _get_model_color(self, label: str) -> str:
-        return self.model_color_dict.get(label, next(plt.gca()._get_lines.prop_cycler)['color'])
+    def _get_model_color(self, label: str, ax) -> str:
+        return self.model_color_dict.get(label, next(ax._get_lines.prop_cycler)['color'])
     
     def _get_label(self, label: str) -> str:
         return self.label_dict.get(label, label)
 
-    def _save_fig(self, name: str) -> None:
-        plt.savefig(
-            f"{self.output_dir}/{self._parse_name(name)}.{self.output_format}", bbox_inches="tight", format=self.output_format
-        )
+    def _figure(self, **kwargs) -> Figure:
+        # only interactive figures go through pyplot, to be shown; the others are written in the background
+        return plt.figure(**kwargs) if self.interactive else export.figure(**kwargs)
+
+    def _save_fig(self, fig: Figure, name: str) -> None:
+        path = f"{self.output_dir}/{self._parse_name(name)}.{self.output_format}"
         if self.interactive:
+            self.exporter.write(fig, path, bbox_inches="tight", format=self.output_format)
             plt.show()
-        plt.close()
+            plt.close(fig)
+            return
+        # written in a background thread while the next figure is built, see export.py
+        self.exporter.submit(fig, path, bbox_inches="tight", format=self.output_format)
 
     def plot_loss_history(
         self, training_loss: npt.NDArray, validation_loss: npt.NDArray, name: str
     ):
-        plt.plot(np.arange(1, len(training_loss) + 1), training_loss, label="Training")
-        plt.plot(
+        fig = self._figure()
+        ax = fig.subplots()
+        ax.plot(np.arange(1, len(training_loss) + 1), training_loss, label="Training")
+        ax.plot(
             np.arange(1, len(validation_loss) + 1), validation_loss, label="Validation"
         )
-        plt.legend(loc="upper right")
-        plt.xlabel("Epoch")
-        plt.ylabel("Loss")
-        self._save_fig(name)
+        ax.legend(loc="upper right")
+        ax.set_xlabel("Epoch")
+        ax.set_ylabel("Loss")
+        self._save_fig(fig, name)
 
     def plot_loss_histories(
         self, loss_dict: dict[str, (npt.NDArray, npt.NDArray)], name: str
     ):
+        fig = self._figure()
+        ax = fig.subplots()
         for model_name, (train_loss, val_loss) in loss_dict.items():
-            c = next(plt.gca()._get_lines.prop_cycler)['color']
-            plt.plot(np.arange(1, len(train_loss) + 1), train_loss, color=c, label=f"{model_name} (Training)")
-            plt.plot(np.arange(1, len(val_loss) + 1), val_loss, color=c, ls=":", label=f"{model_name} (Validation)")
-        plt.legend(loc="upper right")
-        plt.xlabel("Epoch")
-        plt.ylabel("Loss")
-        self._save_fig(name)
+            c = next(ax._get_lines.prop_cycler)['color']
+            ax.plot(np.arange(1, len(train_loss) + 1), train_loss, color=c, label=f"{model_name} (Training)")
+            ax.plot(np.arange(1, len(val_loss) + 1), val_loss, color=c, ls=":", label=f"{model_name} (Validation)")
+        ax.legend(loc="upper right")
+        ax.set_xlabel("Epoch")
+        ax.set_ylabel("Loss")
+        self._save_fig(fig, name)
 
     def plot_regional_deposits(
-        self, deposits: npt.NDArray, mean: float, name: str, is_data: bool = False,
+        self, deposits: Union[npt.NDArray, SparseDeposits], mean: float, name: str, is_data: bool = False,
     ):
-        im = plt.imshow(
-            deposits.reshape(18, 14), vmin=0, vmax=deposits.max(), cmap="Purples"
+        deposits = as_image(deposits)
+        fig = self._figure()
+        ax = fig.subplots()
+        im = ax.imshow(
+            deposits, vmin=0, vmax=deposits.max(), cmap="Purples"
         )
-        ax = plt.gca()
         cbar = ax.figure.colorbar(im, ax=ax)
         cbar.ax.set_ylabel(r"Calorimeter E$_T$ deposit (GeV)")
-        plt.xticks(np.arange(14), labels=np.arange(4, 18))
-        plt.yticks(
+        ax.set_xticks(np.arange(14), labels=np.arange(4, 18))
+        ax.set_yticks(
             np.arange(18),
             labels=np.arange(18)[::-1],
             rotation=90,
             va="center",
         )
-        plt.xlabel(r"i$\eta$")
-        plt.ylabel(r"i$\phi$")
+        ax.set_xlabel(r"i$\eta$")
+        ax.set_ylabel(r"i$\phi$")
 
         if is_data:
             hep.cms.text('Preliminary', ax=ax, pad=0.05)
@@ -160,23 +187,29 @@ class Draw:
         # short title
         hep.add_text('2023 (13 TeV)', ax=ax, loc="over right")
 
-        self._save_fig(f'profiling-mean-deposits-{name}')
+        self._save_fig(fig, f'profiling-mean-deposits-{name}')
 
     def plot_spacial_deposits_distribution(
-        self, deposits: List[npt.NDArray], labels: List[str], name: str, apply_weights: bool = False
+        self,
+        deposits: List[Union[npt.NDArray, RegionOccupancy]],
+        labels: List[str],
+        name: str,
+        apply_weights: bool = False,
     ):
-        ax1 = plt.subplot(121)
-        ax2 = plt.subplot(122)
+        """
+        @param deposits: per label, either (n_events, 18, 14) deposits or a RegionOccupancy
+            accumulated from streamed batches.
+        """
+        fig = self._figure()
+        ax1, ax2 = fig.subplots(1, 2)
         for deposit, label in zip(deposits, labels):
-            bins = np.argwhere(deposit)
-            phi, eta = bins[:, 1], bins[:, 2]
-            if apply_weights:
-                weights = deposit[np.nonzero(deposit)]
-            else:
-                weights = np.ones(phi.shape)
+            if not isinstance(deposit, RegionOccupancy):
+                deposit = RegionOccupancy().update(deposit)
+            phi = np.arange(deposit.shape[0])
+            eta = np.arange(deposit.shape[1])
             ax1.hist(
                 eta + 4,
-                weights=weights,
+                weights=deposit.projection(1, weighted=apply_weights),
                 density=True,
                 facecolor=None,
                 bins=np.arange(4, 19),
@@ -185,7 +218,7 @@ class Draw:
             )
             ax2.hist(
                 phi,
-                weights=weights,
+                weights=deposit.projection(0, weighted=apply_weights),
                 density=True,
                 facecolor=None,
                 bins=np.arange(19),
@@ -195,14 +228,16 @@ class Draw:
         ax1.set_ylabel("a.u.")
         ax1.set_xlabel(r"i$\eta$")
         ax2.set_xlabel(r"i$\phi$")
-        plt.legend(loc="best")
-        self._save_fig(f'profiling-spacial-{name}')
+        ax2.legend(loc="best")
+        self._save_fig(fig, f'profiling-spacial-{name}')
 
     def plot_deposits_distribution(
         self, deposits: List[npt.NDArray], labels: List[str], name: str,
     ):
+        fig = self._figure()
+        ax = fig.subplots()
         for deposit, label in zip(deposits, labels):
-            plt.hist(
+            ax.hist(
                 deposit.reshape((-1)),
                 bins=100,
                 range=(0, 1024),
@@ -211,57 +246,69 @@ class Draw:
                 log=True,
                 histtype="step",
             )
-        plt.xlabel(r"E$_T$")
-        plt.legend(loc="best")
-        self._save_fig(f'profiling-deposits-{name}')
+        ax.set_xlabel(r"E$_T$")
+        ax.legend(loc="best")
+        self._save_fig(fig, f'profiling-deposits-{name}')
 
     def plot_cell_means(
-        self, deposits: npt.NDArray, name: str
+        self, deposits: Union[npt.NDArray, CellStatistics], name: str
     ):
-        d = np.squeeze(deposits, axis=-1)
-        means = np.mean(d, axis=0)
-        stds = np.std(d, axis=0)
-        sems = stds / np.sqrt(d.shape[0])
+        """
+        @param deposits: (n_events, 18, 14, 1) deposits or a CellStatistics accumulated from streamed batches.
+        """
+        if not isinstance(deposits, CellStatistics):
+            deposits = CellStatistics().update(deposits)
+        means = deposits.mean
+        sems = deposits.sem
 
         x = np.arange(36)
 
+        fig = self._figure()
+        ax = fig.subplots()
         for eta in range(7):
             m = np.concatenate([means[:, eta], means[:, 13-eta]])
             s = np.concatenate([sems[:, eta], sems[:, 13-eta]])
             l = m - s
             u = m + s
-            plt.plot(x, m)
-            plt.xlabel(r"i$\phi$")
-            plt.ylabel(r"Mean E$_T$ deposit (GeV)")
-            plt.fill_between(x, l, u, alpha=0.1, label=f'$i\eta={eta}$')
-        plt.axvline(x=17.5, ls=':', color='grey', alpha=0.5)
-        plt.gca().set_xticks(np.arange(36)[::2], np.concatenate([np.arange(18), np.arange(18)])[::2])
-        plt.legend(ncols=2)
-        self._save_fig(f'profiling-deposits-{name}')
+            ax.plot(x, m)
+            ax.set_xlabel(r"i$\phi$")
+            ax.set_ylabel(r"Mean E$_T$ deposit (GeV)")
+            ax.fill_between(x, l, u, alpha=0.1, label=f'$i\eta={eta}$')
+        ax.axvline(x=17.5, ls=':', color='grey', alpha=0.5)
+        ax.set_xticks(np.arange(36)[::2], np.concatenate([np.arange(18), np.arange(18)])[::2])
+        ax.legend(ncols=2)
+        self._save_fig(fig, f'profiling-deposits-{name}')
 
     def plot_cell_dists(
-        self, deposits: npt.NDArray, name: str
+        self, deposits: Union[npt.NDArray, CellStatistics], name: str
     ):
+        """
+        @param deposits: (n_events, 18, 14, 1) deposits or a CellStatistics accumulated from streamed batches.
+        """
         bins = np.arange(20) - 0.5
-        d = np.squeeze(deposits, axis=-1)
+        if not isinstance(deposits, CellStatistics):
+            deposits = CellStatistics(et_max=len(bins) - 2).update(deposits)
+        ets = np.arange(len(bins) - 1)
         for eta in range(1):
+            fig = self._figure()
+            ax = fig.subplots()
             for phi in range(2):
-                ets = d[:, phi, eta]
-                plt.hist(ets, bins, alpha=0.5, label=f'i\phi = {phi}')
-            plt.legend()
-            self._save_fig(f'et-dist-region-eta-{eta}')
+                counts = deposits.histogram(phi, eta)[:len(ets)]
+                ax.hist(ets, bins, weights=counts, alpha=0.5, label=f'i\phi = {phi}')
+            ax.legend()
+            self._save_fig(fig, f'et-dist-region-eta-{eta}')
 
     def plot_reconstruction_results(
         self,
-        deposits_in: npt.NDArray,
-        deposits_out: npt.NDArray,
+        deposits_in: Union[npt.NDArray, SparseDeposits],
+        deposits_out: Union[npt.NDArray, SparseDeposits],
         loss: float,
         name: str,
         is_data: bool = False,
     ):
-        fig, (ax1, ax2, ax3, cax) = plt.subplots(
-            ncols=4, figsize=(15, 10), gridspec_kw={"width_ratios": [1, 1, 1, 0.05]}
-        )
+        deposits_in, deposits_out = as_image(deposits_in), as_image(deposits_out)
+        fig = self._figure(figsize=(15, 10))
+        ax1, ax2, ax3, cax = fig.subplots(ncols=4, gridspec_kw={"width_ratios": [1, 1, 1, 0.05]})
         max_deposit = max(deposits_in.max(), deposits_out.max())
 
         if is_data:
@@ -274,14 +321,14 @@ class Draw:
         ax1.get_yaxis().set_visible(False)
         ax1.set_title("Original", fontsize=18, y=-0.1)
         ax1.imshow(
-            deposits_in.reshape(18, 14), vmin=0, vmax=max_deposit, cmap="Purples"
+            deposits_in, vmin=0, vmax=max_deposit, cmap="Purples"
         )
         
         ax2.get_xaxis().set_visible(False)
         ax2.get_yaxis().set_visible(False)
         ax2.set_title("Reconstructed", fontsize=18, y=-0.1)
         ax2.imshow(
-            deposits_out.reshape(18, 14), vmin=0, vmax=max_deposit, cmap="Purples"
+            deposits_out, vmin=0, vmax=max_deposit, cmap="Purples"
         )
 
         ax3.get_xaxis().set_visible(False)
@@ -289,7 +336,8 @@ class Draw:
         ax3.set_title(rf"|$\Delta$|, MSE: {loss: .2f}", fontsize=18, y=-0.1)
 
         im = ax3.imshow(
-            np.abs(deposits_in - deposits_out).reshape(18, 14),
+            # in float, unsigned integer deposits would wrap around
+            np.abs(np.subtract(deposits_in, deposits_out, dtype=np.float64)),
             vmin=0,
             vmax=max_deposit,
             cmap="Purples",
@@ -300,48 +348,51 @@ class Draw:
         fig.colorbar(im, cax=cax, ax=[ax1, ax2, ax3]).set_label(
             label=r"Calorimeter E$_T$ deposit (GeV)", fontsize=18
         )
-        self._save_fig(name)
+        self._save_fig(fig, name)
 
     def plot_individual_image(
         self,
-        deposits: npt.NDArray,
+        deposits: Union[npt.NDArray, SparseDeposits],
         name: str,
     ):
-
-        im = plt.imshow(
-            deposits.reshape(18, 14), vmin=0, vmax=deposits.max(), cmap="Purples"
+        deposits = as_image(deposits)
+        fig = self._figure()
+        ax = fig.subplots()
+        im = ax.imshow(
+            deposits, vmin=0, vmax=deposits.max(), cmap="Purples"
         )
 
-        ax = plt.gca()
         cbar = ax.figure.colorbar(im, ax=ax)
         cbar.set_ticks([])
         cbar.ax.set_ylabel(r"Energy deposit")
-        plt.xticks([])
-        plt.yticks([])
+        ax.set_xticks([])
+        ax.set_yticks([])
         ax.tick_params(length=0, width=0)
-        plt.xlabel(r"i$\eta$")
-        plt.ylabel(r"i$\phi$")
+        ax.set_xlabel(r"i$\eta$")
+        ax.set_ylabel(r"i$\phi$")
  
-        self._save_fig(name)
+        self._save_fig(fig, name)
 
     def plot_phi_shift_variance(
         self, losses: List[float], name: str
     ):
         x = np.arange(len(losses))
         loss_means = np.mean(losses, axis=1)
-        plt.plot(x, loss_means)
+        fig = self._figure()
+        ax = fig.subplots()
+        ax.plot(x, loss_means)
         loss_stds =  np.std(losses, axis=1)
         lower = loss_means - loss_stds / 2
         upper = loss_means + loss_stds / 2
-        plt.fill_between(x, lower, upper, alpha=0.1)
-        plt.xlabel(r"Shift [$\Delta$ i$\phi$]")
-        plt.gca().xaxis.set_major_locator(MaxNLocator(integer=True))
-        plt.ylabel(r"$\Delta_{rel} (MSE)$")
-        plt.axvline(x=0, color='grey', linestyle=':', label='Original')
-        plt.axvline(x=18, color='grey', linestyle=':')
-        plt.axhline(y=loss_means[0], color='grey', linestyle=':')
-        plt.legend()
-        self._save_fig(name)
+        ax.fill_between(x, lower, upper, alpha=0.1)
+        ax.set_xlabel(r"Shift [$\Delta$ i$\phi$]")
+        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+        ax.set_ylabel(r"$\Delta_{rel} (MSE)$")
+        ax.axvline(x=0, color='grey', linestyle=':', label='Original')
+        ax.axvline(x=18, color='grey', linestyle=':')
+        ax.axhline(y=loss_means[0], color='grey', linestyle=':')
+        ax.legend()
+        self._save_fig(fig, name)
 
 
     def plot_anomaly_score_distribution(
@@ -365,7 +416,9 @@ class Draw:
         @param xlabel: Label for the x-axis.
         @param left_legend_col: indices of entries for the left col of the legend (single legend if None)
         """
-        plt.figure(figsize=figsize)
+        fig = self._figure(figsize=figsize)
+        ax = fig.subplots()
+        bins = np.asarray(bins, dtype=np.float64)
         hs = {}
         for score, label in zip(scores, labels):
             label_ = self._get_label(label)
@@ -373,21 +426,22 @@ class Draw:
             if show_mean:
                 # label_ = f"{label_} ({get_rounded_str(np.mean(score))})",
                 label_ = f"{label_} ({get_rounded_str(np.average(score, weights=w))})",
-            _,_, hs[label] = plt.hist(
-                score.reshape((-1)),
-                bins=bins,
-                density=1,
+            # counts are binned in a thread pool and, with caching enabled, shared by all
+            # variants of the plot that use the same scores, bins and weights
+            counts = get_histogram(score, bins, w)
+            hs[label] = ax.stairs(
+                counts / (counts.sum() * np.diff(bins)),
+                bins,
                 label=label_,
-                log=True,
-                histtype="step",
                 linewidth=2,
-                color=self._get_process_color(label),
-                weights=w
+                color=self._get_process_color(label, ax),
             )
+        ax.set_yscale("log")
 
-        plt.xlabel(xlabel)
-        plt.ylabel("a.u.")
-        ax = plt.gca()
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel("a.u.")
+        # open boxes as for plt.hist(histtype="step") instead of the lines of unfilled stairs
+        handler_map = {StepPatch: HandlerPatch()}
 
         if left_legend_col is not None:
             # # sort labels by length
@@ -399,12 +453,16 @@ class Draw:
             left_keys = [labels[i] for i in left_legend_col]
             right_keys = [l for l in labels if l not in left_keys]
             print(f"Left legend keyzs: {left_keys}, Right legend keys: {right_keys}")
-            l2 = ax.legend(handles=[hs[k][0] for k in left_keys], loc="upper left", bbox_to_anchor=(0.0, 1.0))
-            l1 = ax.legend(handles=[hs[k][0] for k in right_keys], loc="upper right", bbox_to_anchor=(1.0, 1.0))
+            l2 = ax.legend(
+                handles=[hs[k] for k in left_keys], loc="upper left", bbox_to_anchor=(0.0, 1.0), handler_map=handler_map
+            )
+            l1 = ax.legend(
+                handles=[hs[k] for k in right_keys], loc="upper right", bbox_to_anchor=(1.0, 1.0), handler_map=handler_map
+            )
             ax.add_artist(l1)
             ax.add_artist(l2)
         else:
-            plt.legend(loc="upper right")
+            ax.legend(loc="upper right", handler_map=handler_map)
         ax.set_ylim(0.0000005, y_max)
 
         if xticks is not None:
@@ -412,12 +470,12 @@ class Draw:
         # else:
         #     ax.set_xticks(range(0, max(bins)+1, (max(bins)+1)//8))    
                 
-        hep.cms.text(self.cms_text, loc=0)
-        hep.add_text(self.lumi_text, loc="over right")
+        hep.cms.text(self.cms_text, loc=0, ax=ax)
+        hep.add_text(self.lumi_text, loc="over right", ax=ax)
 
-        plt.tight_layout()
+        fig.tight_layout()
         
-        self._save_fig(name)
+        self._save_fig(fig, name)
 
     
     def plot_roc_curves(
@@ -451,42 +509,43 @@ class Draw:
         @param show_auc: Whether to display the AUC in the legend.
         @param working_points: Dictionary of working points with their trigger rates drawn as vertival lines.
         """
-        plt.figure(figsize=figsize)
+        fig = self._figure(figsize=figsize)
+        ax = fig.subplots()
 
         for label, (fpr, tpr) in roc_dict.items():
             label_ = self._get_label(label)
             if show_auc:
                 auc_ = auc(fpr, tpr)
                 label_ = f"{label_} (AUC ={auc_: .2f})"
-            plt.plot(
+            ax.plot(
                 fpr * fpr_scale_factor,
                 tpr,
                 linestyle="-",
                 lw=2,
-                color=self._get_process_color(label),
+                color=self._get_process_color(label, ax),
                 alpha=0.8,
                 label=label_,
             )
         
         if roc_dict_alt is not None:
-            lines = plt.gca().get_lines()
+            lines = ax.get_lines()
             for i, (label, (fpr_alt, tpr_alt)) in enumerate(roc_dict_alt.items()):
                 label_ = self._get_label(label)
                 if show_auc:
                     auc_ = auc(fpr_alt, tpr_alt)
                     old_label = lines[i].get_label()
                     lines[i].set_label(old_label.replace(")", f" [{auc_:.2f}])"))
-                plt.plot(
+                ax.plot(
                     fpr_alt * fpr_scale_factor,
                     tpr_alt,
                     linestyle="--",
                     lw=2,
-                    color=self._get_process_color(label),
+                    color=self._get_process_color(label, ax),
                     alpha=0.5,
                 )
 
-        legend1 = plt.legend(loc='upper left')
-        plt.gca().add_artist(legend1)
+        legend1 = ax.legend(loc='upper left')
+        ax.add_artist(legend1)
 
         if alt_legend is not None:
             legend_elements = [
@@ -495,21 +554,21 @@ class Draw:
                 Line2D([0], [0], color='grey', linewidth=2, linestyle='--', 
                     label=self._get_label(alt_legend[1][1]))
             ]
-            plt.legend(
+            ax.legend(
                 handles=legend_elements,
                 title=alt_legend[0],
                 title_fontsize=20,
                 loc='lower right'
             )
 
-        plt.xlim(xrange)
-        plt.ylim(yrange)
+        ax.set_xlim(xrange)
+        ax.set_ylim(yrange)
         if xlog:
-            plt.xscale("log")
+            ax.set_xscale("log")
         if ylog:
-            plt.yscale("log")
-        plt.xlabel(xlabel)
-        plt.ylabel(ylabel)
+            ax.set_yscale("log")
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
 
         if working_points is not None:
             for rate, wp in working_points:
@@ -519,7 +578,7 @@ class Draw:
                 # the best tpr for the given rate
                 # best_tpr = max(tpr for f, t in roc_dict.values() if fpr[np.argmin(np.abs(fpr * 28610 - rate))] == rate)
                 print(f"Working point {wp} at rate {rate} kHz with TPR {best_tpr:.2f}")
-                plt.plot([rate, rate], [0, best_tpr], linestyle='--', color='grey', linewidth=1)
+                ax.plot([rate, rate], [0, best_tpr], linestyle='--', color='grey', linewidth=1)
                 # plt.axvline(
                 #     x=rate,
                 #     ymax=best_tpr,
@@ -551,9 +610,8 @@ class Draw:
             tick_labels_top = [str(x[0]) for x in working_points if x[1] != ""] + ['10', '100']
             tick_labels_bottom = [x[1] for x in working_points if x[1] != ""]
 
-            plt.xticks(tick_positions, tick_labels_top)
+            ax.set_xticks(tick_positions, tick_labels_top)
 
-            ax = plt.gca()
             for x_pos, label in zip([x[0] for x in working_points if x[1] != ""], tick_labels_bottom):
                 ax.annotate(
                     label,
@@ -567,10 +625,10 @@ class Draw:
                     annotation_clip=False,
                 )
 
-        hep.cms.text(self.cms_text, loc=0)
-        hep.add_text(self.lumi_text, loc="over right")
+        hep.cms.text(self.cms_text, loc=0, ax=ax)
+        hep.add_text(self.lumi_text, loc="over right", ax=ax)
 
-        self._save_fig(name)
+        self._save_fig(fig, name)
 
 
     def plot_roc_curve(
@@ -589,6 +647,8 @@ class Draw:
     ):
 
         skf = StratifiedKFold(n_splits=cv, shuffle=True, random_state=42)
+        fig = self._figure()
+        ax = fig.subplots()
         # for i, (y_true, y_pred, label, color) in enumerate(zip(
         #     y_trues, y_preds, labels, self.cmap
         # )):
@@ -606,24 +666,24 @@ class Draw:
                 roc_auc = auc(fpr, tpr)
                 extended_label = rf"{label} (AUC ={roc_auc: .2f})"
 
-            plt.plot(
+            ax.plot(
                 fpr * 28610,
                 tpr,
                 linestyle="-",
                 lw=2,
-                color=self._get_process_color(label),
+                color=self._get_process_color(label, ax),
                 alpha=0.8,
                 label=extended_label,
             )
 
             if y_preds_baseline is not None:
                 fpr_base, tpr_base, _ = roc_curve(y_true, y_preds_baseline[i])
-                plt.plot(
+                ax.plot(
                     fpr_base * 28610,
                     tpr_base,
                     linestyle="--",
                     lw=1.0,
-                    color=self._get_process_color(label),
+                    color=self._get_process_color(label, ax),
                     alpha=0.5,
                 )
 
@@ -637,15 +697,15 @@ class Draw:
         #     label="3 kHz",
         # )
 
-        plt.xlim([0.2, 100])
-        plt.ylim([0.001, 1.1])
-        plt.xscale("log")
-        plt.yscale("log")
-        plt.xlabel(xlabel)
-        plt.ylabel(ylabel)
+        ax.set_xlim([0.2, 100])
+        ax.set_ylim([0.001, 1.1])
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
 
-        first_legend = plt.legend(loc='lower right')
-        plt.gca().add_artist(first_legend)
+        first_legend = ax.legend(loc='lower right')
+        ax.add_artist(first_legend)
     
         # Add second legend (styles in grey)
         style_handles = [
@@ -655,30 +715,51 @@ class Draw:
         style_labels = [main_name, baseline_name]
 
         if y_preds_baseline is not None:
-            plt.legend(style_handles, style_labels, loc='upper left')
+            ax.legend(style_handles, style_labels, loc='upper left')
     
-        hep.cms.text('Preliminary', loc=0)
-        hep.add_text(r'2024 (13.6 TeV)', loc="over right")
+        hep.cms.text('Preliminary', loc=0, ax=ax)
+        hep.add_text(r'2024 (13.6 TeV)', loc="over right", ax=ax)
 
-        self._save_fig(name)
+        self._save_fig(fig, name)
 
 
     def plot_compilation_error(
-        self, scores_keras: npt.NDArray, scores_hls4ml: npt.NDArray, name: str
-    ):
-        plt.scatter(scores_keras, np.abs(scores_keras - scores_hls4ml), s=1)
-        plt.xlabel("Anomaly Score, $S$")
-        plt.ylabel("Error, $|S_{Keras} - S_{hls4ml}|$")
-        self._save_fig(f'compilation-error-{name}')
+        self, scores_keras: npt.NDArray, scores_hls4ml: npt.NDArray, name: str, bins: int = 100
+    ) -> dict:
+        """
+        2D density of the absolute error versus the score; the image is rasterised so the
+        figure size does not depend on the number of events.
+        Returns the summary of ErrorSummary (maximum and percentiles of the absolute error).
+        """
+        errors = np.abs(scores_keras - scores_hls4ml)
+        counts, x_edges, y_edges = np.histogram2d(scores_keras, errors, bins=bins)
+        counts = np.ma.masked_equal(counts, 0)
+        fig = self._figure()
+        ax = fig.subplots()
+        mesh = ax.pcolormesh(x_edges, y_edges, counts.T, norm=LogNorm(), cmap="Blues", rasterized=True)
+        fig.colorbar(mesh, ax=ax, label="Number of samples")
+        ax.set_xlabel("Anomaly Score, $S$")
+        ax.set_ylabel("Error, $|S_{Keras} - S_{hls4ml}|$")
+
+        summary = ErrorSummary().update(scores_keras, scores_hls4ml).summary()
+        ax.text(
+            0.95, 0.95,
+            f"max: {summary['max_abs_error']:.2g}\n99%: {summary['p99_abs_error']:.2g}",
+            transform=ax.transAxes, ha="right", va="top",
+        )
+        self._save_fig(fig, f'compilation-error-{name}')
+        return summary
 
     def plot_compilation_error_distribution(
         self, scores_keras: npt.NDArray, scores_hls4ml: npt.NDArray, name: str
     ):
-        plt.hist(scores_keras - scores_hls4ml, fc="none", histtype="step", bins=100)
-        plt.xlabel("Error, $S_{Keras} - S_{hls4ml}$")
-        plt.ylabel("Number of samples")
-        plt.yscale("log")
-        self._save_fig(f'compilation-error-dist-{name}')
+        fig = self._figure()
+        ax = fig.subplots()
+        ax.hist(scores_keras - scores_hls4ml, fc="none", histtype="step", bins=100)
+        ax.set_xlabel("Error, $S_{Keras} - S_{hls4ml}$")
+        ax.set_ylabel("Number of samples")
+        ax.set_yscale("log")
+        self._save_fig(fig, f'compilation-error-dist-{name}')
 
     def plot_cpp_model(self, hls_model, name: str):
         import hls4ml
@@ -695,24 +776,20 @@ class Draw:
         fpr_model: list = []
         tpr_model: list = []
 
-        scores_keras_normal = scores_keras["Background"]
-        scores_hls4ml_normal = scores_hls4ml["Background"]
+        # the background is sorted once per model and shared by all datasets
+        backgrounds = {
+            "Keras": SortedBackground(scores_keras["Background"]),
+            "hls4ml": SortedBackground(scores_hls4ml["Background"]),
+        }
 
+        fig = self._figure()
+        ax = fig.subplots()
         for dataset_name, color in zip(list(scores_keras.keys())[:-1], self.cmap):
-            scores_keras_anomaly = scores_keras[dataset_name]
-            scores_hls4ml_anomaly = scores_hls4ml[dataset_name]
-
-            y_true = np.append(
-                np.zeros(len(scores_keras_normal)), np.ones(len(scores_hls4ml_anomaly))
-            )
-            y_score_keras = np.append(scores_keras_normal, scores_keras_anomaly)
-            y_score_hls = np.append(scores_hls4ml_normal, scores_hls4ml_anomaly)
-
-            for y_scores, model, ls in zip(
-                [y_score_keras, y_score_hls], ["Keras", "hls4ml"], ["-", "--"]
+            for scores_anomaly, model, ls in zip(
+                [scores_keras[dataset_name], scores_hls4ml[dataset_name]], ["Keras", "hls4ml"], ["-", "--"]
             ):
-                fpr, tpr, thresholds = roc_curve(y_true, y_scores)
-                plt.plot(
+                fpr, tpr = backgrounds[model].roc(scores_anomaly)
+                ax.plot(
                     fpr * 28.61,
                     tpr,
                     linestyle=ls,
@@ -722,21 +799,21 @@ class Draw:
                     ),
                 )
 
-        plt.plot(
+        ax.plot(
             [0.003, 0.003],
             [0, 1],
             linestyle="--",
             color="black",
             label="3 kHz trigger rate",
         )
-        plt.xlim([0.0002861, 28.61])
-        plt.ylim([0.01, 1.0])
-        plt.xscale("log")
-        plt.yscale("log")
-        plt.xlabel("Trigger Rate (MHz)")
-        plt.ylabel("Signal Efficiency")
-        plt.legend(loc="center left", bbox_to_anchor=(1, 0.5))
-        self._save_fig(f'compilation-roc-{name}')
+        ax.set_xlim([0.0002861, 28.61])
+        ax.set_ylim([0.01, 1.0])
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("Trigger Rate (MHz)")
+        ax.set_ylabel("Signal Efficiency")
+        ax.legend(loc="center left", bbox_to_anchor=(1, 0.5))
+        self._save_fig(fig, f'compilation-roc-{name}')
 
     def plot_output_reference(self):
         with open("misc/output-reference.txt") as f:
@@ -761,15 +838,16 @@ class Draw:
             ),
             Patch(facecolor=self.cmap[3], edgecolor=self.cmap[3], label="Reserved"),
         ]
-        plt.figure(figsize=(25, 5))
-        plt.pcolor(
+        fig = self._figure(figsize=(25, 5))
+        ax = fig.subplots()
+        ax.pcolor(
             data, edgecolors="black", alpha=0.6, cmap=ListedColormap(self.cmap[:4])
         )
-        plt.xticks([])
-        plt.yticks([])
+        ax.set_xticks([])
+        ax.set_yticks([])
         for y in range(data.shape[0]):
             for x in range(data.shape[1]):
-                plt.text(
+                ax.text(
                     x + 0.5,
                     y + 0.5,
                     abs(y * 32 + x - 191),
@@ -777,7 +855,7 @@ class Draw:
                     fontsize=16,
                     verticalalignment="center",
                 )
-        plt.legend(
+        ax.legend(
             handles=legend_elements,
             bbox_to_anchor=(0, 0),
             loc="upper left",
@@ -785,23 +863,25 @@ class Draw:
             ncol=4,
             borderaxespad=0,
         )
-        self._save_fig('ugt-link-reference')
+        self._save_fig(fig, 'ugt-link-reference')
 
     def plot_results_supervised(
         self, grid: npt.NDArray, models: list[str], datasets: list[str], name: str
     ):
-        plt.imshow(grid, alpha=0.7, cmap="RdYlGn")
-        plt.xticks(
+        fig = self._figure()
+        ax = fig.subplots()
+        ax.imshow(grid, alpha=0.7, cmap="RdYlGn")
+        ax.set_xticks(
             np.arange(len(models)),
             labels=models,
             rotation=45,
             ha="right",
             rotation_mode="anchor",
         )
-        plt.yticks(np.arange(len(datasets)), labels=datasets)
+        ax.set_yticks(np.arange(len(datasets)), labels=datasets)
         for i in range(len(datasets)):
             for j in range(len(models)):
-                text = plt.text(
+                text = ax.text(
                     j,
                     i,
                     "{0:.3f}".format(grid[i, j]),
@@ -810,7 +890,7 @@ class Draw:
                     color="black",
                     size=16,
                 )
-        self._save_fig(f'supervised-{name}')
+        self._save_fig(fig, f'supervised-{name}')
 
     def make_equivariance_plot(
         self,
@@ -820,9 +900,8 @@ class Draw:
         name: str
     ):
 
-        fig, axs = plt.subplots(
-            nrows=2, ncols=4, figsize=(15, 10), gridspec_kw={"width_ratios": [1, 1, 1, 0.05]}
-        )
+        fig = self._figure(figsize=(15, 10))
+        axs = fig.subplots(nrows=2, ncols=4, gridspec_kw={"width_ratios": [1, 1, 1, 0.05]})
         max_deposit = image.max()
         xmax, ymax, _ = image.shape
 
@@ -880,149 +959,52 @@ class Draw:
                 ax.get_xaxis().set_visible(False)
                 ax.get_yaxis().set_visible(False)
 
-        self._save_fig(name)
-
-
-    def make_unrolling_plot(self, deposits: npt.NDArray, name: str, make_animation=False):
-
-        def _draw_angle_arcs(ax_, theta_=65, phi_=45):
-            # Draw beam  axis
-            ax_.plot((-0.2, 1.2), (0, 0), (0, 0), color='black')
-            # ax_.text(0, 0, 0, 'Beam Axis', color='black', fontsize=12)
-
-            # Define a point on the surface of the cylinder
-            # Choose a specific angle (for example, 45 degrees) and height (for example, half the height)
-            my_phi = np.deg2rad(phi_)
-            my_theta = np.deg2rad(theta_)
-            surface_height = n_eta / 2
-
-            # Coordinates of the point on the surface
-            r = 1 / np.sin(my_theta)
-            x_surface = r * np.sin(my_theta) * np.cos(my_phi)
-            y_surface = r * np.sin(my_theta) * np.sin(my_phi)
-            z_surface = r * np.cos(my_theta)
-
-            # Draw red arrows
-            ax_.quiver(0.5, 0, 0, z_surface, x_surface, y_surface, color='r', arrow_length_ratio=0.1)
-            ax_.quiver(0.5+z_surface, 0, 0, 0, x_surface, y_surface, color='r', arrow_length_ratio=0.1, linestyle=':')
-
-            # Draw labeled archs for the angles
-            angle_radius = 0.3
-            phis = np.linspace(my_phi, np.pi, 100)
-            if abs(my_phi) > np.pi:
-                phis = np.linspace(np.pi, my_phi+2*np.pi, 100)
-            phi_arc_x = angle_radius * np.cos(phis)
-            phi_arc_y = angle_radius * np.sin(phis)
-            phi_arc_z = np.ones_like(phi_arc_x) * r * np.cos(my_theta) + 0.5
-            ax_.plot(phi_arc_z, phi_arc_x, phi_arc_y, color='blue', linewidth=2, label='Polar Angle')
-            ax_.text(phi_arc_z[0], phi_arc_x[0], phi_arc_y[0], r"$\phi$", color='blue', fontsize=18)
-
-            theta_arc_grid = np.linspace(0, my_theta, 100)
-            theta_arc_x = angle_radius * np.sin(theta_arc_grid) * np.cos(my_phi)
-            theta_arc_y = angle_radius * np.sin(theta_arc_grid) * np.sin(my_phi)
-            theta_arc_z = angle_radius * np.cos(theta_arc_grid) + 0.5
-            ax_.plot(theta_arc_z, theta_arc_x, theta_arc_y, color='blue', linewidth=2, label='Polar Angle')
-            ax_.text(theta_arc_z[50], theta_arc_x[50], theta_arc_y[50], r"$\theta$", color='blue', fontsize=18)
-
-        def _draw_red_square(ax_, i_eta, i_phi):
-            for r in ax_.patches:
-                r.remove()
-            rect = Rectangle((i_eta-0.5, i_phi-0.5), 1, 1, linewidth=2, edgecolor='r', facecolor='none')
-            ax_.add_patch(rect)
-            
-        # Define the grid dimensions (cylinder height and unrolled grid size)
-        n_phi, n_eta = deposits.shape
-
-        # Create cylindrical coordinates for the 3D plot
-        theta = np.linspace(0, 2 * np.pi, n_phi)  # Circumference angles
-        z_cyl = np.linspace(0, 1, n_eta)  # Height values
-        Z_cyl, Theta = np.meshgrid(z_cyl, theta)
-
-        # Convert cylindrical coordinates to Cartesian for plotting
-        X_cyl = np.cos(Theta)  # X-coordinates on cylinder's surface (for circular shape)
-        Y_cyl = np.sin(Theta)  # Y-coordinates on cylinder's surface
-
-        spec = gridspec.GridSpec(
-            ncols=2, nrows=1,
-            width_ratios=[2, 1.8], wspace=0.1,
-        )
-
-        fig = plt.figure(figsize=(12, 6))
-        fig.subplots_adjust(left=0, bottom=0.05, right=1, top=0.95, wspace=None, hspace=0.1)
-
-        ax1 = fig.add_subplot(spec[0], projection='3d')
-        ax2 = fig.add_subplot(spec[1])
+        self._save_fig(fig, name)
 
-        # Initial plot for the cylinder
-        surf = ax1.plot_surface(Z_cyl, X_cyl, Y_cyl, facecolors=plt.cm.Purples(deposits), 
-                                rstride=1, cstride=1, alpha=0.6, linewidth=0)
-        ax1.set_title('CMS Calorimeter (Schematic)', fontsize=18)
-        ax1.set_axis_off() 
-        ax1.view_init(elev=30, azim=-60)
-        ax1.dist = 8
 
-        _draw_angle_arcs(ax1, phi_=45)
-
-        # Initial plot for the unrolled grid
-        im = ax2.imshow(deposits, cmap='Purples', aspect='auto')
-        ax2.set_title('Unrolled Input', fontsize=18)
-        ax2.set_xlabel(r"i$\eta$", fontsize=18)
-        ax2.set_ylabel(r"i$\phi$", fontsize=18)
-
-        # Draw red square in unrolled image
-        _draw_red_square(ax2, 12, 6)
-
-        cbar = ax2.figure.colorbar(im, ax=ax2)
-        cbar.set_ticks([])
-        cbar.ax.set_ylabel(r"Energy deposit", fontsize=18)
-        plt.xticks([])
-        plt.yticks([])
+    def make_unrolling_plot(
+        self,
+        deposits: npt.NDArray,
+        name: str,
+        make_animation=False,
+        n_frames: int = None,
+        dpi: float = 100,
+        workers: int = None,
+        animation_format: str = "gif",
+    ):
+        """
+        @param n_frames: frames for one full turn of the cylinder, by default 4 per iphi.
+        @param dpi: resolution of the animation frames.
+        @param workers: processes rendering the animation frames, by default one per core.
+        @param animation_format: "gif" or "mp4" (requires imageio-ffmpeg).
+        """
+        fig = self._figure(figsize=(12, 6))
+        fig, ax1, ax2, im = animation.setup_unrolling_figure(deposits, figure=fig)
 
         if not make_animation:
-            self._save_fig(name)
+            self._save_fig(fig, name)
             return
 
-        rate_3d = 4
-        n_frames = n_phi * rate_3d
-
-        def update(frame):
-            # Update the angle of the cylinder
-            angle = (-1) * frame * (2 * np.pi / n_frames)  # Total 100 frames for one full rotation
-            new_theta = theta + angle  # Shift angles for the cylinder surface
-
-            # new_Theta, _ = np.meshgrid(new_theta, z_cyl)
-            _, new_Theta = np.meshgrid(z_cyl, new_theta)
-
-            # Update the cylinder surface with new theta
-            X_cyl_new = np.cos(new_Theta)  # New X-coordinates
-            Y_cyl_new = np.sin(new_Theta)  # New Y-coordinates
-
-            ax1.cla()  # Clear the previous plot
-            ax1.plot_surface(Z_cyl, X_cyl_new, Y_cyl_new, facecolors=plt.cm.Purples(deposits), 
-                             rstride=1, cstride=1, alpha=0.6, linewidth=0)
-            ax1.set_axis_off() 
-            ax1.set_title('CMS Calorimeter (Schematic)', fontsize=18)
-            _draw_angle_arcs(ax1, phi_=np.rad2deg(angle)+45)
-
-            # Update the unrolled image based on the rolling motion
-            if (frame % rate_3d) == 0:
-                shift = int(frame / rate_3d) % n_phi  # Shift amount for unrolled grid
-                shifted_Z = np.roll(deposits, shift, axis=0)  # Apply circular permutation along y-axis
-                im.set_array(shifted_Z)  # Update the image
-
-                _draw_red_square(ax2, 12, (6+shift) % n_phi)
+        if self.interactive:
+            geometry = animation.unrolling_geometry(deposits, n_frames)
 
-        # Create the animation
-        ani = FuncAnimation(fig, update, frames=n_frames, blit=False, interval=100)
+            def update(frame):
+                animation.draw_unrolling_frame(ax1, ax2, im, deposits, geometry, frame)
 
-        if self.interactive:
+            ani = FuncAnimation(fig, update, frames=len(geometry["angles"]), blit=False, interval=100)
             plt.show()
-        else:
-            ani.save(
-                f"{self.output_dir}/{self._parse_name(name)}.gif"
-            )
+            plt.close(fig)
+            return
 
-        plt.close()
+        # the frames are drawn into figures of their own, see animation.py
+        with profiling.timer("savefig"):
+            animation.save_unrolling_animation(
+                deposits,
+                f"{self.output_dir}/{self._parse_name(name)}.{animation_format}",
+                n_frames=n_frames,
+                dpi=dpi,
+                workers=workers,
+            )
 
 
     def plot_rate_vs_threshold(
@@ -1045,7 +1027,7 @@ class Draw:
             ylabel: Optional alternative Y-axis label.
         """
         # Create figure with GridSpec for subplot control
-        fig = plt.figure(figsize=(10, 8))
+        fig = self._figure(figsize=(10, 8))
         gs = gridspec.GridSpec(2, 1, height_ratios=[3, 1], hspace=0.05)
         
         # Create main plot and ratio plot with shared x-axis
@@ -1106,8 +1088,8 @@ class Draw:
         hep.cms.text('Preliminary', loc=0, ax=ax_main)
         hep.add_text(r'2024 (13.6 TeV)', ax=ax_main, loc="over right")
         
-        plt.tight_layout()
-        self._save_fig(name)
+        fig.tight_layout()
+        self._save_fig(fig, name)
 
 
     def make_teacher_student_scatter_plot(
@@ -1119,22 +1101,23 @@ class Draw:
         ylabel: str = "Student Score",
         cutoff: float = 150,
     ):
-        plt.figure(figsize=(9.5, 6))
-        plt.hexbin(teacher_scores, student_scores, gridsize=50, cmap='Blues', bins='log', mincnt=1)
+        fig = self._figure(figsize=(9.5, 6))
+        ax = fig.subplots()
+        hb = ax.hexbin(teacher_scores, student_scores, gridsize=50, cmap='Blues', bins='log', mincnt=1)
 
         # add digonal line in grey
-        plt.plot([0, cutoff], [0, cutoff], color='grey', linestyle='--', linewidth=1, alpha=0.8)
-        plt.colorbar()
-        plt.xlabel(xlabel)
-        plt.ylabel(ylabel)
-        plt.gca().set_xlim(0, cutoff)
-        plt.gca().set_ylim(0, cutoff)
-
-        hep.cms.text(self.cms_text, loc=0)
+        ax.plot([0, cutoff], [0, cutoff], color='grey', linestyle='--', linewidth=1, alpha=0.8)
+        fig.colorbar(hb, ax=ax)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.set_xlim(0, cutoff)
+        ax.set_ylim(0, cutoff)
+
+        hep.cms.text(self.cms_text, loc=0, ax=ax)
         # hep.cms.lumitext(self.lumi_text)
-        hep.add_text(self.lumi_text, loc="over right")
+        hep.add_text(self.lumi_text, loc="over right", ax=ax)
 
-        self._save_fig(name)
+        self._save_fig(fig, name)
 
 
     def make_npv_reweighting_plot(self, npv_dict: dict, et_dict, weight_dict: dict, name: str = "npv_reweighting"):
@@ -1144,16 +1127,18 @@ class Draw:
         npv_base_line = npv_dict["ZB-masked"]
         et_base_line = et_dict["ZB-masked"]
 
-        fig, axs = plt.subplots(2, 2, figsize=(16, 16))
+        fig = self._figure(figsize=(16, 16))
+        axs = fig.subplots(2, 2)
         for name, npv in npv_dict.items():
-            axs[0, 0].hist(npv, bins=npv_bins, histtype="step", label=self._get_label(name), density=True, color=self._get_process_color(name))
-            w = weight_dict[name] if name in weight_dict else None
-            axs[1, 0].hist(npv, bins=npv_bins, histtype="step", label=self._get_label(name), density=True, color=self._get_process_color(name), weights=w)
+            axs[0, 0].hist(npv, bins=npv_bins, histtype="step", label=self._get_label(name), density=True, color=self._get_process_color(name, axs[0, 0]))
+            # weights are stored as float32, np.histogram would also sum them in float32
+            w = np.asarray(weight_dict[name], dtype=np.float64) if name in weight_dict else None
+            axs[1, 0].hist(npv, bins=npv_bins, histtype="step", label=self._get_label(name), density=True, color=self._get_process_color(name, axs[1, 0]), weights=w)
 
         for name, et in et_dict.items():
-            axs[0, 1].hist(et, bins=et_bins, histtype="step", label=self._get_label(name), density=True, color=self._get_process_color(name))
-            w = weight_dict[name] if name in weight_dict else None
-            axs[1, 1].hist(et, bins=et_bins, histtype="step", label=self._get_label(name), density=True, color=self._get_process_color(name), weights=w)
+            axs[0, 1].hist(et, bins=et_bins, histtype="step", label=self._get_label(name), density=True, color=self._get_process_color(name, axs[0, 1]))
+            w = np.asarray(weight_dict[name], dtype=np.float64) if name in weight_dict else None
+            axs[1, 1].hist(et, bins=et_bins, histtype="step", label=self._get_label(name), density=True, color=self._get_process_color(name, axs[1, 1]), weights=w)
 
         axs[0, 0].set_xlabel("Number of Primary Vertices (nPV)")
         axs[0, 0].set_ylabel("Events (Normalized)")
@@ -1171,7 +1156,7 @@ class Draw:
         axs[1, 1].set_ylabel("Events (Normalized)")
         axs[1, 1].legend()
 
-        plt.tight_layout()
+        fig.tight_layout()
         plt.show()
 
 
@@ -1182,6 +1167,7 @@ class Draw:
         et_base_line = et_dict["ZB-masked"]
 
         def get_hist(data, bins, weights=None):
+            weights = None if weights is None else np.asarray(weights, dtype=np.float64)
             counts, edges = np.histogram(data, bins=bins, weights=weights)
             total = weights.sum() if weights is not None else counts.sum()
             counts = counts / total if total > 0 else counts
@@ -1208,7 +1194,7 @@ class Draw:
             ax_ratio.tick_params(axis='y', labelsize=7)
             return ax_main, ax_ratio
 
-        fig = plt.figure(figsize=(16, 18))
+        fig = self._figure(figsize=(16, 18))
 
         # Each column: 85% main, 15% ratio
         gs_tl = fig.add_gridspec(2, 1, left=0.05, right=0.48, top=0.95, bottom=0.52, hspace=0.05, height_ratios=[5, 1])
@@ -1223,7 +1209,7 @@ class Draw:
 
         def draw_hists(ax_main, ax_ratio, data_dict, bins, base_counts, centers, weight_dict=None):
             for key, data in data_dict.items():
-                color = self._get_process_color(key)
+                color = self._get_process_color(key, ax_main)
                 label = self._get_label(key)
                 w = weight_dict.get(key, None) if weight_dict else None
                 counts, centers_ = get_hist(data, bins, weights=w)
@@ -1267,5 +1253,5 @@ class Draw:
         ax_et_rw.legend(fontsize=8)
         ax_et_rw_ratio.set_xlabel("Reweighted ET")
 
-        plt.savefig(f"{name}.png", dpi=150, bbox_inches='tight')
+        fig.savefig(f"{name}.png", dpi=150, bbox_inches='tight')
         plt.show()
@@ -0,0 +1,263 @@
+"""
+Writing figures off the critical path.
+Rendering a finished figure to PNG and PDF (Agg rasterisation, zlib/deflate
+compression, font subsetting) takes about as long as building it. The exporter
+encodes and writes all formats of a figure in a background thread while the
+caller builds the next figure.
+
+    fig = export.figure(figsize=(7, 7))
+    ax = fig.subplots()
+    ...
+    export.save(fig, [f"{output}.pdf", f"{output}.png"], bbox_inches="tight")
+    ...
+    export.flush()  # wait for all files, re-raising the first error, and report them
+
+Figures written in the background must be built with figure() (or a Figure
+with its own canvas) rather than through pyplot: they are then never the
+current figure, so no pyplot call in the main thread draws into them while
+they are rendered. Draw and the plotting scripts only use pyplot to show
+figures interactively, where Draw writes them synchronously before showing.
+Figures must not be modified after they are handed to the exporter, and
+rcParams should not be changed while exports are pending. matplotlib keeps its
+fonts per thread but parses mathtext with one shared parser, so parsing is
+serialised here.
+
+In vector formats, artists with more path vertices than the RasterPolicy budget
+(per-event scatter plots, hexbins, million-point ROC curves) are rasterised,
+while axes, ticks and text stay vector. The size and write time of every file
+are reported by flush().
+"""
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Union
+
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import Collection, QuadMesh
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.mathtext import MathTextParser
+from matplotlib.patches import Patch
+
+import profiling
+
+VECTOR_FORMATS = {"pdf", "svg", "svgz", "eps", "ps"}
+
+_mathtext_lock = threading.Lock()
+_parse_mathtext = MathTextParser._parse_cached
+
+
+def _parse_mathtext_locked(self, s, dpi, prop):
+    with _mathtext_lock:
+        return _parse_mathtext(self, s, dpi, prop)
+
+
+# the parser keeps its state in one instance shared by all threads
+MathTextParser._parse_cached = _parse_mathtext_locked
+
+
+def figure(**kwargs) -> Figure:
+    """
+    Figure(**kwargs) with an Agg canvas of its own, outside of pyplot's figure management.
+    """
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def count_vertices(artist) -> int:
+    """
+    Number of path vertices a vector backend writes for a data artist.
+    """
+    if isinstance(artist, QuadMesh):
+        coordinates = artist.get_coordinates()
+        return 4 * (coordinates.shape[0] - 1) * (coordinates.shape[1] - 1)
+    if isinstance(artist, Collection):
+        paths = artist.get_paths()
+        if not paths:
+            return 0
+        n_vertices = sum(len(p.vertices) for p in paths)
+        # one marker path is drawn at each offset
+        n_offsets = len(artist.get_offsets())
+        if n_offsets > len(paths):
+            return n_offsets * n_vertices // len(paths)
+        return n_vertices
+    if isinstance(artist, (Line2D, Patch)):
+        return len(artist.get_path().vertices)
+    return 0
+
+
+@dataclass(frozen=True)
+class RasterPolicy:
+    """
+    Rasterise artists with more than max_vertices vertices at dpi in vector outputs.
+    """
+    max_vertices: int = 20_000
+    dpi: int = 300
+
+    def dense_artists(self, fig: Figure) -> list:
+        """
+        Data artists (lines, collections, patches) above the budget that are not rasterised yet.
+        """
+        artists = []
+        for ax in fig.axes:
+            for artist in (*ax.lines, *ax.collections, *ax.patches):
+                if artist.get_visible() and not artist.get_rasterized() and count_vertices(artist) > self.max_vertices:
+                    artists.append(artist)
+        return artists
+
+
+def _format(path: str, savefig_kwargs: dict) -> str:
+    return savefig_kwargs.get("format") or os.path.splitext(path)[1].lstrip(".")
+
+
+def write(fig: Figure, paths: List[str], savefig_kwargs: dict, policy: RasterPolicy = None) -> List[dict]:
+    """
+    Save fig to each path, rasterising dense artists in vector formats according to
+    `policy`, and return one {path, format, bytes, seconds, rasterized} record per file.
+    """
+    records = []
+    for path in paths:
+        fmt = _format(path, savefig_kwargs)
+        kwargs = {**savefig_kwargs, "format": fmt}
+        dense = policy.dense_artists(fig) if policy is not None and fmt in VECTOR_FORMATS else []
+        if dense:
+            kwargs.setdefault("dpi", policy.dpi)
+        start = time.perf_counter()
+        try:
+            for artist in dense:
+                artist.set_rasterized(True)
+            fig.savefig(path, **kwargs)
+        finally:
+            # the figure may be refilled and saved again, e.g. by a templates.FigureTemplate
+            for artist in dense:
+                artist.set_rasterized(False)
+        records.append({
+            "path": path,
+            "format": fmt,
+            "bytes": os.path.getsize(path),
+            "seconds": time.perf_counter() - start,
+            "rasterized": len(dense),
+        })
+    return records
+
+
+def format_record(record: dict) -> str:
+    rasterized = f", {record['rasterized']} dense artists rasterised" if record["rasterized"] else ""
+    return f"Saved {record['path']} ({record['bytes'] / 2**20:.2f} MiB in {record['seconds']:.2f} s{rasterized})"
+
+
+class FigureExporter:
+    """
+    Saves figures in a pool of `workers` threads; workers=0 saves synchronously,
+    e.g. for figures that are built through pyplot.
+    One figure's formats are written one after the other by the same thread, so
+    several workers only help when many figures are queued.
+    Dense artists are rasterised in vector formats according to `raster_policy`
+    (None keeps everything vector), and a line with the size and write time of
+    every file is printed when the exports are flushed unless verbose is False.
+    """
+
+    def __init__(self, workers: int = 1, raster_policy: RasterPolicy = RasterPolicy(), verbose: bool = True):
+        self.workers = workers
+        self.raster_policy = raster_policy
+        self.verbose = verbose
+        # {path, format, bytes, seconds, rasterized} of every file written so far
+        self.records: List[dict] = []
+        self._executor = None
+        self._pending: List[Future] = []
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export")
+        return self._executor
+
+    def _raise_failed(self) -> None:
+        """
+        Re-raise the error of an export that already failed, so that a broken
+        output path stops the script at the next figure instead of at the end.
+        """
+        with self._lock:
+            failed = [f for f in self._pending if f.done() and f.exception() is not None]
+            if failed:
+                self._pending.remove(failed[0])
+        if failed:
+            raise failed[0].exception()
+
+    def _record(self, records: List[dict]) -> None:
+        self.records.extend(records)
+        if self.verbose:
+            for record in records:
+                print(format_record(record))
+
+    def write(self, fig: Figure, paths: Union[str, List[str]], **savefig_kwargs) -> List[dict]:
+        """
+        Save `fig` to each of `paths` right away, e.g. before showing it interactively.
+        """
+        paths = [paths] if isinstance(paths, str) else list(paths)
+        with profiling.timer("savefig"):
+            records = write(fig, paths, savefig_kwargs, self.raster_policy)
+        self._record(records)
+        return records
+
+    def submit(self, fig: Figure, paths: Union[str, List[str]], **savefig_kwargs) -> Future:
+        """
+        Close `fig` in pyplot if it was made there and write it to each of `paths` (the format
+        follows the extension unless `format` is given), in the background if workers >= 1.
+        """
+        self._raise_failed()
+        paths = [paths] if isinstance(paths, str) else list(paths)
+        plt.close(fig)
+        if self.workers == 0:
+            future = Future()
+            future.set_result(self.write(fig, paths, **savefig_kwargs))
+            return future
+        future = self._get_executor().submit(write, fig, paths, savefig_kwargs, self.raster_policy)
+        with self._lock:
+            self._pending.append(future)
+        return future
+
+    def flush(self) -> List[dict]:
+        """
+        Wait for all pending exports and return the records of the files they wrote.
+        The first error of a failed export is raised after all others finished.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return []
+        written, error = [], None
+        with profiling.timer("savefig.flush"):
+            for future in pending:
+                try:
+                    written.extend(future.result())
+                except Exception as e:
+                    error = error or e
+        self._record(written)
+        if error is not None:
+            raise error
+        return written
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+EXPORTER = FigureExporter()
+save = EXPORTER.submit
+flush = EXPORTER.flush
+
+
+@atexit.register
+def _flush_at_exit():
+    # last resort for callers that never flush; errors are printed by atexit
+    EXPORTER.close()
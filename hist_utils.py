@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+
+import caching
+import histstore
+import loading
+import profiling
+
+
+def npv_slice(counts, npv_edges, npv_min=None, npv_max=None):
+    """
+    Sum a histogram with an nPV axis over npv_min <= nPV <= npv_max.
+    `counts` has the nPV axis last and includes its under- and overflow bins,
+    i.e. shape (..., len(npv_edges) + 1). nPV is integer valued, so a bin is
+    kept if all the integers it holds pass the cut, whatever the binning
+    (0, 1, 2, ... or -0.5, 0.5, ... or coarser); a bin holding integers on both
+    sides of the cut raises. None includes everything on that side.
+    Costs O(bins), independent of the number of events.
+    """
+    if npv_min is None and npv_max is None:
+        return counts.sum(axis=-1)
+    npv_edges = np.asarray(npv_edges, dtype=np.float64)
+    # bins [low, high) from the underflow (nPV >= 0) to the overflow
+    lows = np.r_[0.0, npv_edges]
+    highs = np.r_[npv_edges, np.inf]
+    first, last = np.ceil(lows), np.ceil(highs) - 1  # integers in each bin
+    low_cut = -np.inf if npv_min is None else npv_min
+    high_cut = np.inf if npv_max is None else npv_max
+    empty = first > last
+    inside = ~empty & (first >= low_cut) & (last <= high_cut)
+    outside = empty | (last < low_cut) | (first > high_cut)
+    split = ~(inside | outside)
+    if split.any():
+        i = int(np.argmax(split))
+        raise ValueError(
+            f"nPV cut [{npv_min}, {npv_max}] splits the nPV bin [{lows[i]:g}, {highs[i]:g}); "
+            "choose a cut on the bin boundaries"
+        )
+    return counts[..., inside].sum(axis=-1)
+
+
+def _read_hists(path, keys):
+    """
+    {key: (values with flow bins, [edges of each axis])} of the keys found in a ROOT file or a histstore database.
+    With caching enabled (e.g. in plot_server.py), a file is only read again once it changed.
+    """
+    st = os.stat(path)
+    return _read_hists_version(path, list(keys), st.st_size, st.st_mtime_ns)
+
+
+@caching.memoized()
+def _read_hists_version(path, keys, size, mtime_ns):
+    # size and mtime_ns only identify the version of the file for the cache
+    hists = {}
+    if histstore.is_store(path):
+        with histstore.HistogramStore(path) as store:
+            for key in keys:
+                if key in store:
+                    h = store.get(key)
+                    hists[key] = (h.values, list(h.edges))
+        return hists
+    with loading.open_file(path) as f:
+        for key in keys:
+            if key in f:
+                h = f[key]
+                hists[key] = (h.values(flow=True), [axis.edges() for axis in h.axes])
+    return hists
+
+
+@profiling.profiled()
+def load_root_hists(root_file, hist_key, triggers, npv_min=None, npv_max=None):
+    """
+    Load histograms from ROOT file (or the merged view of a histstore.HistogramStore
+    .sqlite file) into a dict keyed by trigger name.
+    Histograms can either be 1D, or 2D with the nPV distribution on the y axis,
+    in which case the range npv_min <= nPV <= npv_max is projected out.
+    Returns dict: {trigger: (counts, bins)}
+    """
+    keys = {trigger: f"{trigger}_{hist_key}" for trigger in triggers}
+    found = _read_hists(root_file, keys.values())
+    hists = {}
+    for trigger, key in keys.items():
+        if key not in found:
+            print(f"  WARNING: key '{key}' not found in ROOT file, skipping.")
+            continue
+        # drop the flow bins of the observable, keep them for nPV
+        values, edges = found[key]
+        counts = values[1:-1]
+        if len(edges) == 1:
+            if npv_min is not None or npv_max is not None:
+                raise ValueError(f"'{key}' in {root_file} has no nPV axis, cannot apply an nPV cut")
+        else:
+            counts = npv_slice(counts, edges[1], npv_min, npv_max)
+        hists[trigger] = (counts, edges[0])
+    return hists
+
+
+def add_npv_arguments(parser):
+    parser.add_argument(
+        "--npv-min",
+        type=int,
+        default=None,
+        help="Only use events with nPV >= this value (requires histograms with an nPV axis)"
+    )
+    parser.add_argument(
+        "--npv-max",
+        type=int,
+        default=None,
+        help="Only use events with nPV <= this value (requires histograms with an nPV axis)"
+    )
@@ -0,0 +1,367 @@
+"""
+Incremental store of the histograms behind the hists_plot*.root inputs.
+Every source (one file of histograms per run or per ntuple file) contributes
+a partial histogram per key, kept in SQLite with its provenance (path, size,
+mtime, content hash, number of events). The merged histograms are kept as
+well and are updated when a source is added, removed or changed. Syncing with
+the current list of files therefore only reads the new or changed ones, and the plot scripts
+read the merged view directly (hist_utils.load_root_hists takes the .sqlite
+path) or from a ROOT file written with the same key naming.
+
+    python3 histstore.py runs/2025-07-10/hists_plotA_plotB_plotC.root --db hists_plotA_plotB_plotC.sqlite \\
+        --output inputs/hists_plotA_plotB_plotC.root
+    python3 histstore.py runs/*/hists_plotA_plotB_plotC.root --prune --db hists_plotA_plotB_plotC.sqlite
+
+Sources are only removed with --prune (the inputs are then the complete
+list) or --remove.
+
+All histogram contents are sums over events (bin contents, sum of squared
+weights and the TH1 statistics). The merged histograms are always the sum of
+the partials in the order of their source paths: a source that sorts last is
+added to them, and any other change (removing, updating or adding a source in
+between) sums the affected histograms again rather than subtracting. The merged
+view is therefore bit for bit the same whatever the history of the store.
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import uproot
+from uproot.writing.identify import to_TAxis, to_TH1x, to_TH2x
+
+import loading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    hash TEXT NOT NULL,
+    n_events INTEGER,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS partials (
+    source TEXT NOT NULL REFERENCES sources (path),
+    name TEXT NOT NULL,
+    hist BLOB NOT NULL,
+    PRIMARY KEY (source, name)
+);
+CREATE TABLE IF NOT EXISTS merged (
+    name TEXT PRIMARY KEY,
+    hist BLOB NOT NULL
+);
+"""
+
+# additive members of TH1 (and TH2) besides the bin contents
+STATS_1D = ("fEntries", "fTsumw", "fTsumw2", "fTsumwx", "fTsumwx2")
+STATS_2D = STATS_1D + ("fTsumwy", "fTsumwy2", "fTsumwxy")
+
+
+def is_store(path: str) -> bool:
+    return path.endswith(".sqlite")
+
+
+def file_hash(path: str, block_size: int = 2**20) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@dataclass
+class Hist:
+    """
+    A 1D or 2D histogram with under- and overflow bins: values and variances of
+    shape (len(edges[0]) + 1, ...) and the additive TH1 statistics.
+    """
+    edges: Tuple[np.ndarray, ...]
+    values: np.ndarray
+    variances: np.ndarray
+    stats: Dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_uproot(cls, h) -> "Hist":
+        names = STATS_1D if len(h.axes) == 1 else STATS_2D
+        return cls(
+            edges=tuple(axis.edges() for axis in h.axes),
+            values=np.asarray(h.values(flow=True), dtype=np.float64),
+            variances=np.asarray(h.variances(flow=True), dtype=np.float64),
+            stats={name: float(h.member(name)) for name in names},
+        )
+
+    def _check_compatible(self, other: "Hist") -> None:
+        if len(self.edges) != len(other.edges) or not all(
+            np.array_equal(a, b) for a, b in zip(self.edges, other.edges)
+        ):
+            raise ValueError("Cannot merge histograms with different binning")
+
+    def __add__(self, other: "Hist") -> "Hist":
+        self._check_compatible(other)
+        return Hist(
+            self.edges,
+            self.values + other.values,
+            self.variances + other.variances,
+            {k: v + other.stats.get(k, 0.0) for k, v in self.stats.items()},
+        )
+
+    def __sub__(self, other: "Hist") -> "Hist":
+        self._check_compatible(other)
+        return Hist(
+            self.edges,
+            self.values - other.values,
+            self.variances - other.variances,
+            {k: v - other.stats.get(k, 0.0) for k, v in self.stats.items()},
+        )
+
+    def to_root(self, name: str):
+        """
+        Writable TH1D/TH2D for uproot, e.g. `f[name] = hist.to_root(name)`.
+        """
+        axes = [
+            to_TAxis(f"{axis}axis", "", len(edges) - 1, edges[0], edges[-1], edges)
+            for axis, edges in zip("xy", self.edges)
+        ]
+        stats = dict(self.stats)
+        if len(self.edges) == 1:
+            return to_TH1x(name, name, self.values, fSumw2=self.variances, fXaxis=axes[0], **stats)
+        # ROOT stores the bins of 2D histograms with x running fastest
+        return to_TH2x(
+            name, name, self.values.T.ravel(), fSumw2=self.variances.T.ravel(),
+            fXaxis=axes[0], fYaxis=axes[1], **stats,
+        )
+
+
+def read_root_hists(path: str) -> Dict[str, Hist]:
+    """
+    All 1D and 2D histograms of a ROOT file, keyed by name.
+    """
+    hists = {}
+    with loading.open_file(path) as f:
+        for key, classname in f.classnames(cycle=False).items():
+            if classname.startswith("TH1") or classname.startswith("TH2"):
+                hists[key] = Hist.from_uproot(f[key])
+    return hists
+
+
+def _dumps(hist: Hist) -> bytes:
+    # plain arrays and dicts only, so that the store does not depend on where Hist is defined
+    return pickle.dumps(
+        (hist.edges, hist.values, hist.variances, hist.stats), protocol=pickle.HIGHEST_PROTOCOL
+    )
+
+
+def _loads(blob: bytes) -> Hist:
+    return Hist(*pickle.loads(blob))
+
+
+def write_root(path: str, hists: Dict[str, Hist]) -> None:
+    with uproot.recreate(path) as f:
+        for name, hist in hists.items():
+            f[name] = hist.to_root(name)
+
+
+class HistogramStore:
+
+    def __init__(self, db_path: str = "hist_store.sqlite"):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _append(self, hists: Dict[str, Hist]) -> None:
+        # only valid for a source that sorts after all others, see _rebuild
+        for name, hist in hists.items():
+            row = self.connection.execute("SELECT hist FROM merged WHERE name = ?", (name,)).fetchone()
+            merged = hist if row is None else _loads(row[0]) + hist
+            self.connection.execute("INSERT OR REPLACE INTO merged VALUES (?, ?)", (name, _dumps(merged)))
+
+    def _rebuild(self, names: Iterable[str]) -> None:
+        """
+        Sum the partials of each of `names` again, in the order of their sources. Unlike
+        subtracting, this gives bit for bit the merged histograms of a fresh store with the
+        same sources; names without partials are dropped instead of staying as zeros.
+        """
+        for name in names:
+            merged = None
+            for blob, in self.connection.execute(
+                "SELECT hist FROM partials WHERE name = ? ORDER BY source", (name,)
+            ):
+                merged = _loads(blob) if merged is None else merged + _loads(blob)
+            if merged is None:
+                self.connection.execute("DELETE FROM merged WHERE name = ?", (name,))
+            else:
+                self.connection.execute("INSERT OR REPLACE INTO merged VALUES (?, ?)", (name, _dumps(merged)))
+
+    def partials(self, source: str) -> Dict[str, Hist]:
+        """
+        The histograms `source` contributed, keyed by name.
+        """
+        return {
+            name: _loads(blob)
+            for name, blob in self.connection.execute("SELECT name, hist FROM partials WHERE source = ?", (source,))
+        }
+
+    def add(self, source: str, hists: Dict[str, Hist], n_events: int = None, source_hash: str = "",
+            size: int = 0, mtime: float = 0.0) -> None:
+        """
+        Add the partial histograms of `source` to the merged ones, replacing what the source contributed before.
+        """
+        with self.connection:
+            replaced = self._delete(source) if self.has_source(source) else []
+            (last,) = self.connection.execute("SELECT MAX(path) FROM sources").fetchone()
+            self.connection.execute(
+                "INSERT INTO sources VALUES (?, ?, ?, ?, ?, ?)",
+                (source, size, mtime, source_hash, n_events, time.time()),
+            )
+            self.connection.executemany(
+                "INSERT INTO partials VALUES (?, ?, ?)",
+                [(source, name, _dumps(h)) for name, h in hists.items()],
+            )
+            if not replaced and (last is None or source > last):
+                # the merged histograms are summed in source order, so a last source is simply added
+                self._append(hists)
+            else:
+                self._rebuild(sorted(set(replaced) | set(hists)))
+
+    def add_root_file(self, path: str) -> None:
+        """
+        Add all histograms of a ROOT file; its number of events is taken as the
+        entries of its fullest histogram.
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        hists = read_root_hists(path)
+        n_events = int(max((h.stats["fEntries"] for h in hists.values()), default=0))
+        self.add(path, hists, n_events, file_hash(path), st.st_size, st.st_mtime)
+
+    def _delete(self, source: str) -> List[str]:
+        """
+        Forget `source` and its partials; returns the names it contributed to.
+        """
+        names = [name for name, in self.connection.execute("SELECT name FROM partials WHERE source = ?", (source,))]
+        self.connection.execute("DELETE FROM partials WHERE source = ?", (source,))
+        self.connection.execute("DELETE FROM sources WHERE path = ?", (source,))
+        return names
+
+    def remove(self, source: str) -> None:
+        """
+        Forget `source` and merge the histograms it contributed to again from the remaining sources.
+        """
+        with self.connection:
+            self._rebuild(self._delete(source))
+
+    def sync(self, paths: Iterable[str], prune: bool = False) -> Dict[str, int]:
+        """
+        Bring the store up to date with the ROOT files `paths` (sources are absolute paths):
+        only new files and files whose size, mtime and then content changed are read.
+        With prune, `paths` is the complete list of sources and the sources that are
+        not among them are removed.
+        Returns the number of added, updated, removed and unchanged sources.
+        """
+        known = {
+            path: (size, mtime, source_hash)
+            for path, size, mtime, source_hash in self.connection.execute(
+                "SELECT path, size, mtime, hash FROM sources"
+            )
+        }
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        # in source order, so that new sources are usually the last ones and simply added
+        paths = sorted(os.path.abspath(p) for p in paths)
+        for path in paths:
+            st = os.stat(path)
+            if path in known:
+                size, mtime, source_hash = known[path]
+                if (size, mtime) == (st.st_size, st.st_mtime):
+                    stats["unchanged"] += 1
+                    continue
+                if source_hash == file_hash(path):
+                    # touched or copied, but the same content
+                    with self.connection:
+                        self.connection.execute(
+                            "UPDATE sources SET size = ?, mtime = ? WHERE path = ?", (st.st_size, st.st_mtime, path)
+                        )
+                    stats["unchanged"] += 1
+                    continue
+            stats["updated" if path in known else "added"] += 1
+            self.add_root_file(path)
+        if prune:
+            for path in set(known) - set(paths):
+                self.remove(path)
+                stats["removed"] += 1
+        return stats
+
+    def has_source(self, source: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM sources WHERE path = ?", (source,)).fetchone() is not None
+
+    def sources(self) -> Dict[str, dict]:
+        """
+        {path: {size, mtime, hash, n_events, added_at}} of all sources.
+        """
+        return {
+            path: {"size": size, "mtime": mtime, "hash": h, "n_events": n_events, "added_at": added_at}
+            for path, size, mtime, h, n_events, added_at in self.connection.execute(
+                "SELECT * FROM sources ORDER BY path"
+            )
+        }
+
+    def names(self) -> List[str]:
+        return [name for name, in self.connection.execute("SELECT name FROM merged ORDER BY name")]
+
+    def get(self, name: str) -> Hist:
+        row = self.connection.execute("SELECT hist FROM merged WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"{name} is not in the store {self.db_path}")
+        return _loads(row[0])
+
+    def __contains__(self, name: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM merged WHERE name = ?", (name,)).fetchone() is not None
+
+    def write_root(self, path: str) -> None:
+        """
+        Write the merged histograms to a ROOT file with the key naming of the hists_plot*.root inputs.
+        """
+        write_root(path, {name: self.get(name) for name in self.names()})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Merge per-run histogram files incrementally into a histogram store"
+    )
+    parser.add_argument("inputs", nargs="*", help="ROOT files with the histograms of one run or ntuple file each")
+    parser.add_argument("--db", required=True, help="SQLite histogram store")
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="The inputs are all sources: remove the sources of the store that are not among them"
+    )
+    parser.add_argument("--remove", nargs="+", default=[], help="Sources to remove from the store")
+    parser.add_argument("--output", default=None, help="Write the merged histograms to this ROOT file")
+    args = parser.parse_args()
+
+    with HistogramStore(args.db) as store:
+        for path in args.remove:
+            store.remove(os.path.abspath(path))
+        if args.inputs:
+            stats = store.sync(args.inputs, prune=args.prune)
+            print(", ".join(f"{v} {k}" for k, v in stats.items()))
+        sources = store.sources()
+        n_events = sum(s["n_events"] or 0 for s in sources.values())
+        print(f"{len(sources)} sources, {n_events} events, {len(store.names())} histograms")
+        if args.output is not None:
+            store.write_root(args.output)
+            print(f"Wrote {args.output}")
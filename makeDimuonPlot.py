@@ -1,10 +1,13 @@
 import argparse
-import uproot
 import matplotlib.patches as mpatches
-import matplotlib.pyplot as plt
 import mplhep as hep
 import numpy as np
 import os
+from typing import List
+
+import export
+import profiling
+from hist_utils import add_npv_arguments, load_root_hists
 
 hep.style.use('CMS')
 
@@ -28,19 +31,6 @@ TRIGGER_COLORS = {
 NORM = False
 
 
-def load_root_hists(root_file, hist_key, triggers):
-    hists = {}
-    with uproot.open(root_file) as f:
-        for trigger in triggers:
-            key = f"{trigger}_{hist_key}"
-            if key in f:
-                counts, bins = f[key].to_numpy()
-                hists[trigger] = (counts, bins)
-            else:
-                print(f"  WARNING: key '{key}' not found in ROOT file, skipping.")
-    return hists
-
-
 def draw_hist1d(counts, bins, ax=None, label="", rebin=1,
                 norm=False, linestyle='solid', color=None):
 
@@ -82,9 +72,10 @@ def main(args):
         "DST_PFScouting_ZeroBias",
     ]
 
-    hists = load_root_hists(args.input, "ScoutingMuonVtx_ScoutingMuonVtx_mass", triggers)
+    hists = load_root_hists(args.input, "ScoutingMuonVtx_ScoutingMuonVtx_mass", triggers, args.npv_min, args.npv_max)
 
-    fig, ax = plt.subplots(figsize=(14, 6))
+    fig = export.figure(figsize=(14, 6))
+    ax = fig.subplots()
 
     for trigger in triggers:
         if trigger not in hists:
@@ -119,18 +110,17 @@ def main(args):
         year="2024",
         com=13.6,
         fontsize=18,
+        ax=ax,
     )
 
     out_dir = os.path.dirname(args.output)
     if out_dir:
         os.makedirs(out_dir, exist_ok=True)
-    fig.savefig(f"{args.output}.pdf", format="pdf", bbox_inches="tight")
-    fig.savefig(f"{args.output}.png", format="png", bbox_inches="tight")
-    print(f"Saved {args.output}.pdf and {args.output}.png")
-
+    export.save(fig, [f"{args.output}.pdf", f"{args.output}.png"], bbox_inches="tight")
+    export.flush()
 
-if __name__ == "__main__":
 
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Make a plot of diobject invariant mass"
     )
@@ -148,6 +138,13 @@ if __name__ == "__main__":
     parser.add_argument("--x-max", type=float, default=None)
     parser.add_argument("--y-min", type=float, default=None)
     parser.add_argument("--y-max", type=float, default=None)
+    add_npv_arguments(parser)
+    profiling.add_profile_argument(parser)
+
+    args = parser.parse_args(argv)
+    return args
 
-    args = parser.parse_args()
-    main(args)
+
+if __name__ == "__main__":
+    args = parse_args()
+    profiling.run(main, args)
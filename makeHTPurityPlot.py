@@ -1,10 +1,13 @@
 import argparse
-import uproot
 import matplotlib.patches as mpatches
-import matplotlib.pyplot as plt
 import mplhep as hep
 import numpy as np
 import os
+from typing import List
+
+import export
+import profiling
+from hist_utils import add_npv_arguments, load_root_hists
 
 hep.style.use('CMS')
 
@@ -29,19 +32,6 @@ TRIGGER_COLORS = {
 NORM = False
 
 
-def load_root_hists(root_file, hist_key, triggers):
-    hists = {}
-    with uproot.open(root_file) as f:
-        for trigger in triggers:
-            key = f"{trigger}_{hist_key}"
-            if key in f:
-                counts, bins = f[key].to_numpy()
-                hists[trigger] = (counts, bins)
-            else:
-                print(f"  WARNING: key '{key}' not found in ROOT file, skipping.")
-    return hists
-
-
 def draw_hist1d(counts, bins, ax=None, label="", rebin=1,
                 norm=False, linestyle='solid', color=None):
 
@@ -85,9 +75,10 @@ def main(args):
         "pure_L1_DST_PFScouting_CICADAMedium",
     ]
 
-    hists = load_root_hists(args.input, "l1_ht", triggers)
+    hists = load_root_hists(args.input, "l1_ht", triggers, args.npv_min, args.npv_max)
 
-    fig, ax = plt.subplots(figsize=(7, 7))
+    fig = export.figure(figsize=(7, 7))
+    ax = fig.subplots()
     fig.subplots_adjust(left=0.15, right=0.95, top=0.92, bottom=0.12)
 
     for trigger in triggers:
@@ -129,18 +120,17 @@ def main(args):
         year="Run 386924",
         com=13.6,
         fontsize=18,
+        ax=ax,
     )
 
     out_dir = os.path.dirname(args.output)
     if out_dir:
         os.makedirs(out_dir, exist_ok=True)
-    fig.savefig(f"{args.output}.pdf", format="pdf")
-    fig.savefig(f"{args.output}.png", format="png")
-    print(f"Saved {args.output}.pdf and {args.output}.png")
-
+    export.save(fig, [f"{args.output}.pdf", f"{args.output}.png"])
+    export.flush()
 
-if __name__ == "__main__":
 
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Make a plot of L1 HT for AXO and CICADA including pure events"
     )
@@ -158,6 +148,13 @@ if __name__ == "__main__":
     parser.add_argument("--x-max", type=float, default=None)
     parser.add_argument("--y-min", type=float, default=None)
     parser.add_argument("--y-max", type=float, default=None)
+    add_npv_arguments(parser)
+    profiling.add_profile_argument(parser)
+
+    args = parser.parse_args(argv)
+    return args
 
-    args = parser.parse_args()
-    main(args)
+
+if __name__ == "__main__":
+    args = parse_args()
+    profiling.run(main, args)
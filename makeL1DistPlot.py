@@ -1,10 +1,12 @@
 import argparse
-import uproot
-import matplotlib.patches as mpatches
-import matplotlib.pyplot as plt
 import mplhep as hep
-import numpy as np
 import os
+from typing import List
+
+import export
+import profiling
+import templates
+from hist_utils import add_npv_arguments, load_root_hists
 
 hep.style.use('CMS')
 
@@ -40,118 +42,99 @@ TRIGGER_COLORS = {
 NORM = False
 
 
-def load_root_hists(root_file, hist_key, triggers):
-    hists = {}
-    with uproot.open(root_file) as f:
-        for trigger in triggers:
-            key = f"{trigger}_{hist_key}"
-            if key in f:
-                counts, bins = f[key].to_numpy()
-                hists[trigger] = (counts, bins)
-            else:
-                print(f"  WARNING: key '{key}' not found in ROOT file, skipping.")
-    return hists
-
-
-def draw_hist1d(counts, bins, ax=None, label="", rebin=1,
-                norm=False, linestyle='solid', color=None):
-
-    if rebin > 1:
-        counts = counts[:len(counts) - len(counts) % rebin].reshape(-1, rebin).sum(axis=1)
-        bins = bins[::rebin]
-        if len(bins) != len(counts) + 1:
-            bins = np.append(bins[:len(counts)], bins[len(counts)])
-
-    norm_factor = np.sum(counts) * np.diff(bins) if norm else 1
-    _counts = counts / norm_factor if norm else counts
-    errs = np.sqrt(counts) / norm_factor if norm else np.sqrt(counts)
-    _errs = np.where(_counts == 0, 0, errs)
-
-    bin_centres = 0.5 * (bins[1:] + bins[:-1])
-
-    if color is not None:
-        l = ax.errorbar(x=bin_centres, y=_counts, yerr=_errs, linestyle="", color=color)
-    else:
-        l = ax.errorbar(x=bin_centres, y=_counts, yerr=_errs, linestyle="")
-    color = l[0].get_color()
-    ax.errorbar(
-        x=bins, y=np.append(_counts, _counts[-1]), drawstyle="steps-post", label=label,
-        color=color, linestyle=linestyle
-    )
-    return l
+TRIGGERS = [
+    "DST_PFScouting_ZeroBias",
+    "DST_PFScouting_ZeroBias_DST_PFScouting_AXONominal",
+    "DST_PFScouting_ZeroBias_DST_PFScouting_CICADAMedium",
+]
+
+
+class L1DistTemplate(templates.FigureTemplate):
+    """
+    Zero Bias distribution of an L1 observable with the AXO and CICADA triggered
+    subsets, refilled for each observable.
+    """
+
+    def __init__(self, triggers=TRIGGERS, norm=NORM):
+        fig = export.figure(figsize=(7, 7))
+        ax = fig.subplots()
+        super().__init__(fig)
+        fig.subplots_adjust(left=0.15, right=0.95, top=0.92, bottom=0.12)
+        self.ax = ax
+        self.triggers = triggers
+        self.norm = norm
+        self._legend_triggers = None
+        self.hists = {t: templates.HistogramArtists(ax, TRIGGER_COLORS[t]) for t in triggers}
+
+        ax.set_yscale("log")
+        ax.set_ylabel(f"Events{' [A.U.]' if norm else ''}", loc="top", fontsize=25)
+
+        hep.cms.label(
+            "Preliminary",
+            data=True,
+            lumi=11.45,
+            year="2024",
+            com=13.6,
+            fontsize=18,
+            ax=ax,
+        )
+
+    def update(self, hists, rebin, x_label, x_min, x_max, y_min, y_max):
+        ax = self.ax
+        for trigger in self.triggers:
+            self.hists[trigger].set_visible(trigger in hists)
+            if trigger not in hists:
+                continue
+            counts, bins = templates.rebin_hist(*hists[trigger], rebin)
+            self.hists[trigger].set_data(*templates.hist_points(counts, bins, norm=self.norm), bins)
+
+        ax.set_xlim([x_min, x_max])
+        ax.set_ylim([y_min, y_max])
+        ax.set_xlabel(x_label, fontsize=25)
+
+        present = [t for t in self.triggers if t in hists]
+        if present != self._legend_triggers:
+            handles = templates.legend_handles({t: TRIGGER_LABELS[t] for t in present}, TRIGGER_COLORS)
+            ax.legend(handles=handles, loc="upper right", frameon=False, fontsize=18)
+            self._legend_triggers = present
 
 
 def main(args):
 
-    defaults = OBS_DEFAULTS[args.observable]
-
-    x_min = args.x_min if args.x_min is not None else defaults["x_min"]
-    x_max = args.x_max if args.x_max is not None else defaults["x_max"]
-    y_min = args.y_min if args.y_min is not None else defaults["y_min"]
-    y_max = args.y_max if args.y_max is not None else defaults["y_max"]
-
-    triggers = [
-        "DST_PFScouting_ZeroBias",
-        "DST_PFScouting_ZeroBias_DST_PFScouting_AXONominal",
-        "DST_PFScouting_ZeroBias_DST_PFScouting_CICADAMedium",
-    ]
-
-    hists = load_root_hists(args.input, defaults["hist_key"], triggers)
-
-    fig, ax = plt.subplots(figsize=(7, 7))
-    fig.subplots_adjust(left=0.15, right=0.95, top=0.92, bottom=0.12)
-
-    for trigger in triggers:
-        if trigger not in hists:
-            continue
-        color = TRIGGER_COLORS[trigger]
-        counts, bins = hists[trigger]
-        draw_hist1d(counts, bins, ax=ax, label=TRIGGER_LABELS[trigger], rebin=defaults["rebin"], norm=NORM, color=color)
-
-    ax.set_yscale("log")
-    ax.set_xlim([x_min, x_max])
-    ax.set_ylim([y_min, y_max])
-    legend_handles = [
-        mpatches.Rectangle(
-            (0, 0), 1, 1,
-            fill=False,
-            edgecolor=TRIGGER_COLORS[t],
-            linewidth=2,
-            label=TRIGGER_LABELS[t],
-        )
-        for t in triggers if t in hists
-    ]
-    ax.legend(handles=legend_handles, loc="upper right", frameon=False, fontsize=18)
-    ax.set_ylabel(f"Events{' [A.U.]' if NORM else ''}", loc="top", fontsize=25)
-    ax.set_xlabel(defaults["x_label"], fontsize=25)
-
-    hep.cms.label(
-        "Preliminary",
-        data=True,
-        lumi=11.45,
-        year="2024",
-        com=13.6,
-        fontsize=18,
-    )
+    # one figure for all observables, only the data, limits and labels change
+    template = L1DistTemplate()
 
-    out_dir = os.path.dirname(args.output)
-    if out_dir:
-        os.makedirs(out_dir, exist_ok=True)
-    fig.savefig(f"{args.output}.pdf", format="pdf")
-    fig.savefig(f"{args.output}.png", format="png")
-    print(f"Saved {args.output}.pdf and {args.output}.png")
+    for observable in args.observable:
+        defaults = OBS_DEFAULTS[observable]
 
+        x_min = args.x_min if args.x_min is not None else defaults["x_min"]
+        x_max = args.x_max if args.x_max is not None else defaults["x_max"]
+        y_min = args.y_min if args.y_min is not None else defaults["y_min"]
+        y_max = args.y_max if args.y_max is not None else defaults["y_max"]
+
+        hists = load_root_hists(args.input, defaults["hist_key"], TRIGGERS, args.npv_min, args.npv_max)
+
+        output = args.output.format(observable=observable)
+        out_dir = os.path.dirname(output)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        template.render(
+            [f"{output}.pdf", f"{output}.png"],
+            hists, defaults["rebin"], defaults["x_label"], x_min, x_max, y_min, y_max,
+        )
+    export.flush()
 
-if __name__ == "__main__":
 
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Make a plot of L1 HT or missing pT of AXO and CICADA out of Zero Bias events"
     )
     parser.add_argument(
         "--observable",
         required=True,
+        nargs="+",
         choices=["ht", "met"],
-        help="Which observable to plot"
+        help="Which observable(s) to plot"
     )
     parser.add_argument(
         "--input",
@@ -161,12 +144,22 @@ if __name__ == "__main__":
     parser.add_argument(
         "--output",
         required=True,
-        help="Full output path prefix, e.g. plots/l1_ht_efficiency (extensions .pdf/.png added automatically)"
+        help="Full output path prefix, e.g. plots/l1_ht_efficiency (extensions .pdf/.png added automatically); "
+        "with several observables it must contain {observable}, e.g. plots/l1_{observable}_dist"
     )
     parser.add_argument("--x-min", type=float, default=None)
     parser.add_argument("--x-max", type=float, default=None)
     parser.add_argument("--y-min", type=float, default=None)
     parser.add_argument("--y-max", type=float, default=None)
+    add_npv_arguments(parser)
+    profiling.add_profile_argument(parser)
 
-    args = parser.parse_args()
-    main(args)
+    args = parser.parse_args(argv)
+    if len(args.observable) > 1 and "{observable}" not in args.output:
+        parser.error("--output must contain {observable} when plotting several observables")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    profiling.run(main, args)
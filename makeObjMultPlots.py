@@ -1,12 +1,15 @@
 import argparse
-import uproot
 import numpy as np
 import boost_histogram as bh
-import matplotlib.pyplot as plt
 import matplotlib
-import matplotlib.patches as mpatches
 import mplhep as hep
 import os
+from typing import List
+
+import export
+import profiling
+import templates
+from hist_utils import add_npv_arguments, load_root_hists
 
 hep.style.use('CMS')
 
@@ -60,52 +63,7 @@ OBJ_DEFAULTS = {
 }
 
 
-def load_root_hists(root_file, hist_key, triggers):
-    """
-    Load histograms from ROOT file into a dict keyed by trigger name.
-    Returns dict: {trigger: (counts, bins)}
-    """
-    hists = {}
-    with uproot.open(root_file) as f:
-        for trigger in triggers:
-            key = f"{trigger}_{hist_key}"
-            if key in f:
-                h = f[key]
-                counts, bins = h.to_numpy()
-                hists[trigger] = (counts, bins)
-            else:
-                print(f"  WARNING: key '{key}' not found in ROOT file, skipping.")
-    return hists
-
-
-def draw_hist1d(counts, bins, ax=None, label="",
-                norm=False, linestyle='solid', color=None):
-
-    if norm:
-        norm_factor = np.sum(counts) * np.diff(bins)
-    else:
-        norm_factor = 1
-
-    _counts = counts / norm_factor if norm else counts
-    errs = np.sqrt(counts) / norm_factor if norm else np.sqrt(counts)
-    _errs = np.where(_counts == 0, 0, errs)
-
-    bin_centres = 0.5 * (bins[1:] + bins[:-1])
-
-    if color is not None:
-        l = ax.errorbar(x=bin_centres, y=_counts, yerr=_errs, linestyle="", color=color)
-    else:
-        l = ax.errorbar(x=bin_centres, y=_counts, yerr=_errs, linestyle="")
-    color = l[0].get_color()
-    ax.errorbar(
-        x=bins, y=np.append(_counts, _counts[-1]), drawstyle="steps-post", label=label,
-        color=color, linestyle=linestyle
-    )
-    return l
-
-
-def draw_ratio(counts_num, bins_num, counts_denom, bins_denom, ax=None, color=None,
-               label="", norm=False):
+def ratio_points(counts_num, bins_num, counts_denom, bins_denom, norm=False):
 
     norm_factor_denom = np.sum(counts_denom) * np.diff(bins_denom) if norm else 1
     counts_denom = counts_denom / norm_factor_denom if norm else counts_denom
@@ -117,21 +75,10 @@ def draw_ratio(counts_num, bins_num, counts_denom, bins_denom, ax=None, color=No
 
     denom = np.where(counts_denom == 0, np.nan, counts_denom)
     ratio = counts_num / denom
-    x = 0.5 * (bins_num[:-1] + bins_num[1:])
 
     error = ratio * np.sqrt((errs_num / np.where(counts_num == 0, np.nan, counts_num))**2 +
                             (errs_denom / np.where(counts_denom == 0, np.nan, counts_denom))**2)
-
-    if color is not None:
-        l = ax.errorbar(x=x, y=ratio, yerr=error, linestyle="", color=color)
-    else:
-        l = ax.errorbar(x=x, y=ratio, yerr=error, linestyle="")
-    color = l[0].get_color()
-    ax.errorbar(
-        x=bins_num, y=np.append(ratio, ratio[-1]), drawstyle="steps-post", label=label,
-        color=color, linestyle='solid'
-    )
-    return l
+    return ratio, error
 
 def getMaxAndMinOOM(axis):
     ymin, ymax = axis.get_ylim()
@@ -139,123 +86,141 @@ def getMaxAndMinOOM(axis):
     lowerOOM = np.ceil(np.log10(ymin))
     return (lowerOOM, upperOOM)
 
-def make_plot(hists, triggers, x_label,
-              x_min, x_max, y_min, y_max, output,
-              log_scale=True, norm=False, leg_loc='upper right'):
-
-    fig, ax = plt.subplots(2, figsize=(8, 8), sharex=True, gridspec_kw={'height_ratios': [2, 1]})
-    fig.subplots_adjust(left=0.15, right=0.95, top=0.92, bottom=0.12)
-    ax[1].plot(np.linspace(x_min, x_max, 10), np.ones(10), '--', color='darkgray')
 
-    counts_denom, bins_denom = hists["DST_PFScouting_ZeroBias"]
-
-    for trigger in triggers:
-        if trigger not in hists:
-            continue
-        counts, bins = hists[trigger]
-        color = TRIGGER_COLORS[trigger]
-        trigger_label = TRIGGER_LABELS[trigger]
+class ObjMultTemplate(templates.FigureTemplate):
+    """
+    Multiplicity distributions of the triggers with their ratio to Zero Bias below,
+    refilled for each object type.
+    """
 
-        l = draw_hist1d(
-            counts, bins,
+    def __init__(self, triggers, log_scale=True, norm=False, leg_loc='upper right'):
+        fig = export.figure(figsize=(8, 8))
+        ax = fig.subplots(2, sharex=True, gridspec_kw={'height_ratios': [2, 1]})
+        super().__init__(fig)
+        fig.subplots_adjust(left=0.15, right=0.95, top=0.92, bottom=0.12)
+        self.ax = ax
+        self.triggers = triggers
+        self.norm = norm
+        self.leg_loc = leg_loc
+        self._legend_triggers = None
+
+        (self.reference,) = ax[1].plot([], [], '--', color='darkgray')
+        self.hists = {t: templates.HistogramArtists(ax[0], TRIGGER_COLORS[t]) for t in triggers}
+        self.ratios = {
+            t: templates.HistogramArtists(ax[1], TRIGGER_COLORS[t]) for t in triggers if t != "DST_PFScouting_ZeroBias"
+        }
+
+        if log_scale:
+            ax[0].set_yscale("log")
+            ax[1].set_yscale("log")
+        ax[0].set_ylabel(f"Events{' [A.U.]' if norm else ''}", loc="top", fontsize=22)
+        ax[1].set_ylabel("Ratio to Zero Bias", loc="top", fontsize=24)
+        # maxAndMinOOM = getMaxAndMinOOM(ax[1])
+        # OOMsToUse = list(np.unique(np.round(np.linspace(start=maxAndMinOOM[0], stop=maxAndMinOOM[1], num=5))))
+        # yticks = [10**x for x in OOMsToUse]
+        # ax[1].set_yticks(yticks)
+
+        ax[1].yaxis.set_major_locator(matplotlib.ticker.LogLocator(base=10, subs=[1.0], numticks=5))
+        ax[1].yaxis.set_minor_locator(matplotlib.ticker.LogLocator(base=10, subs=np.arange(2, 10), numticks=50))
+
+        hep.cms.label(
+            "Preliminary",
+            data=True,
+            lumi=11.45,
+            year="2024",
+            com=13.6,
+            fontsize=22,
             ax=ax[0],
-            label=trigger_label,
-            norm=norm,
-            color=color
         )
-        if trigger != "DST_PFScouting_ZeroBias":
-            color = l[0].get_color()
-            draw_ratio(
-                counts, bins,
-                counts_denom, bins_denom,
-                ax=ax[1],
-                label=trigger_label,
-                norm=norm,
-                color=color
+
+        fig.subplots_adjust(hspace=0)
+
+    def update(self, hists, x_label, x_min, x_max, y_min, y_max):
+        ax = self.ax
+        self.reference.set_data(np.linspace(x_min, x_max, 10), np.ones(10))
+
+        counts_denom, bins_denom = hists["DST_PFScouting_ZeroBias"]
+
+        for trigger in self.triggers:
+            artists = [self.hists[trigger]] + ([self.ratios[trigger]] if trigger in self.ratios else [])
+            for a in artists:
+                a.set_visible(trigger in hists)
+            if trigger not in hists:
+                continue
+            counts, bins = hists[trigger]
+            self.hists[trigger].set_data(*templates.hist_points(counts, bins, norm=self.norm), bins)
+            if trigger in self.ratios:
+                ratio, error = ratio_points(counts, bins, counts_denom, bins_denom, norm=self.norm)
+                self.ratios[trigger].set_data(ratio, error, bins)
+
+        # the ratio panel keeps autoscaling its y axis, as with freshly drawn artists
+        templates.autoscale(ax[1], list(self.ratios.values()))
+        ax[0].set_xlim([x_min, x_max])
+        ax[0].set_ylim([y_min, y_max])
+        ax[1].set_xlabel(x_label, loc="right", fontsize=24)
+
+        present = [t for t in self.triggers if t in hists]
+        if present != self._legend_triggers:
+            handles = templates.legend_handles(
+                {t: TRIGGER_LABELS[t] for t in present}, TRIGGER_COLORS
             )
+            ax[0].legend(handles=handles, loc=self.leg_loc, frameon=False, fontsize=22, ncols=2, columnspacing=0.7)
+            self._legend_triggers = present
 
-    ax[0].set_xlim([x_min, x_max])
-    ax[0].set_ylim([y_min, y_max])
-
-    if log_scale:
-        ax[0].set_yscale("log")
-        ax[1].set_yscale("log")
-    ax[0].set_ylabel(f"Events{' [A.U.]' if norm else ''}", loc="top", fontsize=22)
-    ax[1].set_ylabel("Ratio to Zero Bias", loc="top", fontsize=24)
-    ax[1].set_xlabel(x_label, loc="right", fontsize=24)
-    # maxAndMinOOM = getMaxAndMinOOM(ax[1])
-    # OOMsToUse = list(np.unique(np.round(np.linspace(start=maxAndMinOOM[0], stop=maxAndMinOOM[1], num=5))))
-    # yticks = [10**x for x in OOMsToUse]
-    # ax[1].set_yticks(yticks)
-
-    ax[1].yaxis.set_major_locator(matplotlib.ticker.LogLocator(base=10, subs=[1.0], numticks=5))
-    ax[1].yaxis.set_minor_locator(matplotlib.ticker.LogLocator(base=10, subs=np.arange(2, 10), numticks=50))
-    
-    legend_handles = [
-        mpatches.Rectangle(
-            (0, 0), 1, 1,
-            fill=False,
-            edgecolor=TRIGGER_COLORS[t],
-            linewidth=2,
-            label=TRIGGER_LABELS[t],
-        )
-        for t in triggers if t in hists
-    ]
-    ax[0].legend(handles=legend_handles, loc=leg_loc, frameon=False, fontsize=22, ncols=2, columnspacing=0.7)
-
-    hep.cms.label(
-        "Preliminary",
-        data=True,
-        lumi=11.45,
-        year="2024",
-        com=13.6,
-        fontsize=22,
-        ax=ax[0],
-    )
 
-    fig.subplots_adjust(hspace=0)
+@profiling.profiled()
+def make_plot(hists, triggers, x_label,
+              x_min, x_max, y_min, y_max, output,
+              log_scale=True, norm=False, leg_loc='upper right', template=None):
+    """
+    Draw one multiplicity plot to output.pdf/.png, into `template` if given
+    (an ObjMultTemplate for the same triggers and style) instead of a new figure.
+    """
+    template = template or ObjMultTemplate(triggers, log_scale=log_scale, norm=norm, leg_loc=leg_loc)
 
     out_dir = os.path.dirname(output)
     if out_dir:
         os.makedirs(out_dir, exist_ok=True)
 
-    fig.savefig(f"{output}.pdf", format="pdf")
-    fig.savefig(f"{output}.png", format="png")
-    print(f"Saved {output}.pdf and {output}.png")
+    template.render([f"{output}.pdf", f"{output}.png"], hists, x_label, x_min, x_max, y_min, y_max)
 
 
 def main(args):
 
-    defaults = OBJ_DEFAULTS[args.object]
+    # one figure for all objects, only the data, limits and labels change
+    template = ObjMultTemplate(triggers, log_scale=True, norm=True)
 
-    hists = load_root_hists(args.input, defaults["hist_key"], triggers)
+    for obj in args.object:
+        defaults = OBJ_DEFAULTS[obj]
 
-    x_min = args.x_min if args.x_min is not None else defaults["x_min"]
-    x_max = args.x_max if args.x_max is not None else defaults["x_max"]
-    y_min = args.y_min if args.y_min is not None else defaults["y_min"]
-    y_max = args.y_max if args.y_max is not None else defaults["y_max"]
+        hists = load_root_hists(args.input, defaults["hist_key"], triggers, args.npv_min, args.npv_max)
 
-    make_plot(
-        hists,
-        triggers,
-        defaults["x_label"],
-        x_min, x_max, y_min, y_max,
-        args.output,
-        log_scale=True,
-        norm=True,
-    )
+        x_min = args.x_min if args.x_min is not None else defaults["x_min"]
+        x_max = args.x_max if args.x_max is not None else defaults["x_max"]
+        y_min = args.y_min if args.y_min is not None else defaults["y_min"]
+        y_max = args.y_max if args.y_max is not None else defaults["y_max"]
 
+        make_plot(
+            hists,
+            triggers,
+            defaults["x_label"],
+            x_min, x_max, y_min, y_max,
+            args.output.format(object=obj),
+            template=template,
+        )
+    export.flush()
 
-if __name__ == "__main__":
 
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Make a multiplicity plot for a single L1 object type (L1Mu, L1EG, or L1Jet)."
     )
     parser.add_argument(
         "--object",
         required=True,
+        nargs="+",
         choices=["L1Mu", "L1EG", "L1Jet"],
-        help="Which object type to plot"
+        help="Which object type(s) to plot"
     )
     parser.add_argument(
         "--input",
@@ -265,12 +230,22 @@ if __name__ == "__main__":
     parser.add_argument(
         "--output",
         required=True,
-        help="Full output path prefix, e.g. plots/mult_L1Mu (extensions .pdf/.png added automatically)"
+        help="Full output path prefix, e.g. plots/mult_L1Mu (extensions .pdf/.png added automatically); "
+        "with several objects it must contain {object}, e.g. plots/{object}_mult"
     )
     parser.add_argument("--x-min", type=float, default=None, help="x-axis minimum")
     parser.add_argument("--x-max", type=float, default=None, help="x-axis maximum")
     parser.add_argument("--y-min", type=float, default=None, help="y-axis minimum")
     parser.add_argument("--y-max", type=float, default=None, help="y-axis maximum")
+    add_npv_arguments(parser)
+    profiling.add_profile_argument(parser)
 
-    args = parser.parse_args()
-    main(args)
+    args = parser.parse_args(argv)
+    if len(args.object) > 1 and "{object}" not in args.output:
+        parser.error("--output must contain {object} when plotting several objects")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    profiling.run(main, args)
@@ -4,12 +4,19 @@ import numpy as np
 import ROOT
 import json
 import pickle as pkl
-import matplotlib.pyplot as plt
+from typing import List
 
 from rich.console import Console
 
+import export
+import profiling
+
 console = Console()
 
+# set once, rcParams must not change while figures are written in the background
+hep.style.use("CMS")
+
+@profiling.profiled()
 def draw_axo_style_score_plot(
         hist_dict,
         output_path,
@@ -19,8 +26,9 @@ def draw_axo_style_score_plot(
         working_point_label = "CICADA Nominal",
         pure_label = "CICADA Unique",
 ):
-    hep.style.use("CMS")
-    hep.cms.text("Preliminary", loc=2)
+    fig = export.figure()
+    ax = fig.subplots()
+    hep.cms.text("Preliminary", loc=2, ax=ax)
 
     overall_hist = hist_dict["overall"]
     working_point_hist = hist_dict['working']
@@ -29,35 +37,35 @@ def draw_axo_style_score_plot(
     overall_fig = hep.histplot(
         overall_hist,
         label='All Zero Bias',
-        color="#5790FC"
+        color="#5790FC",
+        ax=ax,
     )
     working_point_fig = hep.histplot(
         working_point_hist,
         label=working_point_label,
-        color="#F89C20"
+        color="#F89C20",
+        ax=ax,
     )
     pure_score_fig = hep.histplot(
         pure_hist,
         label=pure_label,
         linestyle='--',
         color="#E42536",
+        ax=ax,
     )
 
-    plt.legend(loc='upper right', title='Zero Bias Triggered Events')
-    plt.xlabel(x_axis_label)
-    plt.ylabel('Events')
-    plt.yscale('log')
-    plt.ylim(1.0, np.max(overall_hist[0])*100.0)
+    ax.legend(loc='upper right', title='Zero Bias Triggered Events')
+    ax.set_xlabel(x_axis_label)
+    ax.set_ylabel('Events')
+    ax.set_yscale('log')
+    ax.set_ylim(1.0, np.max(overall_hist[0])*100.0)
 
     hist_name = f'{score_name}_axo_style_score_plot'
 
-    plt.savefig(
-        f'{output_path}/{hist_name}.png'
+    export.save(
+        fig,
+        [f'{output_path}/{hist_name}.png', f'{output_path}/{hist_name}.pdf'],
     )
-    plt.savefig(
-        f'{output_path}/{hist_name}.pdf'
-    )
-    plt.close()
 
 def main(args):
     # Get the input file information we need
@@ -92,11 +100,12 @@ def main(args):
     )
     
 
+    export.flush()
     # Done!
     console.log("Done with AXO style score plots")
     
 
-if __name__ == '__main__':
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     # parser.add_argument(
     #     '--input',
@@ -112,6 +121,12 @@ if __name__ == '__main__':
         help='output directory to store output image files to'
     )
 
-    args = parser.parse_args()
+    profiling.add_profile_argument(parser)
 
-    main(args)
+    args = parser.parse_args(argv)
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    profiling.run(main, args)
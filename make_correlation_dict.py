@@ -0,0 +1,146 @@
+import argparse
+import pickle as pkl
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from rich.console import Console
+
+import loading
+import profiling
+from streaming import BinnedRankCorrelation, OnlineCovariance
+
+console = Console()
+
+# Labels of the correlation plot (see label_replacements in make_correlation_plots.py) and the skim they are read from
+DEFAULT_SAMPLES = [
+    "Data=ZB",
+    "SingleNeutrino",
+    "GluGluHToGG",
+    "TT",
+    "HTo2LongLivedTo4b",
+    "VBFHTo2B=VBFHto2B",
+    "SUEP",
+]
+
+
+def parse_sample(sample):
+    label, _, proc = sample.partition("=")
+    return label, proc or label
+
+
+def entry_ranges(file_name, entries_per_task):
+    """
+    (entry_start, entry_stop) of the tasks a skim is split into.
+    """
+    with loading.open_file(file_name) as f:
+        n_entries = f["Events"].num_entries
+    return [(start, min(start + entries_per_task, n_entries)) for start in range(0, n_entries, entries_per_task)]
+
+
+def accumulate(file_name, axo_branch, cicada_branch, axo_max, cicada_max, step_size, entry_start, entry_stop):
+    """
+    Pearson and binned Spearman accumulators of entries [entry_start, entry_stop) of one skim, filled chunk by chunk.
+    """
+    pearson = OnlineCovariance()
+    spearman = BinnedRankCorrelation.for_integers(axo_max, cicada_max)
+    with loading.open_file(file_name) as f:
+        chunks = f["Events"].iterate(
+            [axo_branch, cicada_branch],
+            step_size=step_size,
+            entry_start=entry_start,
+            entry_stop=entry_stop,
+            library="np",
+        )
+        # one decompression thread per worker process, the next chunk is still read ahead
+        for chunk in loading.prefetch(chunks):
+            pearson.update(chunk[axo_branch], chunk[cicada_branch])
+            spearman.update(chunk[axo_branch], chunk[cicada_branch])
+    return pearson, spearman
+
+
+@profiling.profiled()
+def compute_correlations(samples, args):
+    """
+    Returns {label: (pearson, spearman)} in the order of `samples`.
+    Every sample is split into tasks of up to args.entries_per_task entries, which are
+    processed in parallel, and the partial accumulators of its tasks are merged.
+    """
+    files = {label: f"{args.input_dir}/{proc}.root" for label, proc in map(parse_sample, samples)}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            label: [
+                pool.submit(
+                    accumulate, file_name, args.axo_branch, args.cicada_branch, args.axo_max, args.cicada_max,
+                    args.step_size, start, stop
+                )
+                for start, stop in entry_ranges(file_name, args.entries_per_task)
+            ]
+            for label, file_name in files.items()
+        }
+        correlations = OrderedDict()
+        for label, tasks in futures.items():
+            pearson = OnlineCovariance()
+            spearman = BinnedRankCorrelation.for_integers(args.axo_max, args.cicada_max)
+            for task in tasks:
+                task_pearson, task_spearman = task.result()
+                pearson += task_pearson
+                spearman += task_spearman
+            correlations[label] = (pearson.pearson, spearman.spearman)
+            console.log(
+                f"{label}: {pearson.n:.0f} events in {len(tasks)} tasks, "
+                f"pearson {pearson.pearson:.4f}, spearman {spearman.spearman:.4f}"
+            )
+    return correlations
+
+
+def main(args):
+    console.log("Computing AXO-CICADA score correlations")
+    correlations = compute_correlations(args.samples, args)
+
+    index = 0 if args.method == "pearson" else 1
+    correlation_dict = OrderedDict((label, float(c[index])) for label, c in correlations.items())
+    with open(args.output, "wb") as f:
+        pkl.dump(correlation_dict, f)
+    console.log(f"Saved {args.method} correlations to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compute the AXO-CICADA score correlation of each sample for make_correlation_plots.py"
+    )
+    parser.add_argument(
+        "--input-dir",
+        required=True,
+        help="Directory with the skimmed <process>.root files"
+    )
+    parser.add_argument(
+        "--samples",
+        nargs="+",
+        default=DEFAULT_SAMPLES,
+        help="Samples as `label` or `label=process`; the label is the key in the output dictionary"
+    )
+    parser.add_argument("--output", default="inputs/correlation_dict.pkl")
+    parser.add_argument("--method", choices=["pearson", "spearman"], default="pearson")
+    parser.add_argument("--axo-branch", default="axol1tl_v4_AXOScore")
+    parser.add_argument("--cicada-branch", default="CICADA2024_CICADAScore")
+    parser.add_argument(
+        "--axo-max",
+        type=int,
+        default=3400,
+        help="Largest AXO score for the rank histogram; the scores are integer valued"
+    )
+    parser.add_argument("--cicada-max", type=int, default=256, help="Largest CICADA score for the rank histogram")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--step-size", default="100 MB", help="Chunk size for reading the Events trees")
+    parser.add_argument(
+        "--entries-per-task",
+        type=lambda s: int(float(s)),
+        default=5 * 10**6,
+        help="Split every sample into tasks of this many entries, so that a large sample uses several processes"
+    )
+
+    profiling.add_profile_argument(parser)
+
+    args = parser.parse_args()
+
+    profiling.run(main, args)
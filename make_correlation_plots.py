@@ -4,12 +4,18 @@ import numpy as np
 import ROOT
 import json
 import pickle as pkl
-import matplotlib.pyplot as plt
+from typing import List
 
 from rich.console import Console
 
+import export
+import profiling
+
 console = Console()
 
+# set once, rcParams must not change while figures are written in the background
+hep.style.use("CMS")
+
 label_replacements = {
     "GluGluHToGG": r"$ggH\rightarrow\gamma\gamma$",
     "GluGluHToTauTau": r"$ggH\rightarrow\tau\tau$",
@@ -43,19 +49,21 @@ def get_label_replacement(label):
         raise e
 
 
+@profiling.profiled()
 def make_1D_correlation_plot(
         snapshot_dict,
         output_path
 ):
-    hep.style.use("CMS")
-    hep.cms.text(f"Preliminary", loc=0)
+    fig = export.figure()
+    ax = fig.subplots()
+    hep.cms.text(f"Preliminary", loc=0, ax=ax)
     
     samples = list(snapshot_dict.keys())
     y_labels = map(get_label_replacement, samples)
     correlations = list(snapshot_dict.values())
     y_points = np.arange(len(samples))
 
-    plt.plot(
+    ax.plot(
         correlations,
         y_points,
         linestyle='None',
@@ -64,30 +72,26 @@ def make_1D_correlation_plot(
         markersize=10,
     )
 
-    horiztonal_line = plt.axhline(
+    horiztonal_line = ax.axhline(
         y=2.0 - 0.5,
         color='grey',
         linestyle='--',
     )
 
-    plt.yticks(y_points, y_labels, fontsize=18)
-    plt.xlabel('Correlation Coeff.')
-    plt.ylabel('Signals')
+    ax.set_yticks(y_points, y_labels, fontsize=18)
+    ax.set_xlabel('Correlation Coeff.')
+    ax.set_ylabel('Signals')
 
     #plt.subplots_adjust(bottom=0.35)
-    plt.subplots_adjust(left=0.35)
+    fig.subplots_adjust(left=0.35)
 
     hist_name = f'1D_correlation_plot'
 
-    plt.savefig(
-        f'{output_path}/{hist_name}.png',
+    export.save(
+        fig,
+        [f'{output_path}/{hist_name}.png', f'{output_path}/{hist_name}.pdf'],
         bbox_inches='tight',
     )
-    plt.savefig(
-        f'{output_path}/{hist_name}.pdf',
-        bbox_inches='tight',
-    )
-    plt.close()
     
     
 
@@ -110,9 +114,11 @@ def main(args):
         args.output
     )
 
+    export.flush()
     console.log("Done making 1D correlation plots")
 
-if __name__ == '__main__':
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--input",
@@ -128,6 +134,12 @@ if __name__ == '__main__':
         help="Output directory to store output image files to"
     )
 
-    args = parser.parse_args()
+    profiling.add_profile_argument(parser)
+
+    args = parser.parse_args(argv)
+    return args
 
-    main(args)
+
+if __name__ == '__main__':
+    args = parse_args()
+    profiling.run(main, args)
@@ -0,0 +1,73 @@
+import argparse
+import os
+
+from rich.console import Console
+
+import parquet_io
+import profiling
+
+console = Console()
+
+
+def step_size(value: str):
+    """
+    Number of entries or a memory size with units, as uproot.iterate takes it.
+    """
+    return int(value) if value.isdigit() else value
+
+
+def main(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    for path in args.input:
+        output = os.path.join(args.output_dir, os.path.splitext(os.path.basename(path))[0] + ".parquet")
+        console.log(f"Converting {path}")
+        files = parquet_io.export_tree(
+            path,
+            output,
+            branches=args.branches,
+            tree=args.tree,
+            step_size=args.step_size,
+            row_group_size=args.row_group_size,
+            compression=args.compression,
+        )
+        size = sum(os.path.getsize(f) for f in files)
+        _, n_row_groups = parquet_io.count_row_groups(output)
+        console.log(f"Saved {output} ({len(files)} files, {n_row_groups} row groups, {size / 2**20:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert skimmed Events trees into Parquet datasets sorted by is_pure and PV_npvsGood"
+    )
+    parser.add_argument(
+        "--input",
+        required=True,
+        nargs="+",
+        help="Skimmed ROOT file(s) with an `Events` tree"
+    )
+    parser.add_argument(
+        "--output-dir",
+        required=True,
+        help="Directory for the datasets; <input name>.parquet/ is written for each input"
+    )
+    parser.add_argument("--branches", nargs="+", default=None, help="Branches to convert (default: all)")
+    parser.add_argument("--tree", default="Events")
+    parser.add_argument(
+        "--step-size",
+        type=step_size,
+        default="500 MB",
+        help="Entries or memory size (e.g. '500 MB') of the chunks of the tree written to one Parquet file each"
+    )
+    parser.add_argument(
+        "--row-group-size",
+        type=int,
+        default=2**16,
+        help="Rows per row group; smaller groups skip more precisely but compress slightly worse"
+    )
+    parser.add_argument("--compression", default="zstd")
+
+    profiling.add_profile_argument(parser)
+
+    args = parser.parse_args()
+
+    profiling.run(main, args)
@@ -0,0 +1,93 @@
+import argparse
+import json
+
+from rich.console import Console
+from rich.table import Table
+
+import loading
+import profiling
+from purity import OverlapMatrix, load_working_points, threshold_edges
+
+console = Console()
+
+
+@profiling.profiled()
+def fill_overlap_matrix(input_files, axo_branch, cicada_branch, matrix, npv_min=None, step_size="100 MB"):
+    branches = [axo_branch, cicada_branch] + (["PV_npvsGood"] if npv_min is not None else [])
+    for chunk in loading.iterate(input_files, branches, step_size=step_size):
+        axo, cicada = chunk[axo_branch], chunk[cicada_branch]
+        if npv_min is not None:
+            mask = chunk["PV_npvsGood"] >= npv_min
+            axo, cicada = axo[mask], cicada[mask]
+        matrix.fill(axo, cicada)
+    return matrix
+
+
+def print_summary(matrix, axo_wps, cicada_wps):
+    table = Table(title=f"Zero Bias efficiency [%] of {matrix.total:.0f} events: AXO unique / CICADA unique / both")
+    table.add_column("AXO \\ CICADA")
+    for label in cicada_wps:
+        table.add_column(label, justify="right")
+    for axo_label, axo_threshold in axo_wps.items():
+        cells = []
+        for cicada_threshold in cicada_wps.values():
+            eff = matrix.efficiencies_at(axo_threshold, cicada_threshold)
+            cells.append(f"{100 * eff['axo_unique']:.3g} / {100 * eff['cicada_unique']:.3g} / {100 * eff['both']:.3g}")
+        table.add_row(f"{axo_label} ({axo_threshold:g})", *cells)
+    console.print(table)
+
+
+def main(args):
+    console.log("Making AXO-CICADA overlap matrix")
+    with open(args.config) as f:
+        config = json.load(f)
+    axo_branch = config["AXO Scores"][args.axo]
+    cicada_branch = config["CICADA Scores"][args.cicada]
+    axo_wps, cicada_wps = load_working_points(args.config, args.axo, args.cicada)
+
+    matrix = OverlapMatrix(
+        threshold_edges(0, args.axo_max, args.axo_bin_width, axo_wps.values()),
+        threshold_edges(0, args.cicada_max, args.cicada_bin_width, cicada_wps.values()),
+    )
+    fill_overlap_matrix(args.input, axo_branch, cicada_branch, matrix, args.npv_min, args.step_size)
+
+    print_summary(matrix, axo_wps, cicada_wps)
+    matrix.save(args.output, axo_wps, cicada_wps)
+    console.log(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Overlap and unique rates of AXOL1TL and CICADA for all pairs of working points"
+    )
+    parser.add_argument(
+        "--input",
+        required=True,
+        nargs="+",
+        help="Skimmed Zero Bias ROOT file(s) with an `Events` tree"
+    )
+    parser.add_argument(
+        "--output",
+        required=True,
+        help="Output pickle with the working point matrices and the full cumulative histogram"
+    )
+    parser.add_argument("--config", default="config/AXO_style_score_plot_config.json")
+    parser.add_argument("--axo", default="AXOv4", help="Key of the AXO version in the config")
+    parser.add_argument("--cicada", default="CICADA2024", help="Key of the CICADA version in the config")
+    parser.add_argument("--axo-max", type=float, default=3400.0)
+    parser.add_argument("--axo-bin-width", type=float, default=1.0)
+    parser.add_argument("--cicada-max", type=float, default=256.0)
+    parser.add_argument("--cicada-bin-width", type=float, default=1.0)
+    parser.add_argument(
+        "--npv-min",
+        type=int,
+        default=None,
+        help="Only use events with PV_npvsGood >= this value"
+    )
+    parser.add_argument("--step-size", default="100 MB", help="Chunk size for reading the Events tree")
+
+    profiling.add_profile_argument(parser)
+
+    args = parser.parse_args()
+
+    profiling.run(main, args)
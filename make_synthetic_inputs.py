@@ -0,0 +1,110 @@
+import argparse
+import os
+
+import numpy as np
+
+import synthetic
+
+# Samples of the correlation plot, see label_replacements in make_correlation_plots.py
+CORRELATION_SAMPLES = ["Data", "SingleNeutrino", "GluGluHToGG", "TT", "HTo2LongLivedTo4b", "VBFHTo2B", "SUEP"]
+
+
+def main(args):
+
+    rng = synthetic.get_rng(args.seed)
+    os.makedirs(args.output, exist_ok=True)
+
+    extra_triggers = [f"DST_PFScouting_Synthetic{i}" for i in range(args.extra_triggers)]
+    if args.npv_axis:
+        # a single file per plot, the nPV10 variants are sliced from it at plot time
+        npv_edges = np.arange(0, args.npv_bins + 1, dtype=np.float64)
+        variants = [("", args.hist_events)]
+    else:
+        npv_edges = None
+        variants = [("", args.hist_events), ("_nPV10", args.hist_events // 3)]
+    for name, (triggers, hist_keys) in synthetic.HIST_FILES.items():
+        for suffix, n_events in variants:
+            path = f"{args.output}/{name}{suffix}.root"
+            synthetic.write_hist_file(
+                path, triggers + extra_triggers, hist_keys, n_events, rng, args.bin_scale, npv_edges
+            )
+            print(f"Wrote {path}")
+
+    if args.tree_events > 0:
+        for proc in args.processes:
+            path = f"{args.output}/{proc}.root"
+            signal = proc in synthetic.SIGNAL_PROCESSES
+            synthetic.write_events_file(path, args.tree_events, rng, signal=signal, chunk_size=args.chunk_size)
+            print(f"Wrote {path} ({args.tree_events} events)")
+
+    n = args.score_events
+    is_pure = rng.random(n) < 0.2
+    synthetic.write_score_plot_info(
+        f"{args.output}/CICADA2024_CICADAScore_plot_info.pkl",
+        synthetic.cicada_scores(n, rng), is_pure, threshold=121.0, bins=np.arange(0, 182, 2),
+    )
+    synthetic.write_score_plot_info(
+        f"{args.output}/axol1tl_v4_AXOScore_plot_info.pkl",
+        synthetic.axo_scores(n, rng), is_pure, threshold=415.0, bins=np.arange(0, 2020, 20),
+    )
+    synthetic.write_correlation_dict(f"{args.output}/correlation_dict.pkl", CORRELATION_SAMPLES, rng)
+    print(f"Wrote score plot info and correlation pickles to {args.output}")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Write synthetic stand-ins for all plot inputs (hists_plot*.root, skimmed Events trees and pickles)"
+    )
+    parser.add_argument(
+        "--output",
+        default="inputs_synthetic",
+        help="Output directory; use it in place of inputs/"
+    )
+    parser.add_argument(
+        "--hist-events",
+        type=lambda s: int(float(s)),
+        default=10**9,
+        help="Entries per histogram of the most inclusive trigger (drawn in O(bins))"
+    )
+    parser.add_argument(
+        "--bin-scale",
+        type=int,
+        default=1,
+        help="Multiply the number of bins of every histogram by this factor"
+    )
+    parser.add_argument(
+        "--extra-triggers",
+        type=int,
+        default=0,
+        help="Number of additional synthetic triggers to write to every histogram file"
+    )
+    parser.add_argument(
+        "--npv-axis",
+        action="store_true",
+        help="Write 2D histograms with an nPV axis instead of separate _nPV10 files"
+    )
+    parser.add_argument("--npv-bins", type=int, default=100, help="Number of unit-width nPV bins with --npv-axis")
+    parser.add_argument(
+        "--tree-events",
+        type=lambda s: int(float(s)),
+        default=10**5,
+        help="Events per process in the skimmed Events trees (0 to skip the trees)"
+    )
+    parser.add_argument(
+        "--processes",
+        nargs="+",
+        default=synthetic.BACKGROUND_PROCESSES + synthetic.SIGNAL_PROCESSES,
+        help="Processes to write skimmed Events trees for"
+    )
+    parser.add_argument(
+        "--score-events",
+        type=lambda s: int(float(s)),
+        default=10**6,
+        help="Events used to fill the AXO-style score plot pickles"
+    )
+    parser.add_argument("--chunk-size", type=int, default=10**6, help="Events written per tree basket batch")
+    parser.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+    main(args)
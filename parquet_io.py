@@ -0,0 +1,131 @@
+"""
+Skimmed Events trees as Parquet datasets, read with predicate pushdown.
+The nPV-masked and pure-only studies read whole ROOT columns and mask them in
+memory. export_tree() writes a tree as a directory of Parquet files (one per
+chunk of the tree) in which the rows of each file are sorted by is_pure and
+PV_npvsGood, so every row group covers a narrow range of both and its min/max
+statistics tell whether it can match a cut. read_arrays() hands the cut to
+pyarrow, which skips non-matching row groups without decompressing them:
+
+    parquet_io.export_tree("ZB.root", "ZB.parquet")
+    arrays = parquet_io.read_arrays(
+        "ZB.parquet", ["CICADA2024_CICADAScore"], filters=[("PV_npvsGood", ">", 10), ("is_pure", "==", True)]
+    )
+
+Filters use the pyarrow.parquet DNF convention: a list of (column, op, value)
+tuples that must all hold, or a list of such lists of which one must hold.
+Sorting changes the order of the events, which is the same for all columns of
+a dataset, so columns read from one dataset stay aligned.
+
+pyarrow is only imported when a dataset is written or read.
+"""
+import glob
+import os
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+import loading
+import profiling
+
+SORT_BRANCHES = ("is_pure", "PV_npvsGood")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Reading and writing Parquet datasets requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def is_parquet(path: str) -> bool:
+    return path.endswith(".parquet") or path.endswith(".pq")
+
+
+def sort_order(arrays: Dict[str, np.ndarray], sort_branches: Sequence[str] = SORT_BRANCHES) -> np.ndarray:
+    """
+    Permutation sorting the rows by sort_branches (the first is the primary key); branches
+    that are not among the arrays are ignored.
+    """
+    keys = [arrays[b] for b in sort_branches if b in arrays]
+    n_rows = len(next(iter(arrays.values())))
+    if not keys:
+        return np.arange(n_rows)
+    # np.lexsort sorts by its last key first
+    return np.lexsort(keys[::-1])
+
+
+@profiling.profiled()
+def export_tree(
+        path: str,
+        output_dir: str,
+        branches: List[str] = None,
+        tree: str = "Events",
+        sort_branches: Sequence[str] = SORT_BRANCHES,
+        step_size="500 MB",
+        row_group_size: int = 2**16,
+        compression: str = "zstd",
+        compact_dtypes: bool = True,
+) -> List[str]:
+    """
+    Write the flat `branches` of `tree` (default: all) to `output_dir`, one Parquet file per
+    chunk of step_size, with the rows of each chunk sorted by sort_branches and split into row
+    groups of row_group_size rows with min/max statistics. Returns the files written.
+    """
+    pa = _pyarrow()
+    os.makedirs(output_dir, exist_ok=True)
+    for old in glob.glob(os.path.join(output_dir, "part-*.parquet")):
+        os.remove(old)
+    if branches is None:
+        with loading.open_file(path) as f:
+            branches = list(f[tree].keys())
+
+    written = []
+    for i, chunk in enumerate(loading.iterate(path, branches, tree=tree, step_size=step_size)):
+        for branch, array in chunk.items():
+            if array.dtype.kind not in "biuf":
+                raise ValueError(f"{branch} is not a flat numeric branch and cannot be exported")
+        if compact_dtypes:
+            chunk = {branch: loading.compact(array, branch) for branch, array in chunk.items()}
+        order = sort_order(chunk, sort_branches)
+        table = pa.table({branch: array[order] for branch, array in chunk.items()})
+        file_path = os.path.join(output_dir, f"part-{i:05d}.parquet")
+        pa.parquet.write_table(table, file_path, row_group_size=row_group_size, compression=compression)
+        written.append(file_path)
+    return written
+
+
+def _dataset(path: str):
+    pa = _pyarrow()
+    return pa.dataset.dataset(path, format="parquet")
+
+
+def _expression(filters):
+    if not filters:
+        return None
+    return _pyarrow().parquet.filters_to_expression(filters)
+
+
+@profiling.profiled()
+def read_arrays(path: str, columns: List[str], filters: list = None) -> Dict[str, np.ndarray]:
+    """
+    `columns` of the rows of a Parquet file or dataset directory that pass `filters`,
+    reading only the row groups whose statistics allow a match.
+    """
+    table = _dataset(path).to_table(columns=list(columns), filter=_expression(filters))
+    return {c: table.column(c).to_numpy() for c in columns}
+
+
+def count_row_groups(path: str, filters: list = None) -> tuple:
+    """
+    (row groups that may match `filters`, all row groups) of a Parquet file or dataset.
+    """
+    expression = _expression(filters)
+    selected = total = 0
+    for fragment in _dataset(path).get_fragments():
+        total += fragment.num_row_groups
+        selected += fragment.subset(expression).num_row_groups if expression is not None else fragment.num_row_groups
+    return selected, total
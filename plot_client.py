@@ -0,0 +1,39 @@
+"""
+Thin client of plot_server.py, a drop-in replacement for running a plotting script:
+
+    python3 plot_client.py makeObjMultPlots.py --object L1Jet --input ... --output ...
+
+behaves like `python3 makeObjMultPlots.py --object L1Jet ...`, but the script runs in
+the warm server. Without a server listening, the script runs in this process.
+Only the standard library is imported unless it has to run locally.
+"""
+import json
+import os
+import socket
+import sys
+
+
+def main(argv) -> int:
+    if not argv:
+        print("usage: plot_client.py <script.py> [script arguments ...]", file=sys.stderr)
+        return 2
+    script, script_argv = argv[0], argv[1:]
+    # as plot_server.default_socket_path, without importing the server
+    socket_path = os.environ.get("PLOT_SERVER_SOCKET", f"/tmp/plot-server-{os.getuid()}.sock")
+    request = {"script": script, "argv": script_argv, "cwd": os.getcwd()}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(socket_path)
+            s.sendall(json.dumps(request).encode() + b"\n")
+            with s.makefile("rb") as f:
+                response = json.loads(f.readline())
+    except (FileNotFoundError, ConnectionRefusedError):
+        import plot_server
+        return plot_server.run_script(script, script_argv)
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return response["returncode"]
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
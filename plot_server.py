@@ -0,0 +1,192 @@
+"""
+Long-running plot server for iterating on figures.
+Every invocation of a plotting script pays for the interpreter, importing
+matplotlib/mplhep/uproot, setting up the CMS style and reading its inputs,
+which takes several times longer than drawing the figure. The server imports
+the plotting scripts once and runs their main() for each request it gets on
+a unix socket, with histogram inputs memoised until the file changes
+(hist_utils with caching enabled). A script is re-imported when its source
+changed, so edits to the cosmetics of makeObjMultPlots.py are picked up by
+the next request; changes to shared modules (drawing, templates, ...) need a
+restart.
+
+    python3 plot_server.py &
+    python3 plot_client.py makeObjMultPlots.py --object L1Jet --input inputs/hists_plotA_plotB_plotC.root --output outputs/L1Jet_mult
+
+Requests are handled one at a time, since pyplot is not thread safe.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import socketserver
+import sys
+import time
+import traceback
+from typing import List
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+
+import caching
+import export
+import profiling
+
+# scripts with a parse_args(argv) and a main(args) that the server can run
+SCRIPTS = [
+    "makeDimuonPlot",
+    "makeHTPurityPlot",
+    "makeL1DistPlot",
+    "makeObjMultPlots",
+    "make_axo_style_score_plots",
+    "make_correlation_plots",
+]
+
+
+def default_socket_path() -> str:
+    return os.environ.get("PLOT_SERVER_SOCKET", f"/tmp/plot-server-{os.getuid()}.sock")
+
+
+def script_module(script: str) -> str:
+    """
+    Module name of a script given as e.g. makeObjMultPlots.py or ./makeObjMultPlots.py.
+    """
+    name = os.path.splitext(os.path.basename(script))[0]
+    if name not in SCRIPTS:
+        raise ValueError(f"{script} is not one of the plotting scripts {SCRIPTS}")
+    return name
+
+
+def run_script(script: str, argv: List[str]) -> int:
+    """
+    Run a plotting script's main in this process, as `python3 script *argv` would, and
+    return its exit code. All figures are written when it returns.
+    """
+    module = importlib.import_module(script_module(script))
+    # argparse takes the program name of usage and errors from sys.argv[0]
+    prog, sys.argv[0] = sys.argv[0], os.path.basename(module.__file__)
+    try:
+        args = module.parse_args(argv)
+        profiling.run(module.main, args)
+        export.flush()
+    except SystemExit as e:
+        # argparse errors, --help and sys.exit(), with the exit code the interpreter would give
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    finally:
+        sys.argv[0] = prog
+        plt.close("all")
+    return 0
+
+
+class PlotServer(socketserver.UnixStreamServer):
+
+    def __init__(self, socket_path: str, scripts: List[str] = SCRIPTS):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, PlotRequestHandler)
+        self.mtimes = {}
+        # import matplotlib, mplhep, uproot and the CMS style once
+        for name in scripts:
+            try:
+                self._import(name)
+            except ImportError as e:
+                print(f"  WARNING: cannot import {name} yet ({e}), it is imported on its first request")
+        # the CMS style set up by the imports; every request starts from it
+        self.rc_params = dict(matplotlib.rcParams)
+
+    def _import(self, name: str) -> None:
+        """
+        Import a script, or import it again if its source changed since.
+        """
+        module = sys.modules.get(name)
+        if module is None:
+            module = importlib.import_module(name)
+        elif os.path.getmtime(module.__file__) == self.mtimes.get(name):
+            return
+        else:
+            module = importlib.reload(module)
+        self.mtimes[name] = os.path.getmtime(module.__file__)
+
+    def render(self, request: dict) -> dict:
+        """
+        Run request["script"] with request["argv"] in request["cwd"] and return its
+        exit code, output and the files it wrote.
+        """
+        start = time.perf_counter()
+        stdout, stderr = io.StringIO(), io.StringIO()
+        export.EXPORTER.records.clear()
+        returncode = 1
+        cwd = os.getcwd()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                name = script_module(request["script"])
+                self._import(name)
+                # undo style changes of the previous request
+                matplotlib.rcParams.update(self.rc_params)
+                os.chdir(request.get("cwd", cwd))
+                returncode = run_script(name, request.get("argv", []))
+            except Exception:
+                traceback.print_exc()
+                # do not report the exports of a failed request with the next one
+                with contextlib.suppress(Exception):
+                    export.flush()
+            finally:
+                os.chdir(cwd)
+        return {
+            "returncode": returncode,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+            "files": [record["path"] for record in export.EXPORTER.records],
+            "seconds": time.perf_counter() - start,
+        }
+
+
+class PlotRequestHandler(socketserver.StreamRequestHandler):
+    """
+    One JSON request {script, argv, cwd} per line, answered by one JSON line.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.render(json.loads(line))
+            except json.JSONDecodeError as e:
+                response = {"returncode": 1, "stdout": "", "stderr": f"Invalid request: {e}\n", "files": []}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+def main(args):
+    # histogram inputs are kept in memory and re-read once their file changes
+    caching.enable(max_bytes=args.cache_bytes)
+    with PlotServer(args.socket) as server:
+        print(f"Serving {', '.join(SCRIPTS)} on {args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Keep the plotting scripts and their inputs loaded and run them for plot_client.py"
+    )
+    parser.add_argument("--socket", default=default_socket_path(), help="Unix socket to listen on")
+    parser.add_argument(
+        "--cache-bytes",
+        type=int,
+        default=2**30,
+        help="Memory for the histograms of recently used input files"
+    )
+    args = parser.parse_args()
+    sys.exit(main(args))
@@ -0,0 +1,232 @@
+"""
+Lightweight timing and memory instrumentation for the plotting code.
+
+Stages are recorded with the `timer` context manager or the `profiled`
+decorator. Both are no-ops until `enable()` is called (the `--profile`
+flag of every plotting script does this), so instrumented code costs
+nothing in normal runs.
+
+The JSON report contains one record per stage with its wall time, the peak
+traced Python/NumPy allocation (tracemalloc) and the process peak RSS, plus a
+`folded` list in collapsed-stack format that can be fed straight to
+flamegraph.pl or speedscope:
+
+    jq -r '.folded[]' report.json | flamegraph.pl > report.svg
+"""
+import argparse
+import functools
+import glob
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+def _peak_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class Profiler:
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.records: List[dict] = []
+        self._stack: List[dict] = []
+
+    def enable(self, trace_memory: bool = True) -> None:
+        self.enabled = True
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def reset(self) -> None:
+        self.records = []
+        self._stack = []
+
+    @contextmanager
+    def timer(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        frame = {"name": name, "child_seconds": 0.0, "peak": 0}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # remember the parent's peak before resetting it for this stage
+                parent = self._stack[-1]
+                parent["peak"] = max(parent["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["start_memory"] = current
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+            record = {
+                "name": name,
+                "stack": [f["name"] for f in self._stack] + [name],
+                "seconds": seconds,
+                "self_seconds": seconds - frame["child_seconds"],
+                "peak_rss_bytes": _peak_rss_bytes(),
+            }
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame["peak"])
+                record["peak_traced_bytes"] = peak - frame["start_memory"]
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            if self._stack:
+                self._stack[-1]["child_seconds"] += seconds
+            self.records.append(record)
+
+    def profiled(self, name: Optional[str] = None) -> Callable:
+        """
+        Decorator recording every call of the wrapped function as a stage.
+        """
+        def decorator(func):
+            stage = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        Aggregate the records per stage name.
+        """
+        summary = {}
+        for record in self.records:
+            s = summary.setdefault(record["name"], {
+                "calls": 0, "seconds": 0.0, "self_seconds": 0.0,
+                "peak_traced_bytes": 0, "peak_rss_bytes": 0,
+            })
+            s["calls"] += 1
+            s["seconds"] += record["seconds"]
+            s["self_seconds"] += record["self_seconds"]
+            s["peak_traced_bytes"] = max(s["peak_traced_bytes"], record.get("peak_traced_bytes", 0))
+            s["peak_rss_bytes"] = max(s["peak_rss_bytes"], record["peak_rss_bytes"])
+        return summary
+
+    def folded(self) -> List[str]:
+        """
+        Collapsed stacks ("a;b;c <self time in microseconds>") for flame graphs.
+        """
+        totals = {}
+        for record in self.records:
+            key = ";".join(record["stack"])
+            totals[key] = totals.get(key, 0) + int(round(record["self_seconds"] * 1e6))
+        return [f"{stack} {us}" for stack, us in totals.items()]
+
+    def report(self, label: str = None) -> dict:
+        return {
+            "label": label or " ".join(os.path.basename(a) for a in sys.argv),
+            "peak_rss_bytes": _peak_rss_bytes(),
+            "summary": self.summary(),
+            "records": self.records,
+            "folded": self.folded(),
+        }
+
+    def write_report(self, path: str, label: str = None) -> None:
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(label), f, indent=2)
+        print(f"Saved profile to {path}")
+
+
+PROFILER = Profiler()
+enable = PROFILER.enable
+timer = PROFILER.timer
+profiled = PROFILER.profiled
+write_report = PROFILER.write_report
+
+
+def profile_methods(cls):
+    """
+    Class decorator recording every public method (and `_save_fig`) as a stage.
+    """
+    for attr, value in list(vars(cls).items()):
+        if callable(value) and (not attr.startswith("_") or attr == "_save_fig"):
+            setattr(cls, attr, PROFILER.profiled(f"{cls.__name__}.{attr}")(value))
+    return cls
+
+
+def add_profile_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile",
+        default=None,
+        help="Write a JSON timing and memory report (with flame graph stacks) to this path"
+    )
+
+
+def run(main: Callable, args: argparse.Namespace) -> None:
+    """
+    Run a script's main, profiling it if `--profile` was given.
+    """
+    if getattr(args, "profile", None):
+        enable()
+    with timer("main"):
+        main(args)
+    if getattr(args, "profile", None):
+        write_report(args.profile)
+
+
+def merge_reports(paths: List[str]) -> dict:
+    """
+    Combine several reports (e.g. one per Snakemake rule) into one.
+    Flame graph stacks are prefixed with the report name.
+    """
+    merged = {"reports": {}, "folded": []}
+    for path in sorted(paths):
+        with open(path) as f:
+            report = json.load(f)
+        name = os.path.splitext(os.path.basename(path))[0]
+        merged["reports"][name] = {
+            "label": report["label"],
+            "peak_rss_bytes": report["peak_rss_bytes"],
+            "summary": report["summary"],
+        }
+        merged["folded"] += [f"{name};{line}" for line in report["folded"]]
+    return merged
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Merge profile reports written with --profile into a single summary"
+    )
+    parser.add_argument("inputs", nargs="+", help="Profile reports (globs are expanded)")
+    parser.add_argument("--output", required=True, help="Merged JSON report")
+    parser.add_argument("--folded", default=None, help="Optionally also write collapsed stacks to this path")
+
+    args = parser.parse_args()
+    paths = [p for pattern in args.inputs for p in (glob.glob(pattern) or [pattern])]
+    paths = [p for p in paths if os.path.abspath(p) != os.path.abspath(args.output)]
+    merged = merge_reports(paths)
+    with open(args.output, "w") as f:
+        json.dump(merged, f, indent=2)
+    if args.folded:
+        with open(args.folded, "w") as f:
+            f.write("\n".join(merged["folded"]) + "\n")
+    print(f"Merged {len(paths)} profiles into {args.output}")
@@ -0,0 +1,143 @@
+"""
+Overlap and purity of the AXOL1TL and CICADA triggers at all pairs of thresholds.
+A 2D (AXO score x CICADA score) histogram of Zero Bias events is filled once,
+chunk by chunk, and turned into a cumulative count N[i, j] of events with
+AXO >= axo_edges[i] and CICADA >= cicada_edges[j]. Any threshold pair on the
+bin edges is then answered by a constant time lookup:
+
+    both          = N[i, j]
+    AXO unique    = N[i, 0] - N[i, j]   (fires AXO but not CICADA)
+    CICADA unique = N[0, j] - N[i, j]
+"""
+import json
+import pickle as pkl
+from typing import Dict, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+QUANTITIES = ("axo", "cicada", "both", "either", "axo_unique", "cicada_unique")
+
+
+def load_working_points(config_path: str, axo: str, cicada: str) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """
+    Working points {label: threshold} of one AXO and one CICADA version, e.g.
+    ("AXOv4", "CICADA2024"), from config/AXO_style_score_plot_config.json.
+    """
+    with open(config_path) as f:
+        config = json.load(f)
+    axo_wps = {label: float(t) for label, t in config["AXO working points"][axo].items()}
+    cicada_wps = {label: float(t) for label, t in config["CICADA working points"][cicada].items()}
+    return axo_wps, cicada_wps
+
+
+def threshold_edges(low: float, high: float, width: float, thresholds=()) -> npt.NDArray:
+    """
+    Bin edges from low to high in steps of width, with the given thresholds added
+    so that every one of them can be looked up exactly.
+    """
+    return np.union1d(np.arange(low, high + width, width), np.asarray(list(thresholds), dtype=np.float64))
+
+
+class OverlapMatrix:
+    """
+    Cumulative AXO x CICADA event counts. Triggers fire for score >= threshold,
+    as for the `working` histograms of the AXO-style score plots.
+    Fills from several chunks or files can be combined with `+=`.
+    """
+
+    def __init__(self, axo_edges: npt.ArrayLike, cicada_edges: npt.ArrayLike):
+        self.axo_edges = np.asarray(axo_edges, dtype=np.float64)
+        self.cicada_edges = np.asarray(cicada_edges, dtype=np.float64)
+        # bin 0 holds scores below the first edge, the last bin those at or above the last edge
+        self.counts = np.zeros((len(self.axo_edges) + 1, len(self.cicada_edges) + 1))
+        self._axo_index = {float(e): i + 1 for i, e in enumerate(self.axo_edges)}
+        self._cicada_index = {float(e): i + 1 for i, e in enumerate(self.cicada_edges)}
+        self._cumulative = None
+
+    def fill(self, axo_scores: npt.ArrayLike, cicada_scores: npt.ArrayLike, weights: npt.ArrayLike = None):
+        axo_bins = np.searchsorted(self.axo_edges, axo_scores, side="right")
+        cicada_bins = np.searchsorted(self.cicada_edges, cicada_scores, side="right")
+        flat = axo_bins * self.counts.shape[1] + cicada_bins
+        self.counts += np.bincount(flat, weights=weights, minlength=self.counts.size).reshape(self.counts.shape)
+        self._cumulative = None
+        return self
+
+    def __iadd__(self, other: "OverlapMatrix"):
+        if not (np.array_equal(self.axo_edges, other.axo_edges)
+                and np.array_equal(self.cicada_edges, other.cicada_edges)):
+            raise ValueError("Cannot add overlap matrices with different binning")
+        self.counts += other.counts
+        self._cumulative = None
+        return self
+
+    @property
+    def cumulative(self) -> npt.NDArray:
+        if self._cumulative is None:
+            self._cumulative = self.counts[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+        return self._cumulative
+
+    @property
+    def total(self) -> float:
+        return self.cumulative[0, 0]
+
+    def _index(self, axo_threshold: float, cicada_threshold: float) -> Tuple[int, int]:
+        try:
+            return self._axo_index[float(axo_threshold)], self._cicada_index[float(cicada_threshold)]
+        except KeyError as e:
+            raise ValueError(f"Threshold {e.args[0]} is not a bin edge of the overlap matrix") from None
+
+    def counts_at(self, axo_threshold: float, cicada_threshold: float) -> Dict[str, float]:
+        """
+        Number of events per quantity in QUANTITIES at one threshold pair.
+        """
+        i, j = self._index(axo_threshold, cicada_threshold)
+        n = self.cumulative
+        both = n[i, j]
+        return {
+            "axo": n[i, 0],
+            "cicada": n[0, j],
+            "both": both,
+            "either": n[i, 0] + n[0, j] - both,
+            "axo_unique": n[i, 0] - both,
+            "cicada_unique": n[0, j] - both,
+        }
+
+    def efficiencies_at(self, axo_threshold: float, cicada_threshold: float) -> Dict[str, float]:
+        """
+        Like counts_at, as fractions of all filled events; times the Zero Bias rate this is a trigger rate.
+        """
+        return {k: v / self.total for k, v in self.counts_at(axo_threshold, cicada_threshold).items()}
+
+    def overlap_fraction(self, axo_threshold: float, cicada_threshold: float) -> float:
+        """
+        Events firing both triggers over events firing either of them.
+        """
+        c = self.counts_at(axo_threshold, cicada_threshold)
+        return c["both"] / c["either"] if c["either"] else np.nan
+
+    def matrix(self, axo_wps: Dict[str, float], cicada_wps: Dict[str, float]) -> Dict[str, npt.NDArray]:
+        """
+        {quantity: (len(axo_wps), len(cicada_wps)) counts} for all pairs of working points.
+        """
+        rows = [self.counts_at(a, c) for a in axo_wps.values() for c in cicada_wps.values()]
+        shape = (len(axo_wps), len(cicada_wps))
+        return {q: np.array([r[q] for r in rows]).reshape(shape) for q in QUANTITIES}
+
+    def save(self, path: str, axo_wps: Dict[str, float], cicada_wps: Dict[str, float]):
+        """
+        Pickle the working point matrices and the full cumulative grid for plotting.
+        Counts are stored as is; divide by "total" for efficiencies.
+        """
+        plot_info = {
+            "total": self.total,
+            "axo_working_points": axo_wps,
+            "cicada_working_points": cicada_wps,
+            "matrix": self.matrix(axo_wps, cicada_wps),
+            "axo_edges": self.axo_edges,
+            "cicada_edges": self.cicada_edges,
+            # cumulative[i, j]: events with AXO >= axo_edges[i] and CICADA >= cicada_edges[j]
+            "cumulative": self.cumulative[1:, 1:],
+        }
+        with open(path, "wb") as f:
+            pkl.dump(plot_info, f)
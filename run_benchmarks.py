@@ -0,0 +1,259 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import matplotlib
+matplotlib.use("Agg")
+
+import numpy as np
+
+import loading
+import sparse
+import synthetic
+import utils
+
+# Benchmarks with dense (n, 72, 56) or (n, 18, 14) intermediates are capped so
+# that a 10^8 event run still fits into the memory of a laptop.
+DEFAULT_SIZES = [10**4, 10**5, 10**6]
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+
+
+def _setup_roc(n, rng):
+    return (synthetic.cicada_scores(n, rng), synthetic.cicada_scores(n, rng, signal=True)), {}
+
+
+def _setup_roc_dict(n, rng):
+    return (synthetic.score_dict(n, rng), "ZB", ["TT", "SUEP", "GluGluHToGG"]), {}
+
+
+def _setup_scores(n, rng):
+    return (synthetic.axo_scores(n, rng),), {}
+
+
+def _setup_towers(n, rng):
+    return synthetic.tower_arrays(n, rng), {}
+
+
+def _setup_quantize(n, rng):
+    return (rng.normal(10, 50, n),), {}
+
+
+def _setup_autoencoder(n, rng):
+    return synthetic.autoencoder_io(n, rng), {}
+
+
+def _setup_score_distribution(n, rng):
+    scores = synthetic.score_dict(n, rng)
+    return (list(scores.values()), list(scores.keys())), {"name": "bench-score-distribution"}
+
+
+def _setup_roc_curves(n, rng):
+    roc_dict = utils.get_roc_dict(synthetic.score_dict(n, rng), "ZB", ["TT", "SUEP", "GluGluHToGG"])
+    return (roc_dict,), {"name": "bench-roc-curves"}
+
+
+def _setup_spacial_deposits(n, rng):
+    return ([synthetic.region_deposits(n, rng)], ["ZB"]), {"name": "bench-spacial", "apply_weights": True}
+
+
+_tmp_dir = None
+LOADING_BRANCHES = list(synthetic.EVENTS_BRANCHES)
+
+
+def _setup_events_file(n, rng):
+    global _tmp_dir
+    if _tmp_dir is None:
+        _tmp_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(_tmp_dir.name, f"events_{n}.root")
+    if not os.path.exists(path):
+        synthetic.write_events_file(path, n, rng)
+    return path
+
+
+def _setup_get_arrays(workers):
+    def setup(n, rng):
+        return (_setup_events_file(n, rng), LOADING_BRANCHES), {"workers": workers}
+    return setup
+
+
+def _setup_iterate(depth):
+    def setup(n, rng):
+        return (_setup_events_file(n, rng), depth), {}
+    return setup
+
+
+def _histogram_chunks(path, depth):
+    """
+    Read in chunks and histogram each, so that reading ahead can overlap with the processing.
+    """
+    for chunk in loading.iterate(path, LOADING_BRANCHES, step_size="20 MB", depth=depth):
+        for branch in ("CICADA2024_CICADAScore", "axol1tl_v4_AXOScore", "et"):
+            np.histogram(chunk[branch], bins=1000)
+            np.sort(chunk[branch])
+
+
+def _sparse_region_deposits(tower_ieta, tower_iphi, tower_iet):
+    return sparse.SparseDeposits.from_towers(tower_ieta, tower_iphi, tower_iet).to_regions()
+
+
+def _draw_method(method):
+    def run(*args, **kwargs):
+        import drawing
+        import export
+        with tempfile.TemporaryDirectory() as tmp:
+            # save synchronously so that the benchmark includes writing the file
+            draw = drawing.Draw(output_dir=Path(tmp), exporter=export.FigureExporter(workers=0, verbose=False))
+            getattr(draw, method)(*args, **kwargs)
+    return run
+
+
+# name: (setup(n, rng) -> (args, kwargs), function, largest size to run)
+BENCHMARKS = {
+    "get_roc_from_scores": (_setup_roc, utils.get_roc_from_scores, 10**8),
+    "get_roc_dict": (_setup_roc_dict, utils.get_roc_dict, 10**7),
+    "get_fractions_above_threshold": (_setup_scores, utils.get_fractions_above_threshold, 10**8),
+    "get_dense_tower_deposits": (_setup_towers, utils.get_dense_tower_deposits, 10**5),
+    "get_region_deposits": (_setup_towers, utils.get_region_deposits, 10**5),
+    "sparse.SparseDeposits.to_regions": (_setup_towers, _sparse_region_deposits, 10**7),
+    "quantize": (_setup_quantize, utils.quantize, 10**8),
+    "get_anomaly_scores_ae": (_setup_autoencoder, utils.get_anomaly_scores_ae, 10**6),
+    "Draw.plot_anomaly_score_distribution": (_setup_score_distribution, _draw_method("plot_anomaly_score_distribution"), 10**7),
+    "Draw.plot_roc_curves": (_setup_roc_curves, _draw_method("plot_roc_curves"), 10**7),
+    "loading.get_arrays[serial]": (_setup_get_arrays(1), loading.get_arrays, 10**8),
+    "loading.get_arrays[threaded]": (_setup_get_arrays(None), loading.get_arrays, 10**8),
+    "loading.iterate[synchronous]": (_setup_iterate(0), _histogram_chunks, 10**8),
+    "loading.iterate[prefetch]": (_setup_iterate(1), _histogram_chunks, 10**8),
+    "Draw.plot_spacial_deposits_distribution": (
+        _setup_spacial_deposits, _draw_method("plot_spacial_deposits_distribution"), 10**6
+    ),
+}
+
+
+def run_benchmark(name, n, repeat, seed=42):
+    """
+    Time `repeat` calls (best of) and measure the peak traced memory of one more.
+    Memory is measured separately because tracemalloc slows down allocations.
+    """
+    setup, func, _ = BENCHMARKS[name]
+    args, kwargs = setup(n, synthetic.get_rng(seed))
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": min(timings), "peak_bytes": peak}
+
+
+def compare(results, baseline, threshold):
+    """
+    Return the list of (key, metric, baseline value, new value) exceeding the threshold.
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            old, new = baseline[key][metric], result[metric]
+            if old > 0 and new > old * (1 + threshold):
+                regressions.append((key, metric, old, new))
+    return regressions
+
+
+def main(args):
+
+    names = args.only or list(BENCHMARKS)
+    results = {}
+    for name in names:
+        max_size = BENCHMARKS[name][2]
+        for n in args.sizes:
+            key = f"{name}[{n}]"
+            if n > max_size:
+                print(f"{key:<55} skipped (above {max_size:.0e} events)")
+                continue
+            results[key] = run_benchmark(name, n, args.repeat)
+            print(f"{key:<55} {results[key]['seconds']:10.4f} s {results[key]['peak_bytes'] / 2**20:10.1f} MiB")
+
+    report = {
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count()},
+        "numpy": np.__version__,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        baseline = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update({k: v for k, v in report.items() if k != "results"})
+        baseline["results"].update(results)
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline["results"], args.threshold)
+    for key, metric, old, new in regressions:
+        print(f"  REGRESSION: {key} {metric} {old:.4g} -> {new:.4g} (+{100 * (new / old - 1):.0f}%)")
+    if not regressions:
+        print(f"No regressions above {100 * args.threshold:.0f}% with respect to {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks of the utils and Draw hot paths on synthetic data"
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=lambda s: int(float(s)),
+        default=DEFAULT_SIZES,
+        help="Numbers of events to benchmark with, e.g. 1e4 1e6 1e8"
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=list(BENCHMARKS),
+        default=None,
+        help="Only run these benchmarks"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is kept)")
+    parser.add_argument(
+        "--baseline",
+        default=DEFAULT_BASELINE,
+        help="Baseline JSON file; created if it does not exist"
+    )
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline with these results")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slow-down or memory increase flagged as a regression"
+    )
+    parser.add_argument("--output", default=None, help="Also write the results to this JSON file")
+
+    args = parser.parse_args()
+    raise SystemExit(main(args))
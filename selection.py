@@ -0,0 +1,188 @@
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+
+# A cut is either the name of a boolean column (e.g. "is_pure" or a trigger bit),
+# a boolean mask over all events of the sample, or a callable that receives the
+# sample and returns such a mask, e.g. `lambda s: s["PV_npvsGood"] > 10`.
+Cut = Union[str, npt.NDArray, Callable[["EventSample"], npt.NDArray]]
+ColumnSource = Union[npt.NDArray, Callable[[], npt.NDArray]]
+
+
+class SelectionCache:
+    """
+    Bounded LRU cache of materialised selected columns.
+    A maxsize of 0 disables caching, so every access re-applies the mask.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key not in self._entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key][1]
+
+    def put(self, key, cuts: tuple, value: npt.NDArray) -> None:
+        if self.maxsize <= 0:
+            return
+        # keep a reference to the cuts so that id()-based keys stay unique
+        self._entries[key] = (cuts, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class EventSample:
+    """
+    The columns of a single process, loaded on first access and never copied.
+    Each column is either an array or a zero-argument callable returning one,
+    e.g. `functools.partial(get_array, "ZB", "PV_npvsGood")`.
+    """
+
+    def __init__(self, columns: Dict[str, ColumnSource] = None, cache_size: int = 0):
+        self._sources = dict(columns or {})
+        self._loaded = {}
+        self.cache = SelectionCache(cache_size)
+        # bumped by add_column, so that selections re-evaluate masks built from replaced columns
+        self.version = 0
+
+    def add_column(self, name: str, source: ColumnSource) -> None:
+        self._sources[name] = source
+        self._loaded.pop(name, None)
+        self.cache.clear()
+        self.version += 1
+
+    def __getitem__(self, name: str) -> npt.NDArray:
+        if name not in self._loaded:
+            source = self._sources[name]
+            self._loaded[name] = source() if callable(source) else np.asarray(source)
+        return self._loaded[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sources
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        return tuple(self._sources)
+
+    def __len__(self) -> int:
+        if self._loaded:
+            return len(next(iter(self._loaded.values())))
+        return len(self[next(iter(self._sources))])
+
+    def all(self) -> "Selection":
+        return Selection(self)
+
+    def select(self, *cuts: Cut) -> "Selection":
+        return Selection(self, cuts)
+
+
+class Selection:
+    """
+    A lazily evaluated subset of an EventSample.
+    Cuts are only combined into a mask, and columns are only masked, when a
+    consumer indexes the selection with a column name.
+    """
+
+    def __init__(self, sample: EventSample, cuts: tuple = ()):
+        self.sample = sample
+        self.cuts = tuple(cuts)
+        self._mask = None
+        self._mask_version = None
+
+    def select(self, *cuts: Cut) -> "Selection":
+        return Selection(self.sample, self.cuts + tuple(cuts))
+
+    def __and__(self, other: "Selection") -> "Selection":
+        if other.sample is not self.sample:
+            raise ValueError("Can only combine selections of the same sample")
+        return Selection(self.sample, self.cuts + other.cuts)
+
+    def _evaluate(self, cut: Cut) -> npt.NDArray:
+        if isinstance(cut, str):
+            mask = self.sample[cut]
+        elif callable(cut):
+            mask = cut(self.sample)
+        else:
+            mask = cut
+        return np.asarray(mask, dtype=bool)
+
+    @property
+    def mask(self) -> Optional[npt.NDArray]:
+        """
+        Boolean mask over all events of the sample, or None if there are no cuts.
+        """
+        if not self.cuts:
+            return None
+        if self._mask is None or self._mask_version != self.sample.version:
+            mask = self._evaluate(self.cuts[0]).copy()
+            for cut in self.cuts[1:]:
+                mask &= self._evaluate(cut)
+            self._mask, self._mask_version = mask, self.sample.version
+        return self._mask
+
+    def _cache_key(self, column: str) -> tuple:
+        return tuple(c if isinstance(c, str) else id(c) for c in self.cuts) + (column,)
+
+    def __getitem__(self, column: str) -> npt.NDArray:
+        if not self.cuts:
+            return self.sample[column]
+        key = self._cache_key(column)
+        selected = self.sample.cache.get(key)
+        if selected is None:
+            selected = self.sample[column][self.mask]
+            self.sample.cache.put(key, self.cuts, selected)
+        return selected
+
+    def __contains__(self, column: str) -> bool:
+        return column in self.sample
+
+    def __len__(self) -> int:
+        if not self.cuts:
+            return len(self.sample)
+        return int(np.count_nonzero(self.mask))
+
+
+class ColumnView(Mapping):
+    """
+    Read-only mapping {label: selected column} over a dict of selections.
+    Drop-in replacement for the per-process score/weight dicts consumed by
+    `utils.get_roc_dict` and `Draw.plot_anomaly_score_distribution`: each array
+    is only materialised when it is looked up.
+    Labels whose sample lacks the column are not part of the mapping.
+    """
+
+    def __init__(self, selections: Dict[str, Selection], column: str):
+        self.selections = selections
+        self.column = column
+
+    def __getitem__(self, label: str) -> npt.NDArray:
+        selection = self.selections[label]
+        if self.column not in selection:
+            raise KeyError(label)
+        return selection[self.column]
+
+    def __contains__(self, label) -> bool:
+        return label in self.selections and self.column in self.selections[label]
+
+    def __iter__(self) -> Iterator[str]:
+        return (label for label, s in self.selections.items() if self.column in s)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
@@ -0,0 +1,369 @@
+"""
+Sharded filling of the hists_plot*.root inputs from the skimmed Events trees.
+Each worker (a batch job on its own node, or a local process) fills the files
+of one shard of the file catalog and writes a histstore.HistogramStore with
+one partial per ntuple file. The reducer collects the partials of all shards
+and sums them in the order of their source paths, so the merged histograms
+are bit for bit the same for any number of shards and any assignment of
+files to shards. A worker that is started again skips the files already in
+its shard, so failed jobs can simply be resubmitted.
+
+    python3 shard_fill.py fill --catalog file_catalog.sqlite --process ScoutingPFMonitor --shard 3 --n-shards 50 \\
+        --output shards/shard-003.sqlite
+    python3 shard_fill.py merge shards/shard-*.sqlite --output-dir inputs --catalog file_catalog.sqlite \\
+        --process ScoutingPFMonitor
+    python3 shard_fill.py run --catalog file_catalog.sqlite --process ScoutingPFMonitor --workers 8 --output-dir inputs
+
+The histograms are defined in a JSON config (config/hist_fill_config.json):
+for every output file ("layout") a set of selections and observables, filled
+as f"{selection}_{observable}" like the hists_plot*.root inputs, optionally
+with the nPV distribution on the y axis and with event weights. A selection
+is a branch name (the event passes if it is true) or a list of branch names
+and [column, op, value] filters (see loading.filter_mask) that must all hold.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+from rich.console import Console
+
+import loading
+import profiling
+from catalog import FileCatalog
+from histstore import Hist, HistogramStore, write_root
+
+console = Console()
+
+DEFAULT_CONFIG = "config/hist_fill_config.json"
+
+
+@dataclass
+class Axis:
+    branch: str
+    edges: npt.NDArray
+
+    @classmethod
+    def from_config(cls, config: dict) -> "Axis":
+        """
+        {"branch": ..., "bins": [n, low, high]} with "scale": "log" for logarithmic bins,
+        or {"branch": ..., "edges": [...]}.
+        """
+        if "edges" in config:
+            edges = np.asarray(config["edges"], dtype=np.float64)
+        else:
+            n_bins, low, high = config["bins"]
+            space = np.geomspace if config.get("scale", "lin") == "log" else np.linspace
+            edges = space(low, high, n_bins + 1)
+        return cls(config["branch"], edges)
+
+    def index(self, x: npt.NDArray) -> npt.NDArray:
+        # 0 is the underflow and len(edges) the overflow bin; the upper edge is exclusive as in ROOT
+        return np.searchsorted(self.edges, x, side="right")
+
+
+def parse_selection(selection: Union[str, list]) -> List[Tuple[str, str, object]]:
+    """
+    (column, op, value) filters of a selection given as a branch name or a list of
+    branch names and [column, op, value] filters; an empty list selects all events.
+    """
+    if isinstance(selection, str):
+        selection = [selection]
+    return [(f, "==", True) if isinstance(f, str) else tuple(f) for f in selection]
+
+
+class FillConfig:
+    """
+    The histograms to fill: {f"{layout}/{selection}_{observable}": (selection, observable)}
+    over the layouts of a config, with selections and observables shared between layouts
+    evaluated once per chunk.
+    """
+
+    def __init__(self, config: dict):
+        self.npv = Axis.from_config(config["npv"]) if config.get("npv") else None
+        self.weight = config.get("weight")
+        self.selections: Dict[Tuple, List[Tuple[str, str, object]]] = {}
+        self.observables: Dict[Tuple, Axis] = {}
+        self.hists: Dict[str, Tuple[Tuple, Tuple]] = {}
+        for layout, spec in config["layouts"].items():
+            for selection_name, selection in spec["selections"].items():
+                filters = parse_selection(selection)
+                selection_key = tuple(filters)
+                self.selections[selection_key] = filters
+                for observable_name, observable in spec["observables"].items():
+                    axis = Axis.from_config(observable)
+                    observable_key = (axis.branch,) + tuple(axis.edges)
+                    self.observables[observable_key] = axis
+                    self.hists[f"{layout}/{selection_name}_{observable_name}"] = (selection_key, observable_key)
+
+    @classmethod
+    def from_json(cls, path: str) -> "FillConfig":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @property
+    def branches(self) -> List[str]:
+        branches = [axis.branch for axis in self.observables.values()]
+        branches += loading.filter_columns(list(self.selections.values()))
+        branches += [axis.branch for axis in [self.npv] if axis is not None]
+        branches += [self.weight] if self.weight else []
+        return list(dict.fromkeys(branches))
+
+    def _fill(self, axes: List[Axis], indices: List[npt.NDArray], values: List[npt.NDArray],
+              weights: npt.NDArray) -> Hist:
+        shape = tuple(len(axis.edges) + 1 for axis in axes)
+        flat = np.ravel_multi_index(indices, shape) if len(axes) > 1 else indices[0]
+        counts = np.bincount(flat, weights=weights, minlength=int(np.prod(shape))).reshape(shape)
+        if weights is None:
+            variances = counts.astype(np.float64)
+            weights = np.ones(len(flat))
+        else:
+            variances = np.bincount(flat, weights=weights**2, minlength=int(np.prod(shape))).reshape(shape)
+        # the TH1 statistics only count entries inside the axis ranges
+        inside = np.ones(len(flat), dtype=bool)
+        for axis, index in zip(axes, indices):
+            inside &= (index > 0) & (index < len(axis.edges))
+        w = weights[inside]
+        stats = {"fEntries": float(len(flat)), "fTsumw": w.sum(), "fTsumw2": (w**2).sum()}
+        for name, x in zip("xy", values):
+            x = x[inside]
+            stats[f"fTsumw{name}"] = (w * x).sum()
+            stats[f"fTsumw{name}2"] = (w * x**2).sum()
+        if len(axes) > 1:
+            stats["fTsumwxy"] = (w * values[0][inside] * values[1][inside]).sum()
+        stats = {k: float(v) for k, v in stats.items()}
+        return Hist(tuple(axis.edges for axis in axes), counts.astype(np.float64), variances, stats)
+
+    def fill_chunk(self, chunk: Dict[str, npt.NDArray]) -> Dict[str, Hist]:
+        n = len(next(iter(chunk.values())))
+        masks = {
+            key: loading.filter_mask(chunk, filters) if filters else np.ones(n, dtype=bool)
+            for key, filters in self.selections.items()
+        }
+        indices = {key: axis.index(chunk[axis.branch]) for key, axis in self.observables.items()}
+        npv_index = self.npv.index(chunk[self.npv.branch]) if self.npv is not None else None
+        weights = np.asarray(chunk[self.weight], dtype=np.float64) if self.weight else None
+        hists = {}
+        for name, (selection_key, observable_key) in self.hists.items():
+            mask = masks[selection_key]
+            axis = self.observables[observable_key]
+            axes, idx, values = [axis], [indices[observable_key][mask]], [chunk[axis.branch][mask]]
+            if self.npv is not None:
+                axes.append(self.npv)
+                idx.append(npv_index[mask])
+                values.append(chunk[self.npv.branch][mask])
+            hists[name] = self._fill(
+                axes, idx, [np.asarray(v, dtype=np.float64) for v in values],
+                None if weights is None else weights[mask],
+            )
+        return hists
+
+
+def fill_file(path: str, config: FillConfig, tree: str = "Events", step_size: Union[int, str] = "100 MB"
+              ) -> Tuple[Dict[str, Hist], int]:
+    """
+    Histograms of one ntuple file and its number of events. The file is always
+    read in the same chunks, so its partial histograms do not depend on the shard.
+    """
+    hists, n_events = None, 0
+    # one decompression thread per worker process, the next chunk is still read ahead
+    for chunk in loading.iterate(path, config.branches, tree=tree, step_size=step_size, workers=1):
+        n_events += len(next(iter(chunk.values())))
+        partial = config.fill_chunk(chunk)
+        hists = partial if hists is None else {name: hists[name] + h for name, h in partial.items()}
+    return hists or {}, n_events
+
+
+def shard_files(catalog_path: str, processes: List[str], shard: int, n_shards: int) -> List[str]:
+    """
+    Files of shard `shard` of `n_shards`: part `shard` of FileCatalog.partition of every process.
+    """
+    with FileCatalog(catalog_path) as catalog:
+        return [path for process in processes for path in catalog.partition(process, n_shards)[shard]]
+
+
+@profiling.profiled()
+def fill_shard(files: List[str], config_path: str, output: str, tree: str = "Events",
+               step_size: Union[int, str] = "100 MB") -> Dict[str, int]:
+    """
+    Add the partial histograms of every file to the shard store `output`, skipping
+    files that are already in it with the same size and mtime.
+    Returns the number of filled and skipped files and of filled events.
+    """
+    config = FillConfig.from_json(config_path)
+    stats = {"filled": 0, "skipped": 0, "events": 0}
+    with HistogramStore(output) as store:
+        known = store.sources()
+        for path in map(os.path.abspath, files):
+            st = os.stat(path)
+            source = known.get(path)
+            if source is not None and (source["size"], source["mtime"]) == (st.st_size, st.st_mtime):
+                stats["skipped"] += 1
+                continue
+            hists, n_events = fill_file(path, config, tree, step_size)
+            store.add(path, hists, n_events, size=st.st_size, mtime=st.st_mtime)
+            stats["filled"] += 1
+            stats["events"] += n_events
+    return stats
+
+
+@profiling.profiled()
+def merge_shards(shards: List[str], output_dir: str, expected: List[str] = None) -> Dict[str, List[str]]:
+    """
+    Sum the partials of all shard stores in the order of their source paths and write
+    one <layout>.root per layout to output_dir. With `expected` (the files of the
+    catalog), shards missing any of them are an error.
+    Returns {path of the written file: histogram names}.
+    """
+    stores = [HistogramStore(shard) for shard in shards]
+    try:
+        owners = {}
+        for store in stores:
+            for source in store.sources():
+                if source in owners:
+                    raise ValueError(f"{source} is in both {owners[source].db_path} and {store.db_path}")
+                owners[source] = store
+        if expected is not None:
+            missing = sorted(set(map(os.path.abspath, expected)) - set(owners))
+            if missing:
+                raise ValueError(f"{len(missing)} files are not in any shard, e.g. {missing[0]}")
+        merged = {}
+        for source in sorted(owners):
+            for name, hist in owners[source].partials(source).items():
+                merged[name] = merged[name] + hist if name in merged else hist
+    finally:
+        for store in stores:
+            store.close()
+
+    layouts = {}
+    for name, hist in merged.items():
+        layout, hist_name = name.split("/", 1)
+        layouts.setdefault(layout, {})[hist_name] = hist
+    written = {}
+    os.makedirs(output_dir, exist_ok=True)
+    for layout, hists in layouts.items():
+        path = os.path.join(output_dir, f"{layout}.root")
+        write_root(path, hists)
+        written[path] = sorted(hists)
+    return written
+
+
+def step_size(value: str):
+    """
+    Number of entries or a memory size with units, as uproot.iterate takes it.
+    """
+    return int(value) if value.isdigit() else value
+
+
+def get_files(args) -> List[str]:
+    if args.files:
+        return args.files
+    if args.catalog is None or not args.process:
+        raise SystemExit("Either --files or --catalog and --process are required")
+    return shard_files(args.catalog, args.process, args.shard, args.n_shards)
+
+
+def expected_files(args) -> List[str]:
+    if args.catalog is None or not args.process:
+        return None
+    with FileCatalog(args.catalog) as catalog:
+        return [path for process in args.process for path in catalog.files(process)]
+
+
+def fill(args):
+    files = get_files(args)
+    console.log(f"Filling {len(files)} files into {args.output}")
+    stats = fill_shard(files, args.config, args.output, args.tree, args.step_size)
+    console.log(", ".join(f"{v} {k}" for k, v in stats.items()))
+
+
+def merge(args):
+    written = merge_shards(args.shards, args.output_dir, expected_files(args))
+    for path, names in written.items():
+        console.log(f"Saved {path} ({len(names)} histograms)")
+
+
+def run(args):
+    """
+    Fill all shards in local worker processes standing in for the nodes, then merge.
+    """
+    shard_dir = os.path.join(args.output_dir, "shards")
+    os.makedirs(shard_dir, exist_ok=True)
+    if args.files:
+        # round robin, the catalog balances shards by their number of entries
+        parts = [args.files[i::args.n_shards] for i in range(args.n_shards)]
+    else:
+        parts = [shard_files(args.catalog, args.process, i, args.n_shards) for i in range(args.n_shards)]
+    shards = [os.path.join(shard_dir, f"shard-{i:03d}-of-{args.n_shards:03d}.sqlite") for i in range(args.n_shards)]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(fill_shard, files, args.config, shard, args.tree, args.step_size)
+            for files, shard in zip(parts, shards)
+        ]
+        for shard, future in zip(shards, futures):
+            console.log(f"{shard}: " + ", ".join(f"{v} {k}" for k, v in future.result().items()))
+    expected = args.files if args.files else expected_files(args)
+    written = merge_shards(shards, args.output_dir, expected)
+    for path, names in written.items():
+        console.log(f"Saved {path} ({len(names)} histograms)")
+
+
+def add_input_arguments(parser):
+    parser.add_argument("--files", nargs="+", default=None, help="Ntuple files (instead of the catalog)")
+    parser.add_argument("--catalog", default=None, help="catalog.FileCatalog database to take the files from")
+    parser.add_argument("--process", nargs="+", default=[], help="Processes of the catalog to fill")
+
+
+def add_fill_arguments(parser):
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="JSON config of the histograms to fill")
+    parser.add_argument("--tree", default="Events")
+    parser.add_argument(
+        "--step-size",
+        type=step_size,
+        default="100 MB",
+        help="Entries or memory size of the chunks the Events trees are read in"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fill the hists_plot*.root inputs in shards of the file catalog and merge the shards"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fill_parser = subparsers.add_parser("fill", help="Fill the files of one shard (one worker)")
+    add_input_arguments(fill_parser)
+    add_fill_arguments(fill_parser)
+    fill_parser.add_argument("--shard", type=int, default=0, help="Index of this shard")
+    fill_parser.add_argument("--n-shards", type=int, default=1, help="Total number of shards")
+    fill_parser.add_argument("--output", required=True, help="SQLite store of the partial histograms of this shard")
+    fill_parser.set_defaults(func=fill)
+
+    merge_parser = subparsers.add_parser("merge", help="Sum the shards into one ROOT file per layout")
+    merge_parser.add_argument("shards", nargs="+", help="Shard stores written by `fill`")
+    merge_parser.add_argument("--output-dir", required=True, help="Directory for the <layout>.root files")
+    merge_parser.add_argument(
+        "--catalog", default=None, help="Check that every file of --process in this catalog was filled"
+    )
+    merge_parser.add_argument("--process", nargs="+", default=[])
+    merge_parser.set_defaults(func=merge)
+
+    run_parser = subparsers.add_parser("run", help="Fill all shards in local processes and merge them")
+    add_input_arguments(run_parser)
+    add_fill_arguments(run_parser)
+    run_parser.add_argument("--n-shards", type=int, default=4, help="Number of shards")
+    run_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of CPUs)")
+    run_parser.add_argument(
+        "--output-dir", required=True, help="Directory for the <layout>.root files and the shards/ stores"
+    )
+    run_parser.set_defaults(func=run)
+
+    profiling.add_profile_argument(parser)
+
+    args = parser.parse_args()
+
+    profiling.run(args.func, args)
@@ -0,0 +1,183 @@
+"""
+Calorimeter deposits of many events in compressed sparse row (CSR) form.
+Most of the 72 x 56 towers (and many of the 18 x 14 regions) of an event are
+empty, so expanding every event into a dense grid (utils.get_dense_*_deposits)
+mostly stores zeros. SparseDeposits keeps only the non-zero cells: the flat
+cell indices and E_T values of all events back to back, plus offsets[i]:offsets[i + 1]
+delimiting event i. Indices are uint16, values keep their (compact) integer
+dtype, so an event costs a few bytes per hit cell instead of 4 bytes per cell.
+
+    towers = SparseDeposits.from_towers(tower_ieta, tower_iphi, tower_iet)
+    regions = towers.to_regions()                  # like utils.get_region_deposits
+    draw.plot_individual_image(regions[0], name)   # dense (18, 14) image of one event
+    occupancy = RegionOccupancy.from_batches(regions.iter_dense(100_000))
+"""
+from typing import Iterator, Tuple, Union
+
+import awkward as ak
+import numpy as np
+import numpy.typing as npt
+
+TOWER_SHAPE = (72, 56)
+REGION_SHAPE = (18, 14)
+
+# flat region index of every flat tower index; a region is 4 x 4 towers
+TOWER_TO_REGION = (
+    (np.arange(TOWER_SHAPE[0])[:, None] // 4) * REGION_SHAPE[1] + np.arange(TOWER_SHAPE[1])[None, :] // 4
+).ravel().astype(np.uint16)
+
+
+class SparseDeposits:
+    """
+    Non-zero deposits of n events on a grid of `shape` cells, each cell at most once per event.
+    Indexing with an integer gives the dense image of one event, with a slice
+    a SparseDeposits of those events (a view of the arrays, without copying).
+    """
+
+    def __init__(
+        self,
+        offsets: npt.NDArray,
+        indices: npt.NDArray,
+        values: npt.NDArray,
+        shape: Tuple[int, int],
+    ):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.uint16)
+        self.values = np.asarray(values)
+        self.shape = tuple(shape)
+        if len(self.indices) != len(self.values) or self.offsets[-1] - self.offsets[0] != len(self.values):
+            raise ValueError("offsets, indices and values of SparseDeposits do not agree")
+
+    @classmethod
+    def from_cells(
+        cls, counts: npt.NDArray, indices: npt.NDArray, values: npt.NDArray, shape: Tuple[int, int]
+    ) -> "SparseDeposits":
+        """
+        Build from the number of cells of each event and their flat indices and values, dropping empty cells.
+        """
+        nonzero = values != 0
+        events = np.repeat(np.arange(len(counts)), counts)[nonzero]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(events, minlength=len(counts)), out=offsets[1:])
+        return cls(offsets, indices[nonzero], values[nonzero], shape)
+
+    @classmethod
+    def from_towers(cls, tower_ieta: ak.Array, tower_iphi: ak.Array, tower_iet: ak.Array) -> "SparseDeposits":
+        """
+        Towers in cicada's eta-range on the (72, 56) grid of utils.get_dense_tower_deposits.
+        """
+        mask = (tower_ieta >= -28) & (tower_ieta <= 28)
+        tower_ieta, tower_iphi, tower_iet = tower_ieta[mask], tower_iphi[mask], tower_iet[mask]
+        tower_ieta = ak.where(tower_ieta < 0, tower_ieta, tower_ieta - 1) + 28
+        tower_iphi = (tower_iphi + 1) % 72
+
+        counts = ak.num(tower_iet).to_numpy()
+        indices = ak.flatten(tower_iphi * TOWER_SHAPE[1] + tower_ieta).to_numpy()
+        return cls.from_cells(counts, indices, ak.flatten(tower_iet).to_numpy(), TOWER_SHAPE)
+
+    @classmethod
+    def from_regions(cls, region_ieta: ak.Array, region_iphi: ak.Array, region_et: ak.Array) -> "SparseDeposits":
+        """
+        Regions on the (18, 14) grid of utils.get_dense_region_deposits.
+        """
+        counts = ak.num(region_et).to_numpy()
+        indices = ak.flatten(region_iphi * REGION_SHAPE[1] + region_ieta).to_numpy()
+        return cls.from_cells(counts, indices, ak.flatten(region_et).to_numpy(), REGION_SHAPE)
+
+    @classmethod
+    def from_dense(cls, deposits: npt.NDArray) -> "SparseDeposits":
+        """
+        From (n_events, *shape) dense deposits, e.g. utils.get_region_deposits_from_ntuple_et_array.
+        """
+        deposits = np.asarray(deposits)
+        flat = deposits.reshape(len(deposits), -1)
+        events, indices = np.nonzero(flat)
+        offsets = np.zeros(len(deposits) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(events, minlength=len(deposits)), out=offsets[1:])
+        return cls(offsets, indices, flat[events, indices], deposits.shape[1:3])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.indices.nbytes + self.values.nbytes
+
+    def event(self, i: int) -> Tuple[npt.NDArray, npt.NDArray]:
+        """
+        Flat indices and values of the non-zero cells of event i.
+        """
+        # offsets of a slice start at the position of its first event in the original arrays
+        start, stop = self.offsets[i] - self.offsets[0], self.offsets[i + 1] - self.offsets[0]
+        return self.indices[start:stop], self.values[start:stop]
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[npt.NDArray, "SparseDeposits"]:
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise ValueError("SparseDeposits only supports contiguous slices")
+            stop = max(start, stop)
+            lo, hi = self.offsets[start] - self.offsets[0], self.offsets[stop] - self.offsets[0]
+            return SparseDeposits(
+                self.offsets[start:stop + 1], self.indices[lo:hi], self.values[lo:hi], self.shape
+            )
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(f"event {item} out of range for {len(self)} events")
+        image = np.zeros(self.shape[0] * self.shape[1], dtype=self.values.dtype)
+        indices, values = self.event(item)
+        image[indices] = values
+        return image.reshape(self.shape)
+
+    def to_dense(self) -> npt.NDArray:
+        """
+        (n_events, *shape) dense deposits of all events; slice first for a batch.
+        """
+        dense = np.zeros((len(self), self.shape[0] * self.shape[1]), dtype=self.values.dtype)
+        events = np.repeat(np.arange(len(self)), np.diff(self.offsets))
+        dense[events, self.indices] = self.values
+        return dense.reshape((len(self),) + self.shape)
+
+    def iter_dense(self, batch_size: int = 100_000) -> Iterator[npt.NDArray]:
+        """
+        Dense (batch_size, *shape) batches, e.g. for streaming.RegionOccupancy.from_batches.
+        """
+        for start in range(0, len(self), batch_size):
+            yield self[start:start + batch_size].to_dense()
+
+    def max(self):
+        return self.values.max() if len(self.values) else self.values.dtype.type(0)
+
+    def to_regions(self) -> "SparseDeposits":
+        """
+        Sum the 4 x 4 towers of each region, like utils.get_region_deposits without the dense intermediate.
+        """
+        if self.shape != TOWER_SHAPE:
+            raise ValueError(f"Regions can only be built from {TOWER_SHAPE} towers, not {self.shape}")
+        n_regions = REGION_SHAPE[0] * REGION_SHAPE[1]
+        events = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.offsets))
+        keys = events * n_regions + TOWER_TO_REGION[self.indices]
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.diff(keys, prepend=-1))
+        # a region sums 16 towers of at most 9-bit ET, so 16 bits suffice, as in utils.get_region_deposits
+        region_dtype = np.promote_types(self.values.dtype, np.uint16)
+        values = self.values[order].astype(region_dtype)
+        values = np.add.reduceat(values, starts, dtype=region_dtype) if len(values) else values
+        keys = keys[starts]
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n_regions, minlength=len(self)), out=offsets[1:])
+        return SparseDeposits(offsets, keys % n_regions, values, REGION_SHAPE)
+
+
+def as_image(deposits: Union[npt.NDArray, SparseDeposits], shape: Tuple[int, int] = REGION_SHAPE) -> npt.NDArray:
+    """
+    Dense image of a single event given as an array of any shape with shape[0] * shape[1]
+    cells, or as a SparseDeposits holding one event.
+    """
+    if isinstance(deposits, SparseDeposits):
+        if len(deposits) != 1:
+            raise ValueError(f"Expected the deposits of one event, got {len(deposits)}")
+        deposits = deposits[0]
+    return np.asarray(deposits).reshape(shape)
@@ -0,0 +1,339 @@
+"""
+Mergeable accumulators for statistics over event streams.
+Each accumulator is updated chunk by chunk in O(chunk) time and memory, and
+partial results from other chunks, files or processes are combined with `+=`
+(they pickle, so they can be returned from worker processes). Merging in a
+different order changes the result only by floating point rounding.
+"""
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+
+class OnlineMoments:
+    """
+    Count, mean and variance of values with shape `shape` (e.g. () for a scalar
+    observable, (18, 14) for per-region statistics), accumulated along the first
+    axis of each chunk. Uses the pairwise update of Chan et al., which is
+    numerically stable also for a large number of chunks.
+    """
+
+    def __init__(self, shape: Tuple[int, ...] = ()):
+        self.n = 0.0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def update(self, values: npt.ArrayLike, weights: npt.ArrayLike = None):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        if weights is None:
+            n = float(len(values))
+            mean = values.mean(axis=0)
+            m2 = ((values - mean) ** 2).sum(axis=0)
+        else:
+            weights = np.asarray(weights, dtype=np.float64)
+            n = float(weights.sum())
+            if n == 0:
+                return self
+            w = weights.reshape((-1,) + (1,) * (values.ndim - 1))
+            mean = (w * values).sum(axis=0) / n
+            m2 = (w * (values - mean) ** 2).sum(axis=0)
+        self._merge(n, mean, m2)
+        return self
+
+    def _merge(self, n, mean, m2):
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.n * n / total)
+        self.n = total
+
+    def __iadd__(self, other: "OnlineMoments"):
+        if other.n > 0:
+            self._merge(other.n, other.mean, other.m2)
+        return self
+
+    @property
+    def variance(self) -> npt.NDArray:
+        return self.m2 / self.n if self.n > 0 else np.full_like(self.m2, np.nan)
+
+    @property
+    def std(self) -> npt.NDArray:
+        return np.sqrt(self.variance)
+
+
+class OnlineCovariance:
+    """
+    Means, variances and covariance of two observables, for the Pearson correlation.
+    """
+
+    def __init__(self):
+        self.n = 0.0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.cxx = 0.0
+        self.cyy = 0.0
+        self.cxy = 0.0
+
+    def update(self, x: npt.ArrayLike, y: npt.ArrayLike, weights: npt.ArrayLike = None):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        w = np.ones_like(x) if weights is None else np.asarray(weights, dtype=np.float64)
+        n = float(w.sum())
+        if n == 0:
+            return self
+        mean_x = (w * x).sum() / n
+        mean_y = (w * y).sum() / n
+        dx, dy = x - mean_x, y - mean_y
+        self._merge(n, mean_x, mean_y, (w * dx * dx).sum(), (w * dy * dy).sum(), (w * dx * dy).sum())
+        return self
+
+    def _merge(self, n, mean_x, mean_y, cxx, cyy, cxy):
+        total = self.n + n
+        dx, dy = mean_x - self.mean_x, mean_y - self.mean_y
+        f = self.n * n / total
+        self.cxx += cxx + dx * dx * f
+        self.cyy += cyy + dy * dy * f
+        self.cxy += cxy + dx * dy * f
+        self.mean_x += dx * n / total
+        self.mean_y += dy * n / total
+        self.n = total
+
+    def __iadd__(self, other: "OnlineCovariance"):
+        if other.n > 0:
+            self._merge(other.n, other.mean_x, other.mean_y, other.cxx, other.cyy, other.cxy)
+        return self
+
+    @property
+    def pearson(self) -> float:
+        denominator = np.sqrt(self.cxx * self.cyy)
+        return float(self.cxy / denominator) if denominator > 0 else np.nan
+
+
+class BinnedRankCorrelation:
+    """
+    Spearman correlation from a 2D histogram of the two observables: ranks are the
+    mid-ranks of the bins, so ties within a bin share one rank. For integer-valued
+    scores with unit-width bins around the integers this is the exact Spearman
+    coefficient; otherwise it is an approximation at the resolution of the bins.
+    Values outside of the edges are counted in the first or last bin.
+    """
+
+    def __init__(self, x_edges: npt.ArrayLike, y_edges: npt.ArrayLike):
+        self.x_edges = np.asarray(x_edges, dtype=np.float64)
+        self.y_edges = np.asarray(y_edges, dtype=np.float64)
+        self.counts = np.zeros((len(self.x_edges) - 1, len(self.y_edges) - 1))
+
+    @classmethod
+    def for_integers(cls, x_max: int, y_max: int) -> "BinnedRankCorrelation":
+        """
+        Unit-width bins centred on the integers 0...x_max and 0...y_max.
+        """
+        return cls(np.arange(-0.5, x_max + 1), np.arange(-0.5, y_max + 1))
+
+    def update(self, x: npt.ArrayLike, y: npt.ArrayLike, weights: npt.ArrayLike = None):
+        x_bins = np.clip(np.searchsorted(self.x_edges, x, side="right") - 1, 0, self.counts.shape[0] - 1)
+        y_bins = np.clip(np.searchsorted(self.y_edges, y, side="right") - 1, 0, self.counts.shape[1] - 1)
+        flat = x_bins * self.counts.shape[1] + y_bins
+        self.counts += np.bincount(flat, weights=weights, minlength=self.counts.size).reshape(self.counts.shape)
+        return self
+
+    def __iadd__(self, other: "BinnedRankCorrelation"):
+        if not (np.array_equal(self.x_edges, other.x_edges) and np.array_equal(self.y_edges, other.y_edges)):
+            raise ValueError("Cannot add rank correlations with different binning")
+        self.counts += other.counts
+        return self
+
+    @staticmethod
+    def _mid_ranks(marginal: npt.NDArray) -> npt.NDArray:
+        return np.cumsum(marginal) - marginal + (marginal + 1) / 2
+
+    @property
+    def spearman(self) -> float:
+        n = self.counts.sum()
+        if n == 0:
+            return np.nan
+        px, py = self.counts.sum(axis=1), self.counts.sum(axis=0)
+        rx = self._mid_ranks(px) - (n + 1) / 2
+        ry = self._mid_ranks(py) - (n + 1) / 2
+        cxy = rx @ self.counts @ ry
+        denominator = np.sqrt((px * rx ** 2).sum() * (py * ry ** 2).sum())
+        return float(cxy / denominator) if denominator > 0 else np.nan
+
+
+class RegionOccupancy:
+    """
+    Sum of the ET deposits and number of non-zero deposits per calorimeter region,
+    accumulated over the event axis of (n_events, 18, 14) batches. The eta and phi
+    distributions of the deposits are projections of these maps.
+    """
+
+    def __init__(self, shape: Tuple[int, int] = (18, 14)):
+        self.shape = shape
+        self.n_events = 0
+        self.et_sum = np.zeros(shape)
+        self.occupancy = np.zeros(shape, dtype=np.int64)
+
+    @classmethod
+    def from_batches(cls, batches, shape: Tuple[int, int] = (18, 14)) -> "RegionOccupancy":
+        """
+        Accumulate an iterable of deposit batches, e.g. utils.iter_region_deposits.
+        """
+        occupancy = cls(shape)
+        for batch in batches:
+            occupancy.update(batch)
+        return occupancy
+
+    def update(self, deposits: npt.ArrayLike):
+        # also accepts a trailing channel axis, (n_events, 18, 14, 1)
+        deposits = np.asarray(deposits).reshape((-1,) + self.shape)
+        self.n_events += len(deposits)
+        self.et_sum += deposits.sum(axis=0)
+        self.occupancy += np.count_nonzero(deposits, axis=0)
+        return self
+
+    def __iadd__(self, other: "RegionOccupancy"):
+        if self.shape != other.shape:
+            raise ValueError("Cannot add occupancy maps of different shapes")
+        self.n_events += other.n_events
+        self.et_sum += other.et_sum
+        self.occupancy += other.occupancy
+        return self
+
+    def projection(self, axis: int, weighted: bool = False) -> npt.NDArray:
+        """
+        Number of deposits (or their summed ET if weighted) per phi (axis=0) or eta (axis=1) index.
+        """
+        summed = self.et_sum if weighted else self.occupancy
+        return summed.sum(axis=1 - axis)
+
+
+class CellStatistics:
+    """
+    Per-region count, mean and variance of the deposits plus a histogram of the
+    integer ET values of every region, accumulated over (n_events, 18, 14) batches.
+    ET values above et_max are counted in an overflow bin.
+    """
+
+    def __init__(self, shape: Tuple[int, int] = (18, 14), et_max: int = 1023):
+        self.shape = shape
+        self.et_max = et_max
+        self.moments = OnlineMoments(shape)
+        # last bin is the overflow
+        self.histograms = np.zeros(shape + (et_max + 2,), dtype=np.int64)
+
+    @classmethod
+    def from_batches(cls, batches, shape: Tuple[int, int] = (18, 14), et_max: int = 1023) -> "CellStatistics":
+        statistics = cls(shape, et_max)
+        for batch in batches:
+            statistics.update(batch)
+        return statistics
+
+    def update(self, deposits: npt.ArrayLike):
+        # also accepts a trailing channel axis, (n_events, 18, 14, 1)
+        deposits = np.asarray(deposits).reshape((-1,) + self.shape)
+        self.moments.update(deposits)
+        et_bins = np.clip(np.rint(deposits), 0, self.et_max + 1).astype(np.int64)
+        n_bins = self.histograms.shape[-1]
+        flat = np.arange(np.prod(self.shape)).reshape(self.shape) * n_bins + et_bins
+        self.histograms += np.bincount(flat.ravel(), minlength=self.histograms.size).reshape(self.histograms.shape)
+        return self
+
+    def __iadd__(self, other: "CellStatistics"):
+        if self.shape != other.shape or self.et_max != other.et_max:
+            raise ValueError("Cannot add cell statistics with different shapes or ET ranges")
+        self.moments += other.moments
+        self.histograms += other.histograms
+        return self
+
+    @property
+    def n_events(self) -> int:
+        return int(self.moments.n)
+
+    @property
+    def mean(self) -> npt.NDArray:
+        return self.moments.mean
+
+    @property
+    def std(self) -> npt.NDArray:
+        return self.moments.std
+
+    @property
+    def sem(self) -> npt.NDArray:
+        return self.moments.std / np.sqrt(self.moments.n)
+
+    def histogram(self, phi: int, eta: int) -> npt.NDArray:
+        """
+        Number of events with ET = 0, 1, ..., et_max in region (phi, eta), without the overflow.
+        """
+        return self.histograms[phi, eta, :-1]
+
+
+class ErrorSummary:
+    """
+    Summary of the differences between two sets of scores (e.g. Keras and hls4ml
+    outputs) in a single pass: count, maximum absolute error, mean and standard
+    deviation of the signed error, and a histogram of the absolute error with
+    logarithmic bins from which percentiles are read off. Percentiles are upper
+    bounds at the resolution of the bins (n_bins per decade); exact zeros are
+    counted separately.
+    """
+
+    def __init__(self, min_error: float = 1e-9, max_error: float = 1e3, n_bins: int = 100):
+        n_decades = np.log10(max_error) - np.log10(min_error)
+        self.edges = np.geomspace(min_error, max_error, int(round(n_decades * n_bins)) + 1)
+        # bin 0: below min_error (including exact zeros), last bin: above max_error
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.n_exact = 0
+        self.max_abs = 0.0
+        self.moments = OnlineMoments()
+
+    def update(self, scores_a: npt.ArrayLike, scores_b: npt.ArrayLike):
+        error = np.asarray(scores_a, dtype=np.float64) - np.asarray(scores_b, dtype=np.float64)
+        if len(error) == 0:
+            return self
+        abs_error = np.abs(error)
+        self.moments.update(error)
+        self.max_abs = max(self.max_abs, float(abs_error.max()))
+        self.n_exact += int(np.count_nonzero(abs_error == 0))
+        self.counts += np.bincount(np.searchsorted(self.edges, abs_error, side="right"), minlength=len(self.counts))
+        return self
+
+    def __iadd__(self, other: "ErrorSummary"):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot add error summaries with different binning")
+        self.counts += other.counts
+        self.n_exact += other.n_exact
+        self.max_abs = max(self.max_abs, other.max_abs)
+        self.moments += other.moments
+        return self
+
+    @property
+    def n(self) -> int:
+        return int(self.moments.n)
+
+    def percentile(self, q: float) -> float:
+        """
+        Upper bound of the q-th percentile (0 <= q <= 100) of the absolute error.
+        """
+        if self.n == 0:
+            return np.nan
+        rank = q / 100 * self.n
+        if rank <= self.n_exact:
+            return 0.0
+        i = int(np.searchsorted(np.cumsum(self.counts), rank, side="left"))
+        upper = self.edges[i] if i < len(self.edges) else np.inf
+        return min(float(upper), self.max_abs)
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)) -> dict:
+        d = {
+            "n": self.n,
+            "exact": self.n_exact,
+            "max_abs_error": self.max_abs,
+            "mean_error": float(self.moments.mean),
+            "std_error": float(self.moments.std),
+        }
+        d.update({f"p{q:g}_abs_error": self.percentile(q) for q in percentiles})
+        return d
@@ -0,0 +1,328 @@
+"""
+Synthetic stand-ins for the analysis inputs, used for benchmarking and
+scale testing without access to the real samples on EOS.
+The distributions only roughly resemble the real ones; what matters is that
+shapes, dtypes, value ranges and sparsity match what the code expects.
+"""
+import pickle as pkl
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import awkward as ak
+import numpy as np
+import numpy.typing as npt
+import uproot
+
+# Binning of the histograms in the hists_plot*.root inputs: (scale, n_bins, low, high)
+HIST_AXES = {
+    "L1Jet_ht": ("lin", 200, 0.0, 4000.0),
+    "L1EG_ht": ("lin", 200, 0.0, 4000.0),
+    "L1Mu_ht": ("lin", 200, 0.0, 4000.0),
+    "L1Jet_mult": ("lin", 201, -0.5, 200.5),
+    "L1EG_mult": ("lin", 201, -0.5, 200.5),
+    "L1Mu_mult": ("lin", 201, -0.5, 200.5),
+    "l1_ht": ("lin", 200, 0.0, 4000.0),
+    "l1_met": ("lin", 100, 0.0, 1000.0),
+    "ScoutingMuonVtx_ScoutingMuonVtx_mass": ("log", 1000, 0.01, 3000.0),
+}
+
+# Content of each histogram input file: (trigger names, histogram keys).
+# Histograms are stored as f"{trigger}_{hist_key}".
+HIST_FILES = {
+    "hists_plotA_plotB_plotC": (
+        [
+            "DST_PFScouting_AXONominal",
+            "DST_PFScouting_DoubleMuon",
+            "DST_PFScouting_JetHT",
+            "DST_PFScouting_ZeroBias",
+            "DST_PFScouting_CICADAMedium",
+        ],
+        ["L1Jet_ht", "L1EG_ht", "L1Mu_ht", "L1Jet_mult", "L1EG_mult", "L1Mu_mult"],
+    ),
+    "hists_plotD_plotE": (
+        [
+            "DST_PFScouting_ZeroBias",
+            "DST_PFScouting_ZeroBias_DST_PFScouting_AXONominal",
+            "DST_PFScouting_ZeroBias_DST_PFScouting_CICADAMedium",
+        ],
+        ["l1_met", "l1_ht"],
+    ),
+    "hists_plotF": (
+        [
+            "DST_PFScouting_AXONominal",
+            "pure_L1_DST_PFScouting_AXONominal",
+            "DST_PFScouting_CICADAMedium",
+            "pure_L1_DST_PFScouting_CICADAMedium",
+        ],
+        ["l1_ht"],
+    ),
+    "hists_plotG": (
+        [
+            "DST_PFScouting_AXONominal",
+            "DST_PFScouting_AXOVTight",
+            "DST_PFScouting_ZeroBias",
+        ],
+        ["ScoutingMuonVtx_ScoutingMuonVtx_mass"],
+    ),
+}
+
+# Branches of the skimmed `Events` trees: the scores read in the notebook, then the
+# trigger bits and L1 quantities that config/hist_fill_config.json fills histograms of
+EVENTS_BRANCHES = {
+    "CICADA2024_CICADAScore": np.float32,
+    "CICADA2025_CICADAScore": np.float32,
+    "CICADA2024_TeacherScore": np.float32,
+    "axol1tl_v3_AXOScore": np.float32,
+    "axol1tl_v4_AXOScore": np.float32,
+    "PV_npvs": np.int32,
+    "PV_npvsGood": np.int32,
+    "et": np.float32,
+    "is_pure": np.bool_,
+    "DST_PFScouting_AXONominal": np.bool_,
+    "DST_PFScouting_AXOVTight": np.bool_,
+    "DST_PFScouting_CICADAMedium": np.bool_,
+    "DST_PFScouting_DoubleMuon": np.bool_,
+    "DST_PFScouting_JetHT": np.bool_,
+    "DST_PFScouting_ZeroBias": np.bool_,
+    "nL1Jet": np.int32,
+    "nL1EG": np.int32,
+    "nL1Mu": np.int32,
+    "L1Jet_ht": np.float32,
+    "L1EG_ht": np.float32,
+    "L1Mu_ht": np.float32,
+    "l1_ht": np.float32,
+    "l1_met": np.float32,
+    "ScoutingMuonVtx_ScoutingMuonVtx_mass": np.float32,
+}
+
+SIGNAL_PROCESSES = ["HTo2LongLivedTo4b", "GluGluHToGG", "VBFHto2B", "SUEP", "TT"]
+BACKGROUND_PROCESSES = ["ZB", "SingleNeutrino"]
+
+
+def get_rng(seed: int = 42) -> np.random.Generator:
+    return np.random.default_rng(seed)
+
+
+def cicada_scores(n: int, rng: np.random.Generator, signal: bool = False) -> npt.NDArray:
+    """
+    Integer valued scores in [0, 256], as emulated by CICADA.
+    """
+    loc = 70 if signal else 40
+    return np.clip(np.round(rng.normal(loc, 15, n)), 0, 256)
+
+
+def axo_scores(n: int, rng: np.random.Generator, signal: bool = False) -> npt.NDArray:
+    """
+    Positive, heavy-tailed scores in [0, 3400), as emulated by AXOL1TL.
+    """
+    scale = 500 if signal else 150
+    return np.clip(np.round(rng.exponential(scale, n)), 0, 3399)
+
+
+def npv(n: int, rng: np.random.Generator, mean: float = 35) -> npt.NDArray:
+    return rng.poisson(mean, n)
+
+
+def event_weights(n: int, rng: np.random.Generator) -> npt.NDArray:
+    return rng.uniform(0.5, 1.5, n)
+
+
+def score_dict(
+        n: int, rng: np.random.Generator, bg_label: str = "ZB", sig_labels: List[str] = ("TT", "SUEP", "GluGluHToGG"),
+) -> Dict[str, npt.NDArray]:
+    """
+    CICADA scores for one background and several signal processes, n events each.
+    """
+    d = {bg_label: cicada_scores(n, rng)}
+    for label in sig_labels:
+        d[label] = cicada_scores(n, rng, signal=True)
+    return d
+
+
+def tower_arrays(
+        n: int, rng: np.random.Generator, mean_towers: float = 40
+) -> Tuple[ak.Array, ak.Array, ak.Array]:
+    """
+    Ragged (ieta, iphi, iet) tower arrays as stored in the ntuples.
+    ieta runs over [-41, 41] without 0 (outside of CICADA's range is included
+    on purpose), iphi over [1, 72].
+    """
+    counts = rng.poisson(mean_towers, n)
+    total = int(counts.sum())
+    ieta = rng.integers(1, 42, total) * rng.choice([-1, 1], total)
+    iphi = rng.integers(1, 73, total)
+    iet = rng.integers(1, 64, total)
+    # towers are unique per event in the real data; duplicates only overwrite each other here
+    return (
+        ak.unflatten(ieta, counts),
+        ak.unflatten(iphi, counts),
+        ak.unflatten(iet, counts),
+    )
+
+
+def region_deposits(n: int, rng: np.random.Generator, occupancy: float = 0.15) -> npt.NDArray:
+    """
+    Dense (n, 18, 14) regional ET deposits, mostly empty.
+    """
+    deposits = rng.integers(1, 256, (n, 18, 14))
+    deposits[rng.random((n, 18, 14)) > occupancy] = 0
+    return deposits
+
+
+def autoencoder_io(n: int, rng: np.random.Generator) -> Tuple[npt.NDArray, npt.NDArray]:
+    """
+    Inputs and slightly perturbed reconstructions of an autoencoder on (18, 14) images.
+    """
+    inputs = region_deposits(n, rng).astype(np.float32)
+    outputs = inputs + rng.normal(0, 2, inputs.shape).astype(np.float32)
+    return inputs, outputs
+
+
+def hist_edges(hist_key: str, bin_scale: int = 1) -> npt.NDArray:
+    scale, n_bins, low, high = HIST_AXES[hist_key]
+    if scale == "log":
+        return np.geomspace(low, high, n_bins * bin_scale + 1)
+    return np.linspace(low, high, n_bins * bin_scale + 1)
+
+
+def hist_counts(edges: npt.NDArray, n_events: int, rng: np.random.Generator) -> npt.NDArray:
+    """
+    Falling spectrum with n_events entries, drawn in O(bins) irrespective of n_events.
+    """
+    centres = 0.5 * (edges[1:] + edges[:-1])
+    x = (centres - edges[0]) / (edges[-1] - edges[0])
+    p = np.exp(-20 * x) * np.diff(edges)
+    return rng.multinomial(n_events, p / p.sum()).astype(np.float64)
+
+
+def npv_probabilities(npv_edges: npt.NDArray, mean: float = 35) -> npt.NDArray:
+    """
+    Poisson probabilities of the unit-width nPV bins, with the tail folded into the last bin.
+    """
+    p = np.empty(len(npv_edges) - 1)
+    p[0] = np.exp(-mean)
+    for k in range(1, len(p)):
+        p[k] = p[k - 1] * mean / k
+    p[-1] += 1 - p.sum()
+    return p
+
+
+def hist_counts_npv(
+        edges: npt.NDArray, npv_edges: npt.NDArray, n_events: int, rng: np.random.Generator
+) -> npt.NDArray:
+    """
+    Like hist_counts, with a second (nPV) axis; the observable and nPV are uncorrelated.
+    """
+    centres = 0.5 * (edges[1:] + edges[:-1])
+    x = (centres - edges[0]) / (edges[-1] - edges[0])
+    p = np.exp(-20 * x) * np.diff(edges)
+    p = np.outer(p / p.sum(), npv_probabilities(npv_edges))
+    return rng.multinomial(n_events, p.ravel()).reshape(p.shape).astype(np.float64)
+
+
+def write_hist_file(
+        path: str,
+        triggers: List[str],
+        hist_keys: List[str],
+        n_events: int,
+        rng: np.random.Generator,
+        bin_scale: int = 1,
+        npv_edges: npt.NDArray = None,
+) -> None:
+    """
+    Write one histogram per trigger and histogram key, named f"{trigger}_{hist_key}".
+    With npv_edges, the histograms are TH2D with the nPV distribution on the y axis.
+    """
+    with uproot.recreate(path) as f:
+        for hist_key in hist_keys:
+            edges = hist_edges(hist_key, bin_scale)
+            for i, trigger in enumerate(triggers):
+                # rates drop for the more selective triggers
+                n = n_events // (i + 1)
+                if npv_edges is None:
+                    f[f"{trigger}_{hist_key}"] = (hist_counts(edges, n, rng), edges)
+                else:
+                    f[f"{trigger}_{hist_key}"] = (hist_counts_npv(edges, npv_edges, n, rng), edges, npv_edges)
+
+
+def events_chunk(n: int, rng: np.random.Generator, signal: bool = False) -> Dict[str, npt.NDArray]:
+    npvs = npv(n, rng)
+    n_jet = rng.poisson(12 if signal else 8, n)
+    n_eg = rng.poisson(6, n)
+    n_mu = rng.poisson(1.5 if signal else 0.3, n)
+    # the HT of n objects with exponential pT spectra; zero without objects
+    jet_ht = rng.gamma(n_jet, 40.0 if signal else 25.0)
+    axo_score = axo_scores(n, rng, signal)
+    cicada_score = cicada_scores(n, rng, signal)
+    chunk = {
+        "CICADA2024_CICADAScore": cicada_scores(n, rng, signal),
+        "CICADA2025_CICADAScore": cicada_score,
+        "CICADA2024_TeacherScore": cicada_scores(n, rng, signal) + rng.normal(0, 2, n),
+        "axol1tl_v3_AXOScore": axo_scores(n, rng, signal),
+        "axol1tl_v4_AXOScore": axo_score,
+        "PV_npvs": npvs + rng.poisson(2, n),
+        "PV_npvsGood": npvs,
+        "et": rng.gamma(2.0, 150.0, n),
+        "is_pure": rng.random(n) < 0.2,
+        # thresholds chosen for rates of a few percent on background
+        "DST_PFScouting_AXONominal": axo_score >= 415,
+        "DST_PFScouting_AXOVTight": axo_score >= 700,
+        "DST_PFScouting_CICADAMedium": cicada_score >= 70,
+        "DST_PFScouting_DoubleMuon": n_mu >= 2,
+        "DST_PFScouting_JetHT": jet_ht >= 360,
+        "DST_PFScouting_ZeroBias": rng.random(n) < 0.1,
+        "nL1Jet": n_jet,
+        "nL1EG": n_eg,
+        "nL1Mu": n_mu,
+        "L1Jet_ht": jet_ht,
+        "L1EG_ht": rng.gamma(n_eg, 15.0),
+        "L1Mu_ht": rng.gamma(n_mu, 10.0),
+        "l1_ht": jet_ht * rng.uniform(0.6, 1.0, n),
+        "l1_met": rng.rayleigh(40.0 if signal else 25.0, n),
+        # log-normal continuum, 0 (underflow) without a dimuon vertex
+        "ScoutingMuonVtx_ScoutingMuonVtx_mass": np.where(n_mu >= 2, rng.lognormal(1.0, 1.5, n), 0.0),
+    }
+    return {branch: chunk[branch].astype(dtype) for branch, dtype in EVENTS_BRANCHES.items()}
+
+
+def write_events_file(
+        path: str,
+        n_events: int,
+        rng: np.random.Generator,
+        signal: bool = False,
+        chunk_size: int = 1_000_000,
+) -> None:
+    """
+    Write a skimmed `Events` tree with EVENTS_BRANCHES, chunk by chunk
+    so that memory stays bounded for any number of events.
+    """
+    with uproot.recreate(path) as f:
+        tree = f.mktree("Events", {branch: dtype for branch, dtype in EVENTS_BRANCHES.items()})
+        for start in range(0, n_events, chunk_size):
+            tree.extend(events_chunk(min(chunk_size, n_events - start), rng, signal))
+
+
+def write_score_plot_info(
+        path: str, scores: npt.NDArray, is_pure: npt.NDArray, threshold: float, bins: npt.NDArray
+) -> None:
+    """
+    Write the `{score}_plot_info.pkl` dictionary read by make_axo_style_score_plots.py.
+    """
+    working = scores >= threshold
+    plot_info = {
+        "overall": np.histogram(scores, bins=bins),
+        "working": np.histogram(scores[working], bins=bins),
+        "pure": np.histogram(scores[working & is_pure], bins=bins),
+        "bounds": (bins[0], bins[-1]),
+        "working_point": str(threshold),
+    }
+    with open(path, "wb") as f:
+        pkl.dump(plot_info, f)
+
+
+def write_correlation_dict(path: str, samples: List[str], rng: np.random.Generator) -> None:
+    """
+    Write the {sample: correlation coefficient} dictionary read by make_correlation_plots.py.
+    """
+    with open(path, "wb") as f:
+        pkl.dump(OrderedDict((s, float(rng.uniform(0.2, 0.6))) for s in samples), f)
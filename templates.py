@@ -0,0 +1,146 @@
+"""
+Figures built once and refilled for each plot of a family.
+The multiplicity plots of the L1 objects or the HT and MET distributions only
+differ in their data, limits and labels, but creating the figure, axes, CMS
+label, log locators and legend from scratch is most of the cost of a plot.
+A FigureTemplate subclass builds all of this and one set of artists per
+histogram in __init__, and update() only swaps the data into the artists
+(Line2D.set_data, LineCollection.set_segments), limits and labels.
+
+    template = ObjMultTemplate(triggers)
+    for obj in objects:
+        template.render([f"{obj}.pdf", f"{obj}.png"], hists[obj], ...)
+    export.flush()
+"""
+from concurrent.futures import Future
+from typing import List, Tuple, Union
+
+import matplotlib.patches as mpatches
+import numpy as np
+from matplotlib.container import ErrorbarContainer
+from matplotlib.figure import Figure
+
+import export
+
+
+def rebin_hist(counts: np.ndarray, bins: np.ndarray, rebin: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge every `rebin` bins, dropping the incomplete last group.
+    """
+    if rebin > 1:
+        counts = counts[:len(counts) - len(counts) % rebin].reshape(-1, rebin).sum(axis=1)
+        bins = bins[::rebin]
+        if len(bins) != len(counts) + 1:
+            bins = np.append(bins[:len(counts)], bins[len(counts)])
+    return counts, bins
+
+
+def hist_points(counts: np.ndarray, bins: np.ndarray, norm: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bin contents and Poisson errors (zero for empty bins), normalised to unit area if norm.
+    """
+    norm_factor = np.sum(counts) * np.diff(bins) if norm else 1
+    values = counts / norm_factor if norm else counts
+    errors = np.sqrt(counts) / norm_factor if norm else np.sqrt(counts)
+    return values, np.where(values == 0, 0, errors)
+
+
+def set_errorbar_data(container: ErrorbarContainer, x: np.ndarray, y: np.ndarray, yerr: np.ndarray) -> None:
+    """
+    Move the points and vertical error bars of an ax.errorbar(x, y, yerr) container.
+    """
+    data_line, caplines, barlinecols = container.lines
+    data_line.set_data(x, y)
+    low, high = y - yerr, y + yerr
+    barlinecols[0].set_segments(np.stack([np.stack([x, low], axis=-1), np.stack([x, high], axis=-1)], axis=1))
+    if caplines:
+        caplines[0].set_data(x, low)
+        caplines[1].set_data(x, high)
+
+
+def errorbar_extent(container: ErrorbarContainer) -> np.ndarray:
+    """
+    Finite end points of the error bars, to include them in the data limits.
+    """
+    segments = container.lines[2][0].get_segments()
+    points = np.concatenate([np.reshape(s, (-1, 2)) for s in segments] + [np.empty((0, 2))])
+    return points[np.isfinite(points).all(axis=1)]
+
+
+class HistogramArtists:
+    """
+    Error bars at the bin centres plus the steps-post outline of one histogram.
+    """
+
+    def __init__(self, ax, color: str, linestyle: str = "solid"):
+        self.errorbar = ax.errorbar(x=[], y=[], yerr=[], linestyle="", color=color)
+        self.outline = ax.errorbar(x=[], y=[], drawstyle="steps-post", color=color, linestyle=linestyle).lines[0]
+
+    def set_data(self, values: np.ndarray, errors: np.ndarray, bins: np.ndarray) -> None:
+        set_errorbar_data(self.errorbar, 0.5 * (bins[1:] + bins[:-1]), values, errors)
+        self.outline.set_data(bins, np.append(values, values[-1]))
+
+    def set_visible(self, visible: bool) -> None:
+        for artist in (*self.errorbar.get_children(), self.outline):
+            artist.set_visible(visible)
+
+    def get_visible(self) -> bool:
+        return self.outline.get_visible()
+
+
+def autoscale(ax, artists: List[HistogramArtists]) -> None:
+    """
+    Recompute the data limits of ax from its visible artists, including error bars
+    (Axes.relim ignores collections), and autoscale the axes that have no fixed limits.
+    """
+    ax.relim(visible_only=True)
+    for a in artists:
+        if a.get_visible():
+            ax.update_datalim(errorbar_extent(a.errorbar))
+    ax.autoscale_view()
+
+
+def legend_handles(labels: dict, colors: dict, linestyles: dict = None) -> List[mpatches.Rectangle]:
+    """
+    Open boxes in the histogram colours, the legend style of the L1 plots.
+    """
+    linestyles = linestyles or {}
+    return [
+        mpatches.Rectangle(
+            (0, 0), 1, 1,
+            fill=False,
+            edgecolor=colors[t],
+            linewidth=2,
+            linestyle=linestyles.get(t, "solid"),
+            label=labels[t],
+        )
+        for t in labels
+    ]
+
+
+class FigureTemplate:
+    """
+    Figure of a plot family; subclasses build it in __init__ and implement update().
+    Figures may be exported in the background (export.py), so render() waits until the
+    previous variant has been written before touching the artists again.
+    """
+
+    savefig_kwargs = {}
+
+    def __init__(self, fig: Figure, exporter: export.FigureExporter = None):
+        self.fig = fig
+        self.exporter = exporter or export.EXPORTER
+        self._export = None
+
+    def update(self, *args, **kwargs) -> None:
+        raise NotImplementedError
+
+    def render(self, paths: Union[str, List[str]], *args, **kwargs) -> Future:
+        """
+        update(*args, **kwargs) and export the figure to `paths`.
+        """
+        if self._export is not None:
+            self._export.result()
+        self.update(*args, **kwargs)
+        self._export = self.exporter.submit(self.fig, paths, **self.savefig_kwargs)
+        return self._export
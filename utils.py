@@ -1,5 +1,7 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
 import json
+import os
 import glob
 import numpy as np
 import awkward as ak
@@ -8,6 +10,9 @@ import yaml
 import glob
 from sklearn.metrics import roc_curve, auc
 
+import caching
+import profiling
+
 
 def get_file_dict(yaml_file_path: str) -> dict:
     """
@@ -32,10 +37,12 @@ def get_file_dict(yaml_file_path: str) -> dict:
     # return d
 
 
-def get_file_dict_old(json_file_path: str) -> dict:
+def get_file_dict_old(json_file_path: str, catalog: "FileCatalog" = None, refresh: bool = False) -> dict:
     """
     Build a dictionary mapping process names to list of file names.
     - look recusrively for all .root files in the specified path
+    - with a catalog.FileCatalog, the file lists come from the catalog and only processes
+      that were never scanned below their current path (or all, if refresh) are looked up on disk
     """
     # Get the directory of the JSON file
     with open(json_file_path) as f:
@@ -46,7 +53,13 @@ def get_file_dict_old(json_file_path: str) -> dict:
     
     d = {}
     for process, path in path_dict.items():
-        d[process] =  glob.glob(f"{prefix}/{path}/**/*.root", recursive=True)
+        if catalog is None:
+            d[process] =  glob.glob(f"{prefix}/{path}/**/*.root", recursive=True)
+            continue
+        root = f"{prefix}/{path}"
+        if refresh or not catalog.is_scanned(process, root):
+            catalog.refresh(process, root)
+        d[process] = catalog.files(process)
 
     return d
 
@@ -58,6 +71,7 @@ def get_l1_dict(json_file_path: str) -> dict:
     return raw_list
 
 
+@caching.memoized()
 def get_fractions_above_threshold(scores):
     thresholds = scores.flatten()
     thresholds.sort()
@@ -65,6 +79,49 @@ def get_fractions_above_threshold(scores):
     return thresholds, fractions
 
 
+# events histogrammed by one task of the thread pool in get_histogram
+HISTOGRAM_CHUNK_SIZE = 2**22
+
+_histogram_executor = None
+
+
+def _get_histogram_executor() -> ThreadPoolExecutor:
+    global _histogram_executor
+    if _histogram_executor is None:
+        _histogram_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="histogram")
+    return _histogram_executor
+
+
+def _histogram_chunk(values: np.ndarray, bins: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+    # np.histogram sums the weights in their own dtype; float32 weights (see loading.compact)
+    # lose percent-level precision in the sparse bins of large samples
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+    return np.histogram(values, bins=bins, weights=weights)[0]
+
+
+@caching.memoized()
+def get_histogram(values: np.ndarray, bins: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+    """
+    Counts (or summed weights) of values in the bins with edges `bins`, like np.histogram,
+    computed in chunks in a thread pool; NumPy releases the GIL while it bins.
+    """
+    values = values.reshape(-1)
+    starts = range(0, len(values), HISTOGRAM_CHUNK_SIZE)
+    if len(starts) <= 1:
+        return _histogram_chunk(values, bins, weights)
+    futures = [
+        _get_histogram_executor().submit(
+            _histogram_chunk,
+            values[start:start + HISTOGRAM_CHUNK_SIZE],
+            bins,
+            None if weights is None else weights[start:start + HISTOGRAM_CHUNK_SIZE],
+        )
+        for start in starts
+    ]
+    return np.sum([f.result() for f in futures], axis=0)
+
+
 def get_rounded_str(value) -> str:
     """
     Applies relative rounding to a number based on its magnitude:
@@ -106,7 +163,7 @@ def get_dense_tower_deposits(
 ) -> np.ndarray:
     """
     Get the dense tower deposits in cicada's eta-range from the given ragged tower arrays
-    returns a numpy array of shape (n_events, 72, 56)
+    returns a numpy array of shape (n_events, 72, 56) in the dtype of tower_iet
     """
     n_events = len(tower_ieta)
 
@@ -124,7 +181,7 @@ def get_dense_tower_deposits(
     tower_iphi = ak.flatten(tower_iphi).to_numpy()
     tower_iet = ak.flatten(tower_iet).to_numpy()
 
-    et_tower = np.zeros((n_events, 72, 56), dtype=int)
+    et_tower = np.zeros((n_events, 72, 56), dtype=tower_iet.dtype)
     et_tower[ids, tower_iphi, tower_ieta] = tower_iet
 
     return et_tower
@@ -135,7 +192,7 @@ def get_dense_region_deposits(
 ) -> np.ndarray:
     """
     Get the dense region deposits in cicada's eta-range from the given ragged region arrays
-    returns a numpy array of shape (n_events, 18, 14)
+    returns a numpy array of shape (n_events, 18, 14) in the dtype of region_et
     """
     n_events = len(region_ieta)
 
@@ -146,7 +203,7 @@ def get_dense_region_deposits(
     region_iphi = ak.flatten(region_iphi).to_numpy()
     region_et = ak.flatten(region_et).to_numpy()
 
-    et_region = np.zeros((n_events, 18, 14), dtype=int)
+    et_region = np.zeros((n_events, 18, 14), dtype=region_et.dtype)
     et_region[ids, region_iphi, region_ieta] = region_et
 
     return et_region
@@ -160,10 +217,25 @@ def get_region_deposits(
     returns a numpy array of shape (n_events, 18, 14)
     """
     et_tower = get_dense_tower_deposits(tower_ieta, tower_iphi, tower_iet)
-    et_region = block_reduce(et_tower, (1, 4, 4), np.sum)
+    # a region sums 16 towers of at most 9-bit ET, so 16 bits suffice;
+    # np.sum alone would accumulate small integers in int64
+    region_dtype = np.promote_types(et_tower.dtype, np.uint16)
+    et_region = block_reduce(et_tower, (1, 4, 4), np.sum, func_kwargs={"dtype": region_dtype})
     return et_region
 
 
+def iter_region_deposits(
+    tower_ieta: ak.Array, tower_iphi: ak.Array, tower_iet: ak.Array, chunk_size: int = 100_000
+) -> Iterator[np.ndarray]:
+    """
+    Like get_region_deposits, but yields (chunk_size, 18, 14) batches so that the dense
+    (n_events, 72, 56) tower intermediate never exists for the full sample at once.
+    """
+    for start in range(0, len(tower_ieta), chunk_size):
+        stop = start + chunk_size
+        yield get_region_deposits(tower_ieta[start:stop], tower_iphi[start:stop], tower_iet[start:stop])
+
+
 def get_region_deposits_from_ntuple_et_array(ntuple_et_array: np.ndarray) -> np.ndarray:
     """
     Get the dense region deposits from the flat ntuple et_region array.
@@ -201,6 +273,7 @@ def quantize(arr: np.ndarray, precision: tuple = (16, 8)) -> np.ndarray:
     return arrc
 
 
+@caching.memoized()
 def get_roc_from_scores(
         bg_scores: np.ndarray, sig_scores: np.ndarray, bkg_weights: np.ndarray = None, sig_weights: np.ndarray = None
 ) -> tuple[np.ndarray, np.ndarray]:
@@ -215,6 +288,58 @@ def get_roc_from_scores(
     return fpr, tpr
 
 
+class SortedBackground:
+    """
+    Background scores sorted once, for ROC curves against several signal samples.
+    Each curve then costs O(n_sig log n_sig + n_bkg): the signal scores are sorted
+    and inserted into the sorted background ones, instead of sorting the
+    concatenated scores again as roc_curve does.
+    """
+
+    def __init__(self, bg_scores: np.ndarray):
+        self.scores, counts = np.unique(bg_scores, return_counts=True)
+        # number of background scores below self.scores[i], and the total at the end
+        self.n_below = np.concatenate([[0], np.cumsum(counts)])
+        self.n = self.n_below[-1]
+
+    def n_above(self, thresholds: np.ndarray) -> np.ndarray:
+        """
+        Number of background scores >= each threshold.
+        """
+        return self.n - self.n_below[np.searchsorted(self.scores, thresholds, side="left")]
+
+    def union(self, sorted_scores: np.ndarray) -> np.ndarray:
+        """
+        Sorted unique values of the background and of the sorted `sorted_scores`, inserting
+        the scores that are not among the background ones without sorting the background again.
+        """
+        scores = sorted_scores
+        if len(scores):
+            scores = scores[np.r_[True, scores[1:] != scores[:-1]]]
+        positions = np.searchsorted(self.scores, scores, side="left")
+        found = np.zeros(len(scores), dtype=bool)
+        if len(self.scores):
+            found = self.scores[np.minimum(positions, len(self.scores) - 1)] == scores
+        return np.insert(self.scores, positions[~found], scores[~found])
+
+    def roc(self, sig_scores: np.ndarray, drop_intermediate: bool = True) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (fpr, tpr) like sklearn.metrics.roc_curve with sig_scores as positives.
+        """
+        sig_scores = np.sort(sig_scores)
+        thresholds = self.union(sig_scores)[::-1]
+        fps = self.n_above(thresholds)
+        tps = len(sig_scores) - np.searchsorted(sig_scores, thresholds)
+        if drop_intermediate and len(fps) > 2:
+            # keep only the corners of the curve, as roc_curve does
+            keep = np.r_[True, np.logical_or(np.diff(fps, 2), np.diff(tps, 2)), True]
+            fps, tps = fps[keep], tps[keep]
+        fps, tps = np.r_[0, fps], np.r_[0, tps]
+        return fps / self.n, tps / len(sig_scores)
+
+
+@caching.memoized()
+@profiling.profiled()
 def get_roc_dict(
         score_dict: dict, bg_label: str, sig_labels: List[str], weight_dict: dict = None
 ) -> dict: